@@ -14,6 +14,7 @@ import discord.errors as errors
 import discord.ext.commands.errors as command_errors
 import discord.ext.tasks as tasks
 
+from . import cache
 from . import database as db
 from .gdrive import TourneyDataClient
 from . import pss_crew as crew
@@ -30,6 +31,7 @@ from . import server_settings
 from .server_settings import GUILD_SETTINGS
 from . import settings
 from . import utils
+from . import web
 from . yadc_bot import YadcBot
 
 
@@ -295,20 +297,7 @@ async def before_autodaily_loop() -> None:
 
 
 async def post_dailies(current_daily_message: str, current_daily_embed: Embed, autodaily_settings: List[server_settings.AutoMessageSettings], utc_now: datetime.datetime) -> int:
-    posted_count = 0
-    for guild_autodaily_settings in autodaily_settings:
-        if guild_autodaily_settings.guild_id is not None and guild_autodaily_settings.channel_id is not None:
-            posted, can_post, latest_message = await __post_automessage(guild_autodaily_settings.channel, guild_autodaily_settings.latest_message_id, guild_autodaily_settings.change_mode, current_daily_message, current_daily_embed, utc_now, True)
-            if posted:
-                posted_count += 1
-            else:
-                guild_name = guild_autodaily_settings.guild.name if guild_autodaily_settings.guild else None
-                guild_id = guild_autodaily_settings.guild_id
-                channel_name = f'#{guild_autodaily_settings.channel.name}' if guild_autodaily_settings.channel else '<not accessible>'
-                channel_id = guild_autodaily_settings.channel_id
-                print(f'[post_dailies] Failed to post to guild \'{guild_name}\' ({guild_id}), channel \'{channel_name}\' ({channel_id})')
-            await guild_autodaily_settings.update(can_post=can_post, latest_message=latest_message, store_now_as_created_at=(not can_post and not latest_message))
-    return posted_count
+    return await __post_automessages('post_dailies', autodaily_settings, current_daily_message, current_daily_embed, utc_now, True)
 
 
 __FIRST_AUTOTRADER_POST_TIME = datetime.time(0, 0, 30, 0, datetime.timezone.utc)
@@ -333,21 +322,7 @@ async def autotrader_loop() -> None:
     all_autotrader_settings = server_settings.GUILD_SETTINGS.autotrader_settings
 
     if all_autotrader_settings:
-        posted_count = 0
-        for autotrader_settings in all_autotrader_settings:
-            if autotrader_settings.guild_id is not None and autotrader_settings.channel_id is not None:
-                # post message
-                posted, can_post, latest_message = await __post_automessage(autotrader_settings.channel, autotrader_settings.latest_message_id, autotrader_settings.change_mode, autotrader_message_text, autotrader_message_embed, utc_now, False)
-                if posted:
-                    posted_count += 1
-                else:
-                    guild_name = autotrader_settings.guild.name if autotrader_settings.guild else None
-                    guild_id = autotrader_settings.guild_id
-                    channel_name = f'#{autotrader_settings.channel.name}' if autotrader_settings.channel else '<not accessible>'
-                    channel_id = autotrader_settings.channel_id
-                    print(f'[autotrader_loop] Failed to post to guild \'{guild_name}\' ({guild_id}), channel \'{channel_name}\' ({channel_id})')
-                await autotrader_settings.update(can_post=can_post, latest_message=latest_message, store_now_as_created_at=(not can_post and not latest_message))
-
+        posted_count = await __post_automessages('autotrader_loop', all_autotrader_settings, autotrader_message_text, autotrader_message_embed, utc_now, False)
         print(f'[autotrader_loop] posted to {posted_count} of {len(all_autotrader_settings)} guilds')
 
 
@@ -357,6 +332,32 @@ async def before_autotrader_loop() -> None:
 
 
 
+async def __post_automessages(log_name: str, auto_message_settings: List[server_settings.AutoMessageSettings], message: str, embed: Embed, utc_now: datetime.datetime, replace_current_day_message: bool) -> int:
+    """
+    Posts to several guilds at once and writes the changed settings of all guilds to the database afterwards.
+    Returns the number of guilds posted to.
+    """
+    updates = []
+
+    async def post(guild_auto_message_settings: server_settings.AutoMessageSettings) -> bool:
+        posted, can_post, latest_message = await __post_automessage(guild_auto_message_settings.channel, guild_auto_message_settings.latest_message_id, guild_auto_message_settings.change_mode, message, embed, utc_now, replace_current_day_message)
+        if not posted:
+            guild_name = guild_auto_message_settings.guild.name if guild_auto_message_settings.guild else None
+            guild_id = guild_auto_message_settings.guild_id
+            channel_name = f'#{guild_auto_message_settings.channel.name}' if guild_auto_message_settings.channel else '<not accessible>'
+            channel_id = guild_auto_message_settings.channel_id
+            print(f'[{log_name}] Failed to post to guild \'{guild_name}\' ({guild_id}), channel \'{channel_name}\' ({channel_id})')
+        updates.append((guild_auto_message_settings, guild_auto_message_settings.get_update_settings(can_post=can_post, latest_message=latest_message, store_now_as_created_at=(not can_post and not latest_message))))
+        return posted
+
+    post_to = [guild_auto_message_settings for guild_auto_message_settings in auto_message_settings if guild_auto_message_settings.guild_id is not None and guild_auto_message_settings.channel_id is not None]
+    statistics = await utils.dispatch.dispatch(post_to, post, settings.AUTOMESSAGE_MAX_CONCURRENCY, log_prefix=f'[{log_name}]')
+    print(f'[{log_name}] {statistics}')
+    if not await server_settings.update_many_auto_message_settings(updates):
+        print(f'[{log_name}] Could not update the auto message settings of {len(updates)} guilds.')
+    return statistics.succeeded
+
+
 async def __post_automessage(text_channel: TextChannel, latest_message_id: int, change_mode: bool, current_daily_message: str, current_daily_embed: Embed, utc_now: datetime.datetime, replace_current_day_message: bool) -> Tuple[bool, bool, Message]:
     """
     Returns (posted, can_post, latest_message)
@@ -493,6 +494,7 @@ def __log_slash_command_use_error(ctx: ApplicationContext, err: Exception, force
 
 async def __initialize() -> None:
     print('Initializing.')
+    await web.init()
     await db.init()
     await server_settings.init(BOT)
     await server_settings.clean_up_invalid_server_settings(BOT)
@@ -505,6 +507,8 @@ async def __initialize() -> None:
     await room.init()
     await user.init()
 
+    cache.REFRESH_SCHEDULER.start()
+
     global __COMMANDS
     __COMMANDS = sorted([key for key, value in BOT.all_commands.items() if hasattr(value, 'hidden') and value.hidden == False])
     INITIALIZED = True
@@ -1,18 +1,51 @@
+import asyncio
 import datetime
+import hashlib
+import inspect
+import os
+import pickle
 import random
-from threading import Lock
 import time
-from typing import Dict, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+import zlib
 
 from . import pss_core as core
+from . import settings
 from . import utils
 from .typehints import EntitiesData
 
 
+# ---------- Constants ----------
+
+REFRESH_RETRY_SECONDS: float = 60.0
+REFRESH_SCHEDULER_MAX_SLEEP_SECONDS: float = 60.0
+
+
+
+
+
+# ---------- Typehint definitions ----------
+
+# Gets called with the cache, whenever its data has changed. May return an awaitable.
+CacheListener = Callable[['PssCache'], Optional[Awaitable[None]]]
+
+
+
+
+
 # ---------- Classes ----------
 
 class PssCache:
-    def __init__(self, update_path: str, name: str, key_name: str = None, update_interval: int = 15) -> None:
+    """
+    Caches the response of an API endpoint. Outdated data is being served while it gets refreshed in the background.
+
+    Every cache registers with `REFRESH_SCHEDULER`, which refreshes it ahead of expiry. Changes are detected by a hash of the data. Listeners only get notified, if the data has changed.
+
+    If the data has been parsed before it changes, the new data gets parsed right away and compared to the old parsed data per entity. Listeners can get the differences via `changes`.
+
+    If a snapshot path is set, the raw and parsed data get persisted to a snapshot file, whenever they change. After a restart, the data is loaded from the snapshot and refreshed in the background.
+    """
+    def __init__(self, update_path: str, name: str, key_name: str = None, update_interval: int = 15, snapshot_path: str = settings.PSS_CACHE_SNAPSHOT_PATH) -> None:
         self.__update_path: str = update_path
         self.__name: str = name
         self.__obj_key_name: str = key_name
@@ -20,47 +53,123 @@ class PssCache:
         self.__UPDATE_INTERVAL_ORIG: int = update_interval
 
         self.__data: str = None
+        self.__data_hash: bytes = None
+        self.__data_dict3: EntitiesData = None
+        self.__data_dict3_modify_date: datetime.datetime = None
+        self.__changes: core.EntitiesDataChanges = None
         self.__modify_date: datetime.datetime = None
-        self.__WRITE_LOCK: Lock = Lock()
-        self.__READ_LOCK: Lock = Lock()
-        self.__write_requested: bool = False
-        self.__reader_count: int = 0
+        self.__refresh_date: datetime.datetime = None
+        self.__update_task: asyncio.Task = None
+        self.__listeners: List[CacheListener] = []
+
+        self.__refreshes: int = 0
+        self.__refresh_changes: int = 0
+        self.__refresh_failures: int = 0
+        self.__refresh_duration_last: float = 0.0
+        self.__refresh_duration_max: float = 0.0
+        self.__refresh_duration_total: float = 0.0
+        self.__diff_duration_last: float = 0.0
+        self.__diff_duration_max: float = 0.0
+
+        self.__snapshot_file_path: str = None
+        self.__snapshot_loaded: bool = False
+        if snapshot_path:
+            update_path_hash = hashlib.sha1(update_path.encode('utf-8')).hexdigest()[:10]
+            self.__snapshot_file_path = os.path.join(snapshot_path, f'{name or "PssCache"}_{update_path_hash}.bin')
+
+        REFRESH_SCHEDULER.register(self)
+
+
+    @property
+    def changes(self) -> Optional[core.EntitiesDataChanges]:
+        """
+        Differences between the parsed data before and after the latest change. None, if the data hasn't changed since it has been loaded or the old data hadn't been parsed.
+        """
+        return self.__changes
 
+    @property
+    def content_hash(self) -> Optional[bytes]:
+        """
+        SHA-256 digest of the cached raw data.
+        """
+        return self.__data_hash
+
+
+    @property
+    def modify_date(self) -> Optional[datetime.datetime]:
+        """
+        Point in time when the cached data has last been changed. Used as the version of the parsed data.
+        """
+        return self.__modify_date
 
     @property
     def name(self) -> Optional[str]:
         return self.__name
 
+    @property
+    def refresh_date(self) -> Optional[datetime.datetime]:
+        """
+        Point in time when the data has last been retrieved from the API.
+        """
+        return self.__refresh_date
+
+    @property
+    def refresh_statistics(self) -> Dict[str, Union[int, float, str]]:
+        return {
+            'refreshes': self.__refreshes,
+            'changes': self.__refresh_changes,
+            'failures': self.__refresh_failures,
+            'refresh_duration_last': self.__refresh_duration_last,
+            'refresh_duration_avg': self.__refresh_duration_total / self.__refreshes if self.__refreshes else 0.0,
+            'refresh_duration_max': self.__refresh_duration_max,
+            'diff_duration_last': self.__diff_duration_last,
+            'diff_duration_max': self.__diff_duration_max,
+            'last_changes': str(self.__changes) if self.__changes else None,
+            'refresh_date': utils.format.datetime(self.__refresh_date) if self.__refresh_date else None,
+            'modify_date': utils.format.datetime(self.__modify_date) if self.__modify_date else None,
+        }
+
+    @property
+    def update_interval(self) -> datetime.timedelta:
+        """
+        Refreshing is disabled, if the interval is 0. Then the data gets retrieved on every access.
+        """
+        return self.__UPDATE_INTERVAL
+
+
+    def add_listener(self, listener: CacheListener) -> None:
+        """
+        Registers a listener to be called, whenever the data has changed.
+        """
+        if listener not in self.__listeners:
+            self.__listeners.append(listener)
+
+
+    def remove_listener(self, listener: CacheListener) -> None:
+        if listener in self.__listeners:
+            self.__listeners.remove(listener)
+
 
     async def update_data(self, old_data: str = None) -> bool:
-        data = await core.get_data_from_path(self.__update_path)
-        data_changed = data != old_data
-        if data_changed:
-            self.__request_write()
-            can_write = False
-            while not can_write:
-                can_write = self.__get_reader_count() == 0
-                if not can_write:
-                    time.sleep(random.random())
-            self.__write_data(data)
-            self.__finish_write()
-            return True
-        return False
+        """
+        Retrieves the data from the API. Concurrent callers share a single request.
+
+        Returns True, if the data has changed.
+        """
+        if self.__update_task is None or self.__update_task.done():
+            self.__update_task = asyncio.create_task(self.__update_data(old_data))
+        return await asyncio.shield(self.__update_task)
 
 
     async def get_raw_data(self) -> str:
+        self.__load_snapshot()
         if self.__get_is_data_outdated():
-            await self.update_data()
-
-        can_read = False
-        while not can_read:
-            can_read = not self.__get_write_requested()
-            if not can_read:
-                time.sleep(random.random())
-
-        self.__add_reader()
-        result = self.__read_data()
-        self.__remove_reader()
+            if self.__data is None or self.__UPDATE_INTERVAL_ORIG == 0:
+                await self.update_data()
+            elif self.__update_task is None or self.__update_task.done():
+                self.__update_task = asyncio.create_task(self.__update_data())
+                self.__update_task.add_done_callback(self.__on_background_update_done)
+        result, _ = self.__read_data()
         return result
 
 
@@ -71,8 +180,20 @@ class PssCache:
 
 
     async def get_data_dict3(self) -> EntitiesData:
-        data = await self.get_raw_data()
-        return utils.convert.xmltree_to_dict3(data)
+        """
+        Returns a shallow copy of the parsed data. The data only gets parsed again, if it has changed since it has been parsed last.
+
+        Callers may alter the returned dict and the entity infos in it, but not the values nested in an entity info (e.g. child elements), since these are shared with the cache.
+        """
+        await self.get_raw_data()
+
+        data, modify_date = self.__read_data()
+        if self.__data_dict3 is None or self.__data_dict3_modify_date != modify_date:
+            self.__data_dict3 = utils.convert.xmltree_to_dict3(data)
+            self.__data_dict3_modify_date = modify_date
+            self.__save_snapshot()
+        result = PssCache.__copy_data_dict3(self.__data_dict3)
+        return result
 
 
     def __get_is_data_outdated(self) -> bool:
@@ -80,60 +201,313 @@ class PssCache:
             return True
 
         utc_now = utils.get_utc_now()
-        self.__WRITE_LOCK.acquire()
-        modify_date = self.__modify_date
-        self.__WRITE_LOCK.release()
-        result = modify_date is None or utc_now - modify_date > self.__UPDATE_INTERVAL
+        refresh_date = self.__refresh_date
+        result = refresh_date is None or utc_now - refresh_date > self.__UPDATE_INTERVAL
         return result
 
 
-    def __get_reader_count(self) -> int:
-        self.__READ_LOCK.acquire()
-        result = self.__reader_count
-        self.__READ_LOCK.release()
-        return result
+    def __load_snapshot(self) -> None:
+        """
+        Blocking. Loads the snapshot once, if there's one.
+        """
+        if self.__snapshot_loaded:
+            return
+        self.__snapshot_loaded = True
+        if not self.__snapshot_file_path or self.__data is not None or not os.path.isfile(self.__snapshot_file_path):
+            return
+        try:
+            with open(self.__snapshot_file_path, 'rb') as snapshot_file:
+                data, modify_date, data_dict3 = pickle.loads(zlib.decompress(snapshot_file.read()))
+        except Exception as ex:
+            print(f'[PssCache] Could not load snapshot of cache \'{self.__name}\' from file \'{self.__snapshot_file_path}\': {ex}')
+            return
+        self.__data = data
+        self.__data_hash = PssCache.__get_hash(data)
+        self.__modify_date = modify_date
+        # Refresh the snapshot on first use
+        self.__refresh_date = None
+        if data_dict3 is not None:
+            self.__data_dict3 = data_dict3
+            self.__data_dict3_modify_date = modify_date
+
+
+    def __notify_listeners(self) -> None:
+        for listener in list(self.__listeners):
+            try:
+                result = listener(self)
+                if inspect.isawaitable(result):
+                    asyncio.ensure_future(result).add_done_callback(self.__on_listener_done)
+            except Exception as ex:
+                print(f'[PssCache] Listener of cache \'{self.__name}\' raised {ex.__class__.__name__}: {ex}')
+
+
+    def __on_background_update_done(self, update_task: asyncio.Task) -> None:
+        if not update_task.cancelled() and update_task.exception():
+            print(f'[PssCache] Could not update cache \'{self.__name}\' in the background: {update_task.exception()}')
+
+
+    def __on_listener_done(self, listener_task: asyncio.Future) -> None:
+        if not listener_task.cancelled() and listener_task.exception():
+            ex = listener_task.exception()
+            print(f'[PssCache] Listener of cache \'{self.__name}\' raised {ex.__class__.__name__}: {ex}')
+
+
+    def __read_data(self) -> Tuple[str, datetime.datetime]:
+        return self.__data, self.__modify_date
+
+
+    def __save_snapshot(self) -> None:
+        """
+        Writes the snapshot in the background. Only to be called after the data has been parsed, so that the snapshot contains the raw and the parsed data.
+        """
+        if not self.__snapshot_file_path:
+            return
+        snapshot = (self.__data, self.__modify_date, self.__data_dict3)
+        asyncio.get_running_loop().run_in_executor(None, PssCache.__write_snapshot_file, self.__snapshot_file_path, snapshot, self.__name)
+
+
+    async def __update_data(self, old_data: str = None) -> bool:
+        start = time.perf_counter()
+        try:
+            data = await core.get_data_from_path(self.__update_path)
+        except:
+            self.__refresh_failures += 1
+            raise
+        finally:
+            self.__add_refresh_duration(time.perf_counter() - start)
+        data_hash = PssCache.__get_hash(data)
+        old_data_hash = self.__data_hash if old_data is None else PssCache.__get_hash(old_data)
+        data_changed = data_hash != old_data_hash
+        if data_changed:
+            self.__refresh_changes += 1
+            old_data_dict3 = self.__data_dict3
+            old_modify_date = self.__data_dict3_modify_date
+            self.__write_data(data, data_hash)
+            if old_data_dict3 is not None:
+                await self.__update_changes(old_data_dict3, old_modify_date)
+            else:
+                self.__changes = None
+            self.__notify_listeners()
+        else:
+            self.__refresh_date = utils.get_utc_now()
+        return data_changed
+
+
+    def __add_refresh_duration(self, duration: float) -> None:
+        self.__refreshes += 1
+        self.__refresh_duration_last = duration
+        self.__refresh_duration_max = max(self.__refresh_duration_max, duration)
+        self.__refresh_duration_total += duration
+
+
+    async def __update_changes(self, old_data_dict3: EntitiesData, old_modify_date: datetime.datetime) -> None:
+        """
+        Parses the current data and compares it to old_data_dict3 in a worker thread. The parsed data gets kept, so it doesn't need to be parsed again on the next access.
+        """
+        start = time.perf_counter()
+        data, modify_date = self.__read_data()
+        try:
+            data_dict3, changes = await asyncio.get_running_loop().run_in_executor(None, PssCache.__parse_and_compare_data, data, old_data_dict3, old_modify_date, modify_date)
+        except Exception as ex:
+            print(f'[PssCache] Could not parse data of cache \'{self.__name}\': {ex}')
+            self.__changes = None
+            return
+        if self.__modify_date != modify_date:
+            # The data has changed again in the meantime
+            return
+        self.__changes = changes
+        self.__data_dict3 = data_dict3
+        self.__data_dict3_modify_date = modify_date
+        self.__save_snapshot()
+
+        duration = time.perf_counter() - start
+        self.__diff_duration_last = duration
+        self.__diff_duration_max = max(self.__diff_duration_max, duration)
+        if settings.PRINT_DEBUG:
+            print(f'[PssCache] Data of cache \'{self.__name}\' changed: {self.__changes} ({duration:.3f}s)')
+
+
+    def __write_data(self, data: str, data_hash: bytes) -> None:
+        self.__data = data
+        self.__data_hash = data_hash
+        self.__data_dict3 = None
+        self.__modify_date = utils.get_utc_now()
+        self.__refresh_date = self.__modify_date
 
 
-    def __get_write_requested(self) -> bool:
-        self.__WRITE_LOCK.acquire()
-        result = self.__write_requested
-        self.__WRITE_LOCK.release()
-        return result
+    @staticmethod
+    def __write_snapshot_file(file_path: str, snapshot: Tuple[str, datetime.datetime, EntitiesData], name: str) -> None:
+        try:
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            temp_file_path = f'{file_path}.tmp'
+            with open(temp_file_path, 'wb') as snapshot_file:
+                snapshot_file.write(zlib.compress(pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL), 1))
+            os.replace(temp_file_path, file_path)
+        except Exception as ex:
+            print(f'[PssCache] Could not write snapshot of cache \'{name}\' to file \'{file_path}\': {ex}')
 
 
-    def __request_write(self) -> None:
-        self.__WRITE_LOCK.acquire()
-        self.__write_requested = True
-        self.__WRITE_LOCK.release()
+    @staticmethod
+    def __parse_and_compare_data(data: str, old_data_dict3: EntitiesData, old_modify_date: datetime.datetime, modify_date: datetime.datetime) -> Tuple[EntitiesData, core.EntitiesDataChanges]:
+        """
+        Blocking. Must not access the cache, since it gets called from a worker thread.
+        """
+        data_dict3 = utils.convert.xmltree_to_dict3(data)
+        changes = core.get_entities_data_changes(old_data_dict3, data_dict3, old_version=old_modify_date, new_version=modify_date)
+        return data_dict3, changes
 
 
-    def __finish_write(self) -> None:
-        self.__WRITE_LOCK.acquire()
-        self.__write_requested = False
-        self.__WRITE_LOCK.release()
+    @staticmethod
+    def __get_hash(data: Optional[str]) -> Optional[bytes]:
+        if data is None:
+            return None
+        return hashlib.sha256(data.encode('utf-8')).digest()
 
 
-    def __write_data(self, data: str) -> None:
-        self.__WRITE_LOCK.acquire()
-        self.__data = data
-        self.__modify_date = utils.get_utc_now()
-        self.__WRITE_LOCK.release()
+    @staticmethod
+    def __copy_data_dict3(data: EntitiesData) -> EntitiesData:
+        """
+        Copies the outer dict and each entity info, so callers can't alter the cached data by accident. Nested values don't get copied, copying them would double the cost of every access.
+        """
+        if not data:
+            return {}
+        return {key: dict(value) if isinstance(value, dict) else value for key, value in data.items()}
 
 
-    def __add_reader(self) -> None:
-        self.__READ_LOCK.acquire()
-        self.__reader_count = self.__reader_count + 1
-        self.__READ_LOCK.release()
 
 
-    def __remove_reader(self) -> None:
-        self.__READ_LOCK.acquire()
-        self.__reader_count = self.__reader_count - 1
-        self.__READ_LOCK.release()
 
 
-    def __read_data(self) -> str:
-        self.__WRITE_LOCK.acquire()
-        result = self.__data
-        self.__WRITE_LOCK.release()
-        return result
\ No newline at end of file
+class PssCacheRefreshScheduler():
+    """
+    Refreshes the registered caches in the background ahead of their expiry, so that commands don't have to wait for the API. The point in time of a refresh gets randomized by jitter_ratio of the update interval, so that the caches don't all get refreshed at once. At most max_concurrency caches get refreshed at a time.
+
+    Caches with an update interval of 0 don't get scheduled.
+    """
+    def __init__(self, max_concurrency: int, refresh_ahead_ratio: float, jitter_ratio: float) -> None:
+        self.__max_concurrency: int = max_concurrency
+        self.__refresh_ahead_ratio: float = refresh_ahead_ratio
+        self.__jitter_ratio: float = jitter_ratio
+        self.__caches: List[PssCache] = []
+        self.__jitters: Dict[PssCache, float] = {}
+        self.__retry_at: Dict[PssCache, datetime.datetime] = {}
+        self.__task: asyncio.Task = None
+        self.__wake_up: asyncio.Event = None
+
+        self.__rounds: int = 0
+        self.__round_duration_last: float = 0.0
+        self.__round_duration_max: float = 0.0
+
+
+    @property
+    def is_running(self) -> bool:
+        return self.__task is not None and not self.__task.done()
+
+    @property
+    def statistics(self) -> Dict[str, Any]:
+        """
+        Statistics of the scheduler and the refresh statistics of every registered cache by cache name.
+        """
+        return {
+            'running': self.is_running,
+            'caches': len(self.__caches),
+            'max_concurrency': self.__max_concurrency,
+            'rounds': self.__rounds,
+            'round_duration_last': self.__round_duration_last,
+            'round_duration_max': self.__round_duration_max,
+            'refresh_statistics': {pss_cache.name or str(index): pss_cache.refresh_statistics for index, pss_cache in enumerate(self.__caches)},
+        }
+
+
+    def register(self, pss_cache: PssCache) -> None:
+        if pss_cache not in self.__caches:
+            self.__caches.append(pss_cache)
+            if self.__wake_up:
+                self.__wake_up.set()
+
+
+    def start(self) -> None:
+        """
+        Starts the scheduler, if it isn't running, yet. Must be called from within the event loop.
+        """
+        if not self.is_running:
+            self.__wake_up = asyncio.Event()
+            self.__task = asyncio.create_task(self.__run())
+
+
+    async def stop(self) -> None:
+        if self.is_running:
+            self.__task.cancel()
+            try:
+                await self.__task
+            except asyncio.CancelledError:
+                pass
+        self.__task = None
+
+
+    def __get_due_date(self, pss_cache: PssCache) -> Optional[datetime.datetime]:
+        """
+        Returns None, if the cache doesn't get refreshed in the background.
+        """
+        update_interval = pss_cache.update_interval
+        if not update_interval:
+            return None
+        retry_at = self.__retry_at.get(pss_cache)
+        if retry_at:
+            return retry_at
+        refresh_date = pss_cache.refresh_date
+        if refresh_date is None:
+            return datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
+        jitter = self.__jitters.get(pss_cache)
+        if jitter is None:
+            jitter = self.__jitters[pss_cache] = random.uniform(0, self.__jitter_ratio)
+        return refresh_date + update_interval * (1 - self.__refresh_ahead_ratio - jitter)
+
+
+    async def __refresh(self, pss_cache: PssCache) -> bool:
+        # A new jitter for every refresh
+        self.__jitters.pop(pss_cache, None)
+        try:
+            await pss_cache.update_data()
+        except Exception:
+            self.__retry_at[pss_cache] = utils.get_utc_now() + datetime.timedelta(seconds=min(REFRESH_RETRY_SECONDS, pss_cache.update_interval.total_seconds()))
+            raise
+        self.__retry_at.pop(pss_cache, None)
+        return True
+
+
+    async def __run(self) -> None:
+        while True:
+            self.__wake_up.clear()
+            utc_now = utils.get_utc_now()
+            due_dates = {pss_cache: self.__get_due_date(pss_cache) for pss_cache in self.__caches}
+            due_caches = [pss_cache for pss_cache, due_date in due_dates.items() if due_date and due_date <= utc_now]
+            if due_caches:
+                dispatch_statistics = await utils.dispatch.dispatch(due_caches, self.__refresh, self.__max_concurrency, log_prefix='[PssCacheRefreshScheduler]')
+                self.__rounds += 1
+                self.__round_duration_last = dispatch_statistics.duration
+                self.__round_duration_max = max(self.__round_duration_max, dispatch_statistics.duration)
+                if settings.PRINT_DEBUG:
+                    print(f'[PssCacheRefreshScheduler] Refreshed caches: {dispatch_statistics}')
+                continue
+
+            next_due_dates = [due_date for due_date in due_dates.values() if due_date]
+            sleep_seconds = REFRESH_SCHEDULER_MAX_SLEEP_SECONDS
+            if next_due_dates:
+                sleep_seconds = min(sleep_seconds, max(0.0, (min(next_due_dates) - utc_now).total_seconds()))
+            try:
+                await asyncio.wait_for(self.__wake_up.wait(), timeout=sleep_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+
+
+
+
+# ---------- Initialization ----------
+
+REFRESH_SCHEDULER: PssCacheRefreshScheduler = PssCacheRefreshScheduler(
+    settings.PSS_CACHE_REFRESH_MAX_CONCURRENCY,
+    settings.PSS_CACHE_REFRESH_AHEAD_RATIO,
+    settings.PSS_CACHE_REFRESH_JITTER_RATIO,
+)
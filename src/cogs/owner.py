@@ -13,17 +13,20 @@ from discord.ext.commands import group as _command_group
 from discord.ext.commands import is_owner as _is_owner
 
 from .base import CogBase as _CogBase
+from .. import cache as _cache
 from .. import database as _db
 from .. import pagination as _pagination
 from .. import pss_crew as _crew
 from .. import pss_daily as _daily
 from .. import pss_dropship as _dropship
+from .. import pss_entity as _entity
 from ..pss_exception import Error as _Error
 from .. import pss_item as _item
 from .. import pss_login as _login
 from .. import pss_lookups as _lookups
 from .. import pss_research as _research
 from .. import pss_room as _room
+from .. import pss_ship as _ship
 from .. import pss_training as _training
 from .. import server_settings as _server_settings
 from .. import settings as _settings
@@ -266,6 +269,30 @@ class OwnerCog(_CogBase, name='Owner commands'):
             _os.remove(file_name)
 
 
+    @debug.command(name='caches', brief='Get cache refresh statistics')
+    @_is_owner()
+    async def debug_caches(self, ctx: _Context):
+        self._log_command_use(ctx)
+        statistics = _cache.REFRESH_SCHEDULER.statistics
+        refresh_statistics = statistics.pop('refresh_statistics')
+        output = [f'`{key}`: {value}' for key, value in statistics.items()]
+        for cache_name, cache_statistics in refresh_statistics.items():
+            output.append(_utils.discord.ZERO_WIDTH_SPACE)
+            output.append(f'**{cache_name}**')
+            output.extend(f'`{key}`: {value:.3f}' if isinstance(value, float) else f'`{key}`: {value}' for key, value in cache_statistics.items())
+        output.append(_utils.discord.ZERO_WIDTH_SPACE)
+        output.append('**Rendered entity details**')
+        output.extend(f'`{key}`: {value:.3f}' if isinstance(value, float) else f'`{key}`: {value}' for key, value in _entity.RENDER_CACHE.statistics.items())
+        output.append(_utils.discord.ZERO_WIDTH_SPACE)
+        output.append('**Inspect ship requests**')
+        output.extend(f'`{key}`: {value:.3f}' if isinstance(value, float) else f'`{key}`: {value}' for key, value in _ship.INSPECT_SHIP_SERVICE.statistics.items())
+        if self.bot.tournament_data_client:
+            output.append(_utils.discord.ZERO_WIDTH_SPACE)
+            output.append('**Tournament user history**')
+            output.extend(f'`{key}`: {value}' for key, value in self.bot.tournament_data_client.user_history.statistics.items())
+        await _utils.discord.reply_with_output(ctx, output)
+
+
     @_command_group(name='device', brief='list available devices', hidden=True)
     @_is_owner()
     async def device(self, ctx: _Context):
@@ -41,6 +41,7 @@ class RawDataCog(_RawCogBase, name='Raw Data'):
         format: A string determining the format of the output to be returned. These are valid values:
                     • --json (JSON)
                     • --xml (raw XML as returned by the API)
+                    • --csv (CSV, for data sets too large for a spreadsheet)
                 If this parameter is omitted, an Excel spreadsheet will be created or, when having specified an id, a list of properties will be printed.
         All parameters are optional.
 
@@ -65,6 +66,7 @@ class RawDataCog(_RawCogBase, name='Raw Data'):
         format: A string determining the format of the output to be returned. These are valid values:
                     • --json (JSON)
                     • --xml (raw XML as returned by the API)
+                    • --csv (CSV, for data sets too large for a spreadsheet)
                 If this parameter is omitted, an Excel spreadsheet will be created or, when having specified an id, a list of properties will be printed.
         All parameters are optional.
 
@@ -89,6 +91,7 @@ class RawDataCog(_RawCogBase, name='Raw Data'):
         format: A string determining the format of the output to be returned. These are valid values:
                     • --json (JSON)
                     • --xml (raw XML as returned by the API)
+                    • --csv (CSV, for data sets too large for a spreadsheet)
                 If this parameter is omitted, an Excel spreadsheet will be created or, when having specified an id, a list of properties will be printed.
         All parameters are optional.
 
@@ -113,6 +116,7 @@ class RawDataCog(_RawCogBase, name='Raw Data'):
         format: A string determining the format of the output to be returned. These are valid values:
                     • --json (JSON)
                     • --xml (raw XML as returned by the API)
+                    • --csv (CSV, for data sets too large for a spreadsheet)
                 If this parameter is omitted, an Excel spreadsheet will be created or, when having specified an id, a list of properties will be printed.
         All parameters are optional.
 
@@ -137,6 +141,7 @@ class RawDataCog(_RawCogBase, name='Raw Data'):
         format: A string determining the format of the output to be returned. These are valid values:
                     • --json (JSON)
                     • --xml (raw XML as returned by the API)
+                    • --csv (CSV, for data sets too large for a spreadsheet)
                 If this parameter is omitted, an Excel spreadsheet will be created or, when having specified an id, a list of properties will be printed.
         All parameters are optional.
 
@@ -147,6 +152,39 @@ class RawDataCog(_RawCogBase, name='Raw Data'):
         await _raw.post_raw_data(ctx, _ai.condition_types_designs_retriever, 'ai_condition', ai_condition_id)
 
 
+    @raw.command(name='changes', aliases=['diff', 'update'], brief='Get the latest changes to the design data')
+    @_cooldown(rate=_RawCogBase.RATE, per=_RawCogBase.COOLDOWN, type=_BucketType.user)
+    async def raw_changes(self, ctx: _Context):
+        """
+        Get the entities having been added, removed or modified by the latest change to the design data of each type since the bot has been started.
+
+        Usage:
+        /raw changes
+
+        NOTE: This command is only available to certain users. If you think, you should be eligible to use this command, please contact the author of this bot.
+        """
+        self._log_command_use(ctx)
+        retrievers = {
+            'achievement': _achievement.achievements_designs_retriever,
+            'ai_action': _ai.action_types_designs_retriever,
+            'ai_condition': _ai.condition_types_designs_retriever,
+            'character': _crew.characters_designs_retriever,
+            'collection': _crew.collections_designs_retriever,
+            'item': _item.items_designs_retriever,
+            'mission': _mission.missions_designs_retriever,
+            'promotion': _promo.promotion_designs_retriever,
+            'research': _research.researches_designs_retriever,
+            'room': _room.rooms_designs_retriever,
+            'room purchase': _room.rooms_designs_purchases_retriever,
+            'ship': _ship.ships_designs_retriever,
+            'situation': _situation.situations_designs_retriever,
+            'star system': _gm.star_systems_designs_retriever,
+            'star system link': _gm.star_system_links_designs_retriever,
+            'training': _training.trainings_designs_retriever,
+        }
+        await _raw.post_raw_changes(ctx, retrievers)
+
+
     @raw.command(name='char', aliases=['crew', 'chars', 'crews'], brief='Get raw crew data')
     @_cooldown(rate=_RawCogBase.RATE, per=_RawCogBase.COOLDOWN, type=_BucketType.user)
     async def raw_char(self, ctx: _Context, *, char_id: str = None):
@@ -161,6 +199,7 @@ class RawDataCog(_RawCogBase, name='Raw Data'):
         format: A string determining the format of the output to be returned. These are valid values:
                     • --json (JSON)
                     • --xml (raw XML as returned by the API)
+                    • --csv (CSV, for data sets too large for a spreadsheet)
                 If this parameter is omitted, an Excel spreadsheet will be created or, when having specified an id, a list of properties will be printed.
         All parameters are optional.
 
@@ -185,6 +224,7 @@ class RawDataCog(_RawCogBase, name='Raw Data'):
         format: A string determining the format of the output to be returned. These are valid values:
                     • --json (JSON)
                     • --xml (raw XML as returned by the API)
+                    • --csv (CSV, for data sets too large for a spreadsheet)
                 If this parameter is omitted, an Excel spreadsheet will be created or, when having specified an id, a list of properties will be printed.
         All parameters are optional.
 
@@ -209,6 +249,7 @@ class RawDataCog(_RawCogBase, name='Raw Data'):
         format: A string determining the format of the output to be returned. These are valid values:
                     • --json (JSON)
                     • --xml (raw XML as returned by the API)
+                    • --csv (CSV, for data sets too large for a spreadsheet)
                 If this parameter is omitted, an Excel spreadsheet will be created or, when having specified an id, a list of properties will be printed.
         All parameters are optional.
 
@@ -233,6 +274,7 @@ class RawDataCog(_RawCogBase, name='Raw Data'):
         format: A string determining the format of the output to be returned. These are valid values:
                     • --json (JSON)
                     • --xml (raw XML as returned by the API)
+                    • --csv (CSV, for data sets too large for a spreadsheet)
                 If this parameter is omitted, an Excel spreadsheet will be created or, when having specified an id, a list of properties will be printed.
         All parameters are optional.
 
@@ -257,6 +299,7 @@ class RawDataCog(_RawCogBase, name='Raw Data'):
         format: A string determining the format of the output to be returned. These are valid values:
                     • --json (JSON)
                     • --xml (raw XML as returned by the API)
+                    • --csv (CSV, for data sets too large for a spreadsheet)
                 If this parameter is omitted, an Excel spreadsheet will be created or, when having specified an id, a list of properties will be printed.
         All parameters are optional.
 
@@ -281,6 +324,7 @@ class RawDataCog(_RawCogBase, name='Raw Data'):
         format: A string determining the format of the output to be returned. These are valid values:
                     • --json (JSON)
                     • --xml (raw XML as returned by the API)
+                    • --csv (CSV, for data sets too large for a spreadsheet)
                 If this parameter is omitted, an Excel spreadsheet will be created or, when having specified an id, a list of properties will be printed.
         All parameters are optional.
 
@@ -305,6 +349,7 @@ class RawDataCog(_RawCogBase, name='Raw Data'):
         format: A string determining the format of the output to be returned. These are valid values:
                     • --json (JSON)
                     • --xml (raw XML as returned by the API)
+                    • --csv (CSV, for data sets too large for a spreadsheet)
                 If this parameter is omitted, an Excel spreadsheet will be created or, when having specified an id, a list of properties will be printed.
         All parameters are optional.
 
@@ -329,6 +374,7 @@ class RawDataCog(_RawCogBase, name='Raw Data'):
         format: A string determining the format of the output to be returned. These are valid values:
                     • --json (JSON)
                     • --xml (raw XML as returned by the API)
+                    • --csv (CSV, for data sets too large for a spreadsheet)
                 If this parameter is omitted, an Excel spreadsheet will be created or, when having specified an id, a list of properties will be printed.
         All parameters are optional.
 
@@ -353,6 +399,7 @@ class RawDataCog(_RawCogBase, name='Raw Data'):
         format: A string determining the format of the output to be returned. These are valid values:
                     • --json (JSON)
                     • --xml (raw XML as returned by the API)
+                    • --csv (CSV, for data sets too large for a spreadsheet)
                 If this parameter is omitted, an Excel spreadsheet will be created or, when having specified an id, a list of properties will be printed.
         All parameters are optional.
 
@@ -377,6 +424,7 @@ class RawDataCog(_RawCogBase, name='Raw Data'):
         format: A string determining the format of the output to be returned. These are valid values:
                     • --json (JSON)
                     • --xml (raw XML as returned by the API)
+                    • --csv (CSV, for data sets too large for a spreadsheet)
                 If this parameter is omitted, an Excel spreadsheet will be created or, when having specified an id, a list of properties will be printed.
         All parameters are optional.
 
@@ -401,6 +449,7 @@ class RawDataCog(_RawCogBase, name='Raw Data'):
         format: A string determining the format of the output to be returned. These are valid values:
                     • --json (JSON)
                     • --xml (raw XML as returned by the API)
+                    • --csv (CSV, for data sets too large for a spreadsheet)
                 If this parameter is omitted, an Excel spreadsheet will be created or, when having specified an id, a list of properties will be printed.
         All parameters are optional.
 
@@ -425,6 +474,7 @@ class RawDataCog(_RawCogBase, name='Raw Data'):
         format: A string determining the format of the output to be returned. These are valid values:
                     • --json (JSON)
                     • --xml (raw XML as returned by the API)
+                    • --csv (CSV, for data sets too large for a spreadsheet)
                 If this parameter is omitted, an Excel spreadsheet will be created or, when having specified an id, a list of properties will be printed.
         All parameters are optional.
 
@@ -449,6 +499,7 @@ class RawDataCog(_RawCogBase, name='Raw Data'):
         format: A string determining the format of the output to be returned. These are valid values:
                     • --json (JSON)
                     • --xml (raw XML as returned by the API)
+                    • --csv (CSV, for data sets too large for a spreadsheet)
                 If this parameter is omitted, an Excel spreadsheet will be created or, when having specified an id, a list of properties will be printed.
         All parameters are optional.
 
@@ -473,6 +524,7 @@ class RawDataCog(_RawCogBase, name='Raw Data'):
         format: A string determining the format of the output to be returned. These are valid values:
                     • --json (JSON)
                     • --xml (raw XML as returned by the API)
+                    • --csv (CSV, for data sets too large for a spreadsheet)
                 If this parameter is omitted, an Excel spreadsheet will be created or, when having specified an id, a list of properties will be printed.
         All parameters are optional.
 
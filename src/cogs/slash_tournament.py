@@ -71,15 +71,13 @@ class TournamentSlashCog(_TournamentCogBase, name='Tournament Slash'):
             response = await _utils.discord.respond_with_output(ctx, output)
         
         data_date = self.bot.tournament_data_client.make_data_date(year, month, day, hour)
-        tourney_data = self.bot.tournament_data_client.get_data(data_date)
+        tourney_data = await self.bot.tournament_data_client.get_data(data_date)
 
         if tourney_data and tourney_data.fleets and tourney_data.users:
             await _utils.discord.edit_original_response(ctx, response, ['Found data:'])
             file_name = f'fleets_data_{_utils.format.timestamp_for_filename(tourney_data.retrieved_at)}.csv'
-            file_paths = [_fleet.create_fleets_sheet_csv(tourney_data.users, tourney_data.retrieved_at, file_name)]
+            file_paths = [await _fleet.get_fleets_sheet_csv(tourney_data, file_name)]
             await _utils.discord.post_output_with_files(ctx, [], file_paths)
-            for file_path in file_paths:
-                _os.remove(file_path)
         else:
             raise _Error(f'An error occured while retrieving the full, most recently collected data on top 100 fleets and players. Please contact the bot\'s author!')
 
@@ -129,6 +127,24 @@ class TournamentSlashCog(_TournamentCogBase, name='Tournament Slash'):
         await _utils.discord.edit_original_response(ctx, response, output=output)
 
 
+    @past_slash.command(name='playerhistory', brief='Get a player\'s tournament history')
+    @_cooldown(rate=_CogBase.RATE, per=_CogBase.COOLDOWN, type=_BucketType.user)
+    async def past_playerhistory_slash(self,
+        ctx: _ApplicationContext,
+        name_or_id: _Option(str, 'Enter current or past player name or ID.')
+    ):
+        """
+        Get a player's names, fleets and trophies in past tournaments.
+        """
+        self._log_command_use(ctx)
+
+        user_history = self.bot.tournament_data_client.user_history
+        user_info, response = await _user.find_history_user(ctx, name_or_id, user_history)
+
+        output = _user.get_user_history_as_text(user_history.get_user_history(user_info[_user.USER_KEY_NAME]))
+        await _utils.discord.edit_original_response(ctx, response, output=output)
+
+
     def _assure_yesterday_command_valid(self) -> None:
         tourney_day = _tourney.get_tourney_day(_utils.get_utc_now())
         if tourney_day is None:
@@ -223,12 +239,12 @@ class TournamentSlashCog(_TournamentCogBase, name='Tournament Slash'):
 
         criteria_lines = _top.get_criteria_lines(min_star_value, max_star_value, min_trophies, max_trophies, max_highest_trophies)
 
-        yesterday_tourney_data = self.bot.tournament_data_client.get_latest_daily_data()
-        last_month_user_data = self.bot.tournament_data_client.get_latest_monthly_data().users
+        yesterday_tourney_data = await self.bot.tournament_data_client.get_latest_daily_data()
+        last_month_user_data = (await self.bot.tournament_data_client.get_latest_monthly_data()).users
         current_fleet_data = await _top.get_alliances_with_division()
 
         if yesterday_tourney_data:
-            yesterday_user_infos = _top.filter_targets(yesterday_tourney_data.users.values(), division_design_id, last_month_user_data, current_fleet_data, min_star_value, max_star_value, min_trophies, max_trophies, max_highest_trophies)
+            yesterday_user_infos = _top.filter_targets_from_tourney_data(yesterday_tourney_data, division_design_id, last_month_user_data, current_fleet_data, min_star_value, max_star_value, min_trophies, max_trophies, max_highest_trophies)
             if not yesterday_user_infos:
                 error_lines = [f'No ships in division {division.upper()} match the criteria.'] + criteria_lines
                 raise _Error('\n'.join(error_lines))
@@ -315,23 +331,17 @@ class TournamentSlashCog(_TournamentCogBase, name='Tournament Slash'):
         else:
             count = max_count
 
-        yesterday_tourney_data = self.bot.tournament_data_client.get_latest_daily_data()
-        last_month_user_data = self.bot.tournament_data_client.get_latest_monthly_data().users
+        yesterday_tourney_data = await self.bot.tournament_data_client.get_latest_daily_data()
+        last_month_user_data = (await self.bot.tournament_data_client.get_latest_monthly_data()).users
         current_fleet_data = await _top.get_alliances_with_division()
 
         if yesterday_tourney_data:
-            yesterday_user_infos = _top.filter_targets(yesterday_tourney_data.users.values(), division_design_id, last_month_user_data, current_fleet_data, min_star_value, max_star_value, min_trophies, max_trophies, max_highest_trophies)
+            yesterday_user_infos = _top.filter_targets_from_tourney_data(yesterday_tourney_data, division_design_id, last_month_user_data, current_fleet_data, min_star_value, max_star_value, min_trophies, max_trophies, max_highest_trophies)
             if not yesterday_user_infos:
                 error_text = [f'No ships in division {division.upper()} match the criteria.'] + criteria_lines
                 raise _Error('\n'.join(error_text))
 
-            yesterday_fleet_users_infos = {}
-            for user_info in yesterday_user_infos:
-                yesterday_fleet_users_infos.setdefault(user_info[_fleet.FLEET_KEY_NAME], []).append(user_info)
-
-            for fleet_id, fleet_users_infos in yesterday_fleet_users_infos.items():
-                if count < len(fleet_users_infos):
-                    yesterday_fleet_users_infos[fleet_id] = fleet_users_infos[:count]
+            yesterday_fleet_users_infos = _top.get_top_targets_per_fleet(yesterday_user_infos, count)
 
             historic_data_note = _utils.datetime.get_historic_data_note(yesterday_tourney_data.retrieved_at)
             colour = _utils.discord.get_bot_member_colour(ctx.bot, ctx.guild)
@@ -402,9 +412,9 @@ class TournamentSlashCog(_TournamentCogBase, name='Tournament Slash'):
         await _utils.discord.edit_original_response(ctx, response, content='Fleet found. Compiling fleet info...', embeds=[], view=None)
 
         fleet_id = fleet_info[_fleet.FLEET_KEY_NAME]
-        day_before_tourney_data = self.bot.tournament_data_client.get_second_latest_daily_data()
-        yesterday_users_data = {user_id: user_info for user_id, user_info in yesterday_tourney_data.users.items() if user_info[_fleet.FLEET_KEY_NAME] == fleet_id}
-        day_before_users_data = {user_id: user_info for user_id, user_info in day_before_tourney_data.users.items() if user_info[_fleet.FLEET_KEY_NAME] == fleet_id}
+        day_before_tourney_data = await self.bot.tournament_data_client.get_second_latest_daily_data()
+        yesterday_users_data = yesterday_tourney_data.get_users_data_by_fleet_id(fleet_id)
+        day_before_users_data = day_before_tourney_data.get_users_data_by_fleet_id(fleet_id)
 
         for yesterday_user_info in yesterday_users_data.values():
             day_before_user_info = day_before_users_data.get(yesterday_user_info[_user.USER_KEY_NAME], {})
@@ -433,7 +443,7 @@ class TournamentSlashCog(_TournamentCogBase, name='Tournament Slash'):
         yesterday_tourney_data = await self._get_yesterday_tourney_data(ctx)
         user_info, response = await _user.find_tournament_user(ctx, name_or_id, yesterday_tourney_data)
 
-        day_before_yesterday_tourney_data = self.bot.tournament_data_client.get_second_latest_daily_data()
+        day_before_yesterday_tourney_data = await self.bot.tournament_data_client.get_second_latest_daily_data()
         day_before_user_info = day_before_yesterday_tourney_data.users.get(user_info[_user.USER_KEY_NAME])
         if day_before_user_info:
             user_info['YesterdayAllianceScore'] = day_before_user_info['AllianceScore']
@@ -500,7 +510,7 @@ class TournamentSlashCog(_TournamentCogBase, name='Tournament Slash'):
                 if month >= utc_now.month:
                     year -= 1
             data_date = self.bot.tournament_data_client.make_data_date(year, month)
-        tourney_data = self.bot.tournament_data_client.get_data(data_date)
+        tourney_data = await self.bot.tournament_data_client.get_data(data_date)
         return tourney_data
 
 
@@ -508,7 +518,7 @@ class TournamentSlashCog(_TournamentCogBase, name='Tournament Slash'):
         if not ctx.interaction.response.is_done():
             await ctx.interaction.response.defer()
 
-        return self.bot.tournament_data_client.get_latest_daily_data()
+        return await self.bot.tournament_data_client.get_latest_daily_data()
 
 
 
@@ -43,14 +43,12 @@ class TournamentCog(_TournamentCogBase, name='Tournament'):
 
         utc_now = _utils.get_utc_now()
         
-        tourney_data = self.bot.tournament_data_client.get_data(utc_now)
+        tourney_data = await self.bot.tournament_data_client.get_data(utc_now)
 
         if tourney_data and tourney_data.fleets and tourney_data.users:
             file_name = f'fleets_data_{_utils.format.timestamp_for_filename(tourney_data.retrieved_at)}.csv'
-            file_paths = [_fleet.create_fleets_sheet_csv(tourney_data.users, tourney_data.retrieved_at, file_name)]
+            file_paths = [await _fleet.get_fleets_sheet_csv(tourney_data, file_name)]
             await _utils.discord.reply_with_output_and_files(ctx, [], file_paths)
-            for file_path in file_paths:
-                _os.remove(file_path)
         else:
             raise _Error(f'An error occured while retrieving the full, most recently collected data on top 100 fleets and players. Please contact the bot\'s author!')
 
@@ -96,7 +94,7 @@ class TournamentCog(_TournamentCogBase, name='Tournament'):
             await ctx.invoke(subcommand, month=month, year=year, fleet_name=division)
             return
         else:
-            tourney_data = self._get_tourney_data(month, year)
+            tourney_data = await self._get_tourney_data(month, year)
             if tourney_data:
                 output = await _top.get_division_stars(ctx, division=division, fleet_data=tourney_data.fleets, retrieved_date=tourney_data.retrieved_at, as_embed=(await _server_settings.get_use_embeds(ctx)))
         await _utils.discord.reply_with_output(ctx, output)
@@ -121,11 +119,11 @@ class TournamentCog(_TournamentCogBase, name='Tournament'):
         if not fleet_name:
             raise _MissingParameterError('The parameter `fleet_name` is mandatory.')
 
-        tourney_data = self._get_tourney_data(month, year)
+        tourney_data = await self._get_tourney_data(month, year)
         fleet_infos = []
 
         if tourney_data:
-            fleet_infos = await _fleet.get_fleet_infos_from_tourney_data_by_name(fleet_name, tourney_data.fleets)
+            fleet_infos = await _fleet.get_fleet_infos_from_tourney_data_by_name(fleet_name, tourney_data)
 
         if fleet_infos:
             if len(fleet_infos) == 1:
@@ -153,7 +151,7 @@ class TournamentCog(_TournamentCogBase, name='Tournament'):
         """
         self._log_command_use(ctx)
         
-        tourney_data = self._get_tourney_data(month, year)
+        tourney_data = await self._get_tourney_data(month, year)
 
         output = await _top.get_top_captains(ctx, 100, as_embed=(await _server_settings.get_use_embeds(ctx)), tourney_data=tourney_data)
         await _utils.discord.reply_with_output(ctx, output)
@@ -178,11 +176,11 @@ class TournamentCog(_TournamentCogBase, name='Tournament'):
         if not fleet_name:
             raise _MissingParameterError('The parameter `fleet_name` is mandatory.')
 
-        tourney_data = self._get_tourney_data(month, year)
+        tourney_data = await self._get_tourney_data(month, year)
         fleet_infos = []
 
         if tourney_data:
-            fleet_infos = await _fleet.get_fleet_infos_from_tourney_data_by_name(fleet_name, tourney_data.fleets)
+            fleet_infos = await _fleet.get_fleet_infos_from_tourney_data_by_name(fleet_name, tourney_data)
 
         if fleet_infos:
             if len(fleet_infos) == 1:
@@ -220,14 +218,12 @@ class TournamentCog(_TournamentCogBase, name='Tournament'):
         self._log_command_use(ctx)
 
         (month, year, _) = self.bot.tournament_data_client.retrieve_past_parameters(ctx, month, year)
-        tourney_data = self._get_tourney_data(month, year)
+        tourney_data = await self._get_tourney_data(month, year)
 
         if tourney_data and tourney_data.fleets and tourney_data.users:
             file_name = f'tournament_results_{tourney_data.retrieved_year}-{tourney_data.retrieved_month:02d}.csv'
-            file_paths = [_fleet.create_fleets_sheet_csv(tourney_data.users, tourney_data.retrieved_at, file_name)]
+            file_paths = [await _fleet.get_fleets_sheet_csv(tourney_data, file_name)]
             await _utils.discord.reply_with_output_and_files(ctx, [], file_paths)
-            for file_path in file_paths:
-                _os.remove(file_path)
         else:
             raise _Error(f'An error occured while retrieving tournament results for the {tourney_data.retrieved_year} {_calendar.month_name[int(tourney_data.retrieved_month)]} tournament. Please contact the bot\'s author!')
 
@@ -252,11 +248,11 @@ class TournamentCog(_TournamentCogBase, name='Tournament'):
         if not player_name_or_id:
             raise _MissingParameterError('The parameter `player_name_or_id` is mandatory.')
 
-        tourney_data = self._get_tourney_data(month, year)
+        tourney_data = await self._get_tourney_data(month, year)
         user_infos = []
 
         if tourney_data:
-            user_infos = await _user.get_user_infos_from_tournament_data_by_name_or_id(player_name_or_id, tourney_data.users)
+            user_infos = await _user.get_user_infos_from_tournament_data_by_name_or_id(player_name_or_id, tourney_data)
 
         if user_infos:
             if len(user_infos) == 1:
@@ -276,6 +272,37 @@ class TournamentCog(_TournamentCogBase, name='Tournament'):
         await _utils.discord.reply_with_output(ctx, output)
 
 
+    @past.command(name='playerhistory', aliases=['userhistory'], brief='Get a player\'s tournament history')
+    @_cooldown(rate=_CogBase.RATE, per=_CogBase.COOLDOWN, type=_BucketType.user)
+    async def past_playerhistory(self, ctx: _Context, *, player_name_or_id: str = None):
+        """
+        Get the names, fleets and trophies of a player in every tournament month the bot has retrieved data from since it started.
+
+        Parameters:
+        player_name_or_id: Mandatory. The current name, a past name or the ID of the player.
+        """
+        self._log_command_use(ctx)
+        if not player_name_or_id:
+            raise _MissingParameterError('The parameter `player_name_or_id` is mandatory.')
+
+        user_history = self.bot.tournament_data_client.user_history
+        user_infos = await _user.get_user_history_infos_by_name_or_id(player_name_or_id, user_history)
+
+        if user_infos:
+            if len(user_infos) == 1:
+                user_info = user_infos[0]
+            else:
+                use_pagination = await _server_settings.db_get_use_pagination(ctx.guild)
+                paginator = _pagination.Paginator(ctx, player_name_or_id, user_infos, _user.get_user_search_details, use_pagination)
+                _, user_info = await paginator.wait_for_option_selection()
+
+            if user_info:
+                output = _user.get_user_history_as_text(user_history.get_user_history(user_info[_user.USER_KEY_NAME]))
+                await _utils.discord.reply_with_output(ctx, output)
+        else:
+            raise _NotFound(f'Could not find a player named `{player_name_or_id}` in the tournament data retrieved so far.')
+
+
     @_command_group(name='targets', brief='Get top tournament targets', invoke_without_command=True)
     @_cooldown(rate=_CogBase.RATE, per=_CogBase.COOLDOWN * 2, type=_BucketType.user)
     async def targets(self, ctx: _Context, division: str, star_value: str = None, trophies: str = None, max_highest_trophies: int = None) -> None:
@@ -310,12 +337,12 @@ class TournamentCog(_TournamentCogBase, name='Tournament'):
 
             criteria_lines, min_star_value, max_star_value, min_trophies_value, max_trophies_value, max_highest_trophies = _top.get_targets_parameters(star_value, trophies, max_highest_trophies)
 
-            yesterday_tourney_data = self.bot.tournament_data_client.get_latest_daily_data()
-            last_month_user_data = self.bot.tournament_data_client.get_latest_monthly_data().users
+            yesterday_tourney_data = await self.bot.tournament_data_client.get_latest_daily_data()
+            last_month_user_data = (await self.bot.tournament_data_client.get_latest_monthly_data()).users
             current_fleet_data = await _top.get_alliances_with_division()
 
             if yesterday_tourney_data:
-                yesterday_user_infos = _top.filter_targets(yesterday_tourney_data.users.values(), division_design_id, last_month_user_data, current_fleet_data, min_star_value, max_star_value, min_trophies_value, max_trophies_value, max_highest_trophies)
+                yesterday_user_infos = _top.filter_targets_from_tourney_data(yesterday_tourney_data, division_design_id, last_month_user_data, current_fleet_data, min_star_value, max_star_value, min_trophies_value, max_trophies_value, max_highest_trophies)
                 if not yesterday_user_infos:
                     error_lines = [f'No ships in division {division.upper()} match the criteria.'] + criteria_lines
                     raise _Error('\n'.join(error_lines))
@@ -415,23 +442,17 @@ class TournamentCog(_TournamentCogBase, name='Tournament'):
 
         criteria_lines, min_star_value, max_star_value, min_trophies_value, max_trophies_value, max_highest_trophies = _top.get_targets_parameters(star_value, trophies, max_highest_trophies)
 
-        yesterday_tourney_data = self.bot.tournament_data_client.get_latest_daily_data()
-        last_month_user_data = self.bot.tournament_data_client.get_latest_monthly_data().users
+        yesterday_tourney_data = await self.bot.tournament_data_client.get_latest_daily_data()
+        last_month_user_data = (await self.bot.tournament_data_client.get_latest_monthly_data()).users
         current_fleet_data = await _top.get_alliances_with_division()
 
         if yesterday_tourney_data:
-            yesterday_user_infos = _top.filter_targets(yesterday_tourney_data.users.values(), division_design_id, last_month_user_data, current_fleet_data, min_star_value, max_star_value, min_trophies_value, max_trophies_value, max_highest_trophies)
+            yesterday_user_infos = _top.filter_targets_from_tourney_data(yesterday_tourney_data, division_design_id, last_month_user_data, current_fleet_data, min_star_value, max_star_value, min_trophies_value, max_trophies_value, max_highest_trophies)
             if not yesterday_user_infos:
                 error_text = [f'No ships in division {division.upper()} match the criteria.'] + criteria_lines
                 raise _Error('\n'.join(error_text))
 
-            yesterday_fleet_users_infos = {}
-            for user_info in yesterday_user_infos:
-                yesterday_fleet_users_infos.setdefault(user_info[_fleet.FLEET_KEY_NAME], []).append(user_info)
-
-            for fleet_id, fleet_users_infos in yesterday_fleet_users_infos.items():
-                if count < len(fleet_users_infos):
-                    yesterday_fleet_users_infos[fleet_id] = fleet_users_infos[:count]
+            yesterday_fleet_users_infos = _top.get_top_targets_per_fleet(yesterday_user_infos, count)
 
             historic_data_note = _utils.datetime.get_historic_data_note(yesterday_tourney_data.retrieved_at)
             colour = _utils.discord.get_bot_member_colour(ctx.bot, ctx.guild)
@@ -512,10 +533,10 @@ class TournamentCog(_TournamentCogBase, name='Tournament'):
             raise _Error('It\'s day 1 of the current tournament, there is no data from yesterday.')
         output = []
 
-        yesterday_tourney_data = self.bot.tournament_data_client.get_latest_daily_data()
+        yesterday_tourney_data = await self.bot.tournament_data_client.get_latest_daily_data()
         yesterday_fleet_infos = []
         if yesterday_tourney_data:
-            yesterday_fleet_infos = await _fleet.get_fleet_infos_from_tourney_data_by_name(fleet_name, yesterday_tourney_data.fleets)
+            yesterday_fleet_infos = await _fleet.get_fleet_infos_from_tourney_data_by_name(fleet_name, yesterday_tourney_data)
 
         if yesterday_fleet_infos:
             if len(yesterday_fleet_infos) == 1:
@@ -527,9 +548,9 @@ class TournamentCog(_TournamentCogBase, name='Tournament'):
 
             if fleet_info:
                 fleet_id = fleet_info[_fleet.FLEET_KEY_NAME]
-                day_before_tourney_data = self.bot.tournament_data_client.get_second_latest_daily_data()
-                yesterday_users_data = {user_id: user_info for user_id, user_info in yesterday_tourney_data.users.items() if user_info[_fleet.FLEET_KEY_NAME] == fleet_id}
-                day_before_users_data = {user_id: user_info for user_id, user_info in day_before_tourney_data.users.items() if user_info[_fleet.FLEET_KEY_NAME] == fleet_id}
+                day_before_tourney_data = await self.bot.tournament_data_client.get_second_latest_daily_data()
+                yesterday_users_data = yesterday_tourney_data.get_users_data_by_fleet_id(fleet_id)
+                day_before_users_data = day_before_tourney_data.get_users_data_by_fleet_id(fleet_id)
                 for yesterday_user_info in yesterday_users_data.values():
                     day_before_user_info = day_before_users_data.get(yesterday_user_info[_user.USER_KEY_NAME], {})
                     day_before_star_count = day_before_user_info.get('AllianceScore', 0)
@@ -568,11 +589,11 @@ class TournamentCog(_TournamentCogBase, name='Tournament'):
             raise _Error('It\'s day 1 of the current tournament, there is no data from yesterday.')
         output = []
 
-        yesterday_tourney_data = self.bot.tournament_data_client.get_latest_daily_data()
+        yesterday_tourney_data = await self.bot.tournament_data_client.get_latest_daily_data()
         user_infos = []
 
         if yesterday_tourney_data:
-            user_infos = await _user.get_user_infos_from_tournament_data_by_name_or_id(player_name_or_id, yesterday_tourney_data.users)
+            user_infos = await _user.get_user_infos_from_tournament_data_by_name_or_id(player_name_or_id, yesterday_tourney_data)
 
         if user_infos:
             if len(user_infos) == 1:
@@ -583,7 +604,7 @@ class TournamentCog(_TournamentCogBase, name='Tournament'):
                 _, user_info = await paginator.wait_for_option_selection()
 
             if user_info:
-                day_before_yesterday_tourney_data = self.bot.tournament_data_client.get_second_latest_daily_data()
+                day_before_yesterday_tourney_data = await self.bot.tournament_data_client.get_second_latest_daily_data()
                 day_before_user_info = day_before_yesterday_tourney_data.users.get(user_info[_user.USER_KEY_NAME])
                 if day_before_user_info:
                     user_info['YesterdayAllianceScore'] = day_before_user_info['AllianceScore']
@@ -616,7 +637,7 @@ class TournamentCog(_TournamentCogBase, name='Tournament'):
             await ctx.invoke(subcommand, fleet_name=division)
             return
         else:
-            yesterday_tourney_data = self.bot.tournament_data_client.get_latest_daily_data()
+            yesterday_tourney_data = await self.bot.tournament_data_client.get_latest_daily_data()
             if yesterday_tourney_data:
                 output = await _top.get_division_stars(ctx, division=division, fleet_data=yesterday_tourney_data.fleets, retrieved_date=yesterday_tourney_data.retrieved_at, as_embed=(await _server_settings.get_use_embeds(ctx)))
         await _utils.discord.reply_with_output(ctx, output)
@@ -640,10 +661,10 @@ class TournamentCog(_TournamentCogBase, name='Tournament'):
             raise _Error('It\'s day 1 of the current tournament, there is no data from yesterday.')
         output = []
 
-        yesterday_tourney_data = self.bot.tournament_data_client.get_latest_daily_data()
+        yesterday_tourney_data = await self.bot.tournament_data_client.get_latest_daily_data()
         fleet_infos = []
         if yesterday_tourney_data:
-            fleet_infos = await _fleet.get_fleet_infos_from_tourney_data_by_name(fleet_name, yesterday_tourney_data.fleets)
+            fleet_infos = await _fleet.get_fleet_infos_from_tourney_data_by_name(fleet_name, yesterday_tourney_data)
 
         if fleet_infos:
             if len(fleet_infos) == 1:
@@ -663,7 +684,7 @@ class TournamentCog(_TournamentCogBase, name='Tournament'):
         await _utils.discord.reply_with_output(ctx, output)
 
 
-    def _get_tourney_data(self, month: _Optional[_Union[int, str]] = None, year: _Optional[_Union[int, str]] = None) -> _TourneyData:
+    async def _get_tourney_data(self, month: _Optional[_Union[int, str]] = None, year: _Optional[_Union[int, str]] = None) -> _TourneyData:
         if year is not None and month is None:
             raise _MissingParameterError('If the parameter `year` is specified, the parameter `month` must be specified, too.')
 
@@ -680,7 +701,7 @@ class TournamentCog(_TournamentCogBase, name='Tournament'):
                     year -= 1
             year = int(year)
             data_date = self.bot.tournament_data_client.make_data_date(year, month)
-        tourney_data = self.bot.tournament_data_client.get_data(data_date)
+        tourney_data = await self.bot.tournament_data_client.get_data(data_date)
         return tourney_data
 
 
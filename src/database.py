@@ -56,8 +56,11 @@ async def export_to_json() -> str:
 
 async def import_from_json(json: str) -> None:
     tables = _json.loads(json, cls=utils.json.YadcDecoder)
+    batches = []
     for table_name, table_contents in tables.items():
-        await _import_table(table_name, table_contents['column_names'], table_contents['values'])
+        batches.extend(_get_import_table_batches(table_name, table_contents['column_names'], table_contents['values']))
+        print(f'[import_from_json] Clearing table and importing {len(table_contents["values"])} rows: {table_name}')
+    await execute_batches(batches)
 
 
 async def _export_table(table_name: str) -> dict:
@@ -74,16 +77,21 @@ async def _import_table(table_name: str, column_names: List[str], rows: List[Lis
     """
     This function will clear the specified table and insert the values provided.
     """
+    print(f'[_import_table] Clearing table and importing {len(rows)} rows: {table_name}')
+    await execute_batches(_get_import_table_batches(table_name, column_names, rows))
+
+
+def _get_import_table_batches(table_name: str, column_names: List[str], rows: List[List[Any]]) -> List[Tuple[str, List[list]]]:
+    """
+    Returns the batches for `execute_batches` clearing the specified table and inserting the values provided.
+    """
     column_names_string = ','.join(column_names)
     values_string = ', '.join([f'${i}' for i in range(1, len(column_names) + 1)])
     query = f'INSERT INTO {table_name} ({column_names_string}) VALUES ({values_string})'
-
-    print(f'[_import_table] Clearing table: {table_name}')
-    await execute(f'DELETE FROM {table_name}')
-
-    print(f'[_import_table] Importing data to table: {table_name}')
-    for values in rows:
-        await execute(query, values)
+    return [
+        (f'DELETE FROM {table_name}', None),
+        (query, rows),
+    ]
 
 
 
@@ -592,6 +600,24 @@ async def execute(query: str, args: list = None) -> bool:
                 await connection.execute(query)
 
 
+async def execute_batches(batches: List[Tuple[str, List[list]]]) -> None:
+    """
+    Parameter 'batches':
+    - Tuples of (query, list of argument lists). Each query is prepared once and executed for every list of arguments. If there are no argument lists, the query is executed once without arguments.
+
+    All batches are executed in a single transaction.
+    """
+    __log_db_function_enter('execute_batches', batches=batches)
+
+    async with CONNECTION_POOL.acquire() as connection:
+        async with connection.transaction():
+            for query, args_list in batches:
+                if args_list:
+                    await connection.executemany(query, args_list)
+                else:
+                    await connection.execute(query)
+
+
 async def fetchall(query: str, args: list = None) -> List[asyncpg.Record]:
     __log_db_function_enter('fetchall', query=f'\'{query}\'', args=args)
 
@@ -708,6 +734,43 @@ async def try_execute(query: str, args: list = None, raise_db_error: bool = Fals
     return success
 
 
+async def try_execute_batches(batches: List[Tuple[str, List[list]]], raise_db_error: bool = False) -> bool:
+    """
+    See `execute_batches`.
+    """
+    __log_db_function_enter('try_execute_batches', batches=batches, raise_db_error=raise_db_error)
+
+    batches = [(query if not query or query[-1] == ';' else f'{query};', args_list) for query, args_list in batches]
+    if not batches:
+        return True
+    success = False
+    if await connect():
+        try:
+            await execute_batches(batches)
+            success = True
+        except (asyncpg.exceptions.PostgresError, asyncpg.PostgresError) as pg_error:
+            if raise_db_error:
+                raise pg_error
+            else:
+                print_db_query_error('try_execute_batches', '\n'.join(query for query, _ in batches), [args_list for _, args_list in batches], pg_error)
+                success = False
+        except Exception as error:
+            print_db_query_error('try_execute_batches', '\n'.join(query for query, _ in batches), [args_list for _, args_list in batches], error)
+            success = False
+    else:
+        print('[try_execute_batches] could not connect to db')
+    return success
+
+
+async def try_execute_many(query: str, args_list: List[list], raise_db_error: bool = False) -> bool:
+    """
+    Executes the query once for every list of arguments in a single transaction.
+    """
+    if not args_list:
+        return True
+    return await try_execute_batches([(query, args_list)], raise_db_error=raise_db_error)
+
+
 async def get_setting(setting_name: str) -> Tuple[object, datetime]:
     __log_db_function_enter('get_setting', setting_name=f'\'{setting_name}\'')
 
@@ -821,43 +884,32 @@ async def set_setting(setting_name: str, value: Any, utc_now: datetime = None) -
 
 
 async def set_settings(settings: Dict[str, Tuple[object, datetime]]) -> bool:
+    """
+    Inserts or updates all settings in a single transaction. Settings of the same type are written with a single prepared statement.
+    """
     __log_db_function_enter('set_settings', settings=settings)
 
-    utc_now = utils.get_utc_now()
     if settings:
-        query_lines = []
-        args = []
-        success = True
-        current_settings = await get_settings(settings.keys())
+        args_lists: Dict[str, List[list]] = {}
         for setting_name, (value, modified_at) in settings.items():
-            query = ''
-            column_name = None
             if isinstance(value, bool):
                 column_name = 'settingboolean'
-                value = utils.database.convert_boolean(value)
             elif isinstance(value, int):
                 column_name = 'settingint'
             elif isinstance(value, float):
                 column_name = 'settingfloat'
             elif isinstance(value, datetime):
                 column_name = 'settingtimestamptz'
-                value = utils.database.convert_timestamp(value)
             else:
                 column_name = 'settingtext'
-                value = utils.database.convert_text(value)
-            current_value, db_modify_date = current_settings[setting_name]
-            modify_date = db_modify_date or utc_now
-
-            setting_name = utils.database.convert_text(setting_name)
-            if current_value is None and db_modify_date is None:
-                query = f'INSERT INTO settings ({column_name}, modifydate, settingname) VALUES ({value}, \'{modified_at}\', {setting_name});'
-            elif current_value != value:
-                query = f'UPDATE settings SET {column_name} = {value}, modifydate = \'{modified_at}\' WHERE settingname = {setting_name};'
-
-            if query:
-                query_lines.append(query)
-                args.extend([value, modified_at, setting_name])
-        success = not query_lines or await try_execute('\n'.join(query_lines))
+                value = str(value) if value is not None else None
+            args_lists.setdefault(column_name, []).append([setting_name, modified_at, value])
+
+        batches = []
+        for column_name, args_list in args_lists.items():
+            query = f'INSERT INTO settings (settingname, modifydate, {column_name}) VALUES ($1, $2, $3) ON CONFLICT (settingname) DO UPDATE SET {column_name} = EXCLUDED.{column_name}, modifydate = EXCLUDED.modifydate'
+            batches.append((query, args_list))
+        success = await try_execute_batches(batches)
         if success:
             __settings_cache.update(settings)
         return success
@@ -866,26 +918,29 @@ async def set_settings(settings: Dict[str, Tuple[object, datetime]]) -> bool:
 
 
 async def update_sales_info(sales_info: Dict[str, Any]) -> bool:
+    """
+    Updates the sales info with the same expiry date or inserts it, if there's none, in a single statement.
+    """
     __log_db_function_enter('update_sales_info', sales_info=sales_info)
 
-    db_sales_infos = await get_sales_infos(expiry_date=sales_info['LimitedCatalogExpiryDate'])
     column_names = []
     placeholders = []
     set_fields = []
     args = []
+    expiry_date_placeholder = None
     for i, column_name in enumerate(sales_info, start=1):
         args.append(sales_info[column_name])
         column_name = column_name.lower()
         column_names.append(column_name)
         placeholders.append(f'${i}')
         set_fields.append(f'{column_name} = ${i}')
+        if column_name == 'limitedcatalogexpirydate':
+            expiry_date_placeholder = f'${i}'
 
-    if db_sales_infos:
-        current_sales_info = db_sales_infos[0]
-        current_sales_info_id = current_sales_info['id']
-        query = f'UPDATE sales SET {", ".join(set_fields)} WHERE id = {current_sales_info_id}'
-    else:
-        query = f'INSERT INTO sales ({", ".join(column_names)}) VALUES ({", ".join(placeholders)})'
+    query = (
+        f'WITH updated AS (UPDATE sales SET {", ".join(set_fields)} WHERE limitedcatalogexpirydate = {expiry_date_placeholder} RETURNING id) '
+        f'INSERT INTO sales ({", ".join(column_names)}) SELECT {", ".join(placeholders)} WHERE NOT EXISTS (SELECT 1 FROM updated)'
+    )
     success = await try_execute(query, args)
     return success
 
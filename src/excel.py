@@ -1,14 +1,16 @@
+import csv
 from datetime import datetime, timezone
 from enum import IntEnum
 import re
-from typing import Any, Dict, Iterable, List, Optional, Union
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import NamedStyle
 from openpyxl.worksheet.table import TableStyleInfo
-import openpyxl.utils.dataframe
-import pandas
 
 from . import pss_tournament as tourney
+from . import settings
 from . import utils
 
 
@@ -91,56 +93,100 @@ def __fix_field_for_csv(value: Any, delimiter: str, fix_columns: Iterable[int],
     return value
 
 
-def create_xl_from_data(data: List[Iterable[Any]], file_prefix: str, data_retrieved_at: datetime, column_formats: List[str], file_name: Optional[str] = None) -> str:
-    if data_retrieved_at is None:
-        data_retrieved_at = utils.get_utc_now()
-    save_to = file_name or get_file_name(file_prefix, data_retrieved_at, FILE_ENDING.XL)
-
-    wb = openpyxl.Workbook()
-    ws = wb.active
+def create_csv_from_raw_data_dict(flattened_data: List[Dict[str, Any]], file_prefix: str, data_retrieved_at: Optional[datetime] = None, file_name: Optional[str] = None) -> Optional[str]:
+    """
+    Creates a comma separated file with a column for every key found in flattened_data.
+    """
+    if not flattened_data:
+        return None
+    column_names, rows = __get_rows_from_raw_data_dict(flattened_data)
+    return create_csv_from_rows(rows, column_names, file_prefix, data_retrieved_at, file_name=file_name, consider_tourney=False)
 
-    for item in data:
-        ws.append(item)
 
-    col_count = len(data[0]) + 1
-    row_count = len(data) + 1
-    for i, col_no in enumerate(range(1, col_count)):
-        column_format = column_formats[i]
-        if column_format:
-            for row_no in range(2, row_count):
-                ws.cell(row_no, col_no).number_format = column_format
+def create_csv_from_rows(rows: Iterable[Iterable[Any]], column_names: List[str], file_prefix: str, data_retrieved_at: Optional[datetime] = None, file_name: Optional[str] = None, consider_tourney: bool = True) -> str:
+    """
+    Writes the rows to a comma separated file one after the other. Use this for data sets too large for a spreadsheet.
+    """
+    if data_retrieved_at is None:
+        data_retrieved_at = utils.get_utc_now()
+    save_to = file_name or get_file_name(file_prefix, data_retrieved_at, FILE_ENDING.CSV, consider_tourney=consider_tourney)
 
-    wb.save(save_to)
+    with open(save_to, mode='w', newline='', encoding='utf-8') as fp:
+        writer = csv.writer(fp)
+        writer.writerow(column_names)
+        writer.writerows(rows)
     return save_to
 
 
-def create_xl_from_raw_data_dict(flattened_data: List[Iterable[Any]], file_prefix: str, data_retrieved_at: Optional[datetime] = None, file_name: Optional[str] = None) -> str:
+def create_xl_from_data(data: List[Iterable[Any]], file_prefix: str, data_retrieved_at: datetime, column_formats: List[str], file_name: Optional[str] = None) -> str:
+    """
+    The first line of data contains the column names.
+    """
+    return create_xl_from_rows(data[1:], list(data[0]), file_prefix, data_retrieved_at, column_formats=column_formats, file_name=file_name, add_table=False)
+
+
+def create_xl_from_raw_data_dict(flattened_data: List[Dict[str, Any]], file_prefix: str, data_retrieved_at: Optional[datetime] = None, file_name: Optional[str] = None) -> str:
+    """
+    Creates a spreadsheet with a column for every key found in flattened_data. If there are more entries than `settings.EXCEL_MAX_ROWS`, a csv file will be created instead.
+    """
+    if not flattened_data:
+        return None
+    if len(flattened_data) > settings.EXCEL_MAX_ROWS:
+        if file_name:
+            file_name = f'{file_name.rsplit(".", 1)[0]}.{__FILE_ENDING_LOOKUP[FILE_ENDING.CSV]}'
+        return create_csv_from_raw_data_dict(flattened_data, file_prefix, data_retrieved_at, file_name=file_name)
+    column_names, rows = __get_rows_from_raw_data_dict(flattened_data)
+    return create_xl_from_rows(rows, column_names, file_prefix, data_retrieved_at, file_name=file_name, consider_tourney=False)
+
+
+def create_xl_from_rows(rows: Iterable[Iterable[Any]], column_names: List[str], file_prefix: str, data_retrieved_at: Optional[datetime] = None, column_formats: Optional[List[Optional[str]]] = None, file_name: Optional[str] = None, consider_tourney: bool = True, add_table: bool = True) -> Optional[str]:
+    """
+    Writes the rows to a write-only workbook one after the other, so the whole table is never held in memory. Returns None, if there are no rows.
+
+    Parameter 'column_formats':
+    - A number format per column or None, if a column should keep the default format. Gets applied via named styles.
+    Parameter 'add_table':
+    - Formats the data as a table.
+    """
     if data_retrieved_at is None:
         data_retrieved_at = utils.get_utc_now()
-    if flattened_data:
-        save_to = file_name or get_file_name(file_prefix, data_retrieved_at, FILE_ENDING.XL, consider_tourney=False)
-
-        wb = openpyxl.Workbook(write_only=True)
-        ws: openpyxl.worksheet.worksheet.Worksheet = wb.create_sheet()
-        df = pandas.DataFrame(flattened_data)
-        for (columnName, columnData) in df.items():
-            if 'datetime64' in columnData.dtype.name:
-                df[columnName] = df[columnName].dt.tz_convert(None)
+    save_to = file_name or get_file_name(file_prefix, data_retrieved_at, FILE_ENDING.XL, consider_tourney=consider_tourney)
 
-        for row in openpyxl.utils.dataframe.dataframe_to_rows(df, index=False, header=True):
-            if row:
-                ws.append(row)
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
 
-        table = openpyxl.worksheet.table.Table(displayName='tbl', ref=__get_ref_for_df(df))
+    style_names: Dict[int, str] = {}
+    for column_no, column_format in enumerate(column_formats or []):
+        if column_format:
+            style_name = f'column_{column_no}'
+            wb.add_named_style(NamedStyle(name=style_name, number_format=column_format))
+            style_names[column_no] = style_name
+
+    ws.append(column_names)
+    row_count = 0
+    for row in rows:
+        values = [__fix_value_for_xl(value) for value in row]
+        for column_no, style_name in style_names.items():
+            if column_no < len(values):
+                cell = WriteOnlyCell(ws, value=values[column_no])
+                cell.style = style_name
+                values[column_no] = cell
+        ws.append(values)
+        row_count += 1
+
+    if not row_count:
+        wb.close()
+        return None
+
+    if add_table:
+        table = openpyxl.worksheet.table.Table(displayName='tbl', ref=__convert_to_ref(len(column_names) - 1, row_count))
         table.tableStyleInfo = __BASE_TABLE_STYLE
         table._initialise_columns()
-        for cell, col in zip(df.columns, table.tableColumns):
-            col.name = str(cell)
+        for column_name, table_column in zip(column_names, table.tableColumns):
+            table_column.name = str(column_name)
         ws.add_table(table)
 
-        wb.save(save_to)
-    else:
-        save_to = None
+    wb.save(save_to)
     return save_to
 
 
@@ -198,11 +244,22 @@ def __convert_to_ref(column_count: int, row_count: int, column_start: int = 0, r
     return result
 
 
-def __get_ref_for_df(df: pandas.DataFrame, column_start: int = 0, row_start: int = 0, zero_based: bool = True) -> str:
-    col_count = len(df.columns) - 1
-    row_count = len(df.index)
-    ref = __convert_to_ref(col_count, row_count, column_start=column_start, row_start=row_start, zero_based=zero_based)
-    return ref
+def __get_rows_from_raw_data_dict(flattened_data: List[Dict[str, Any]]) -> Tuple[List[str], Iterator[List[Any]]]:
+    """
+    Returns the keys found in flattened_data in the order of their first occurence and a generator creating a row per entry.
+    """
+    column_names = list(dict.fromkeys(key for entry in flattened_data for key in entry.keys()))
+    rows = ([entry.get(column_name) for column_name in column_names] for entry in flattened_data)
+    return column_names, rows
+
+
+def __fix_value_for_xl(value: Any) -> Any:
+    """
+    Excel can't store timezones, so datetimes get converted to UTC.
+    """
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
 
 
 
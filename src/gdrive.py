@@ -1,15 +1,22 @@
+import asyncio
 import calendar
+from collections import OrderedDict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 import json
 import os
-import random
-from threading import Lock
-import time
-from typing import Dict, List, Optional, Tuple, Union
+import pickle
+import re
+import sys
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 import urllib.parse
 import yaml
+import zlib
 
 from discord.ext.commands import Context
+import numpy as np
 import pydrive.auth
 import pydrive.drive
 import pydrive.files
@@ -33,7 +40,25 @@ class TourneyData(object):
         if not self.__meta.get('schema_version', None):
             self.__meta['schema_version'] = 3
 
-        if self.__meta['schema_version'] >= 9:
+        self.__users_table: TourneyUsersTable = None
+        self.__fleet_name_index: TourneyNameIndex = None
+        self.__user_name_index: TourneyNameIndex = None
+
+        if self.__meta['schema_version'] >= 4 and settings.TOURNEY_DATA_COLUMNAR:
+            if self.__meta['schema_version'] >= 7:
+                self.__fleets = TourneyData.__create_fleet_data_from_data_v7(data['fleets'], data['users'])
+            elif self.__meta['schema_version'] >= 6:
+                self.__fleets = TourneyData.__create_fleet_data_from_data_v6(data['fleets'], data['users'])
+            else:
+                self.__fleets = TourneyData.__create_fleet_data_from_data_v4(data['fleets'], data['users'])
+            try:
+                self.__users_table = TourneyUsersTable(data['users'], self.__fleets, self.__meta['schema_version'])
+            except (TypeError, ValueError) as ex:
+                print(f'[TourneyData] Could not create columnar user data, falling back to dicts: {ex}')
+
+        if self.__users_table is not None:
+            self.__users = TourneyUsersView(self.__users_table)
+        elif self.__meta['schema_version'] >= 9:
             self.__fleets = TourneyData.__create_fleet_data_from_data_v7(data['fleets'], data['users']) # No change to prior schema version
             self.__users = TourneyData.__create_user_dict_from_data_v9(data['users'], self.__fleets)
         elif self.__meta['schema_version'] >= 8:
@@ -59,14 +84,18 @@ class TourneyData(object):
         self.__data_date_key: str = TourneyData.create_data_date_key(self.data_date)
 
         self.__top_100_users: EntitiesData = {}
-        top_users_infos = sorted(list(self.__users.values()), key=lambda user_info: -int(user_info.get('Trophy', 0)))[:100]
-        top_users_ids = [user_info['Id'] for user_info in top_users_infos]
-        for key, value in self.__users.items():
-            if key in top_users_ids:
-                self.__top_100_users[key] = value
-                top_users_ids.remove(key)
-                if not top_users_ids:
-                    break
+        if self.__users_table is not None:
+            top_users_ids = set(self.__users_table.get_top_user_ids('Trophy', 100))
+            self.__top_100_users = {user_id: self.__users_table.get_user_info(user_id) for user_id in self.__users_table.user_ids if user_id in top_users_ids}
+        else:
+            top_users_infos = sorted(list(self.__users.values()), key=lambda user_info: -int(user_info.get('Trophy', 0)))[:100]
+            top_users_ids = [user_info['Id'] for user_info in top_users_infos]
+            for key, value in self.__users.items():
+                if key in top_users_ids:
+                    self.__top_100_users[key] = value
+                    top_users_ids.remove(key)
+                    if not top_users_ids:
+                        break
 
 
     @property
@@ -129,6 +158,15 @@ class TourneyData(object):
         """
         return dict({key: dict(value) for key, value in self.__fleets.items()})
 
+    @property
+    def fleet_name_index(self) -> 'TourneyNameIndex':
+        """
+        Search index over the fleet names. Gets created on first access.
+        """
+        if self.__fleet_name_index is None:
+            self.__fleet_name_index = TourneyNameIndex((fleet_id, fleet_info.get('AllianceName')) for fleet_id, fleet_info in self.__fleets.items())
+        return self.__fleet_name_index
+
     @property
     def max_tournament_battle_attempts(self) -> Optional[int]:
         """
@@ -188,16 +226,45 @@ class TourneyData(object):
     @property
     def users(self) -> EntitiesData:
         """
-        Copy of user data
+        Copy of user data. If the data is stored in columns, this is a read-only mapping creating a new dict on every access.
         """
+        if self.__users_table is not None:
+            return self.__users
         return dict({key: dict(value) for key, value in self.__users.items()})
 
+    @property
+    def user_name_index(self) -> 'TourneyNameIndex':
+        """
+        Search index over the user names. Gets created on first access.
+        """
+        if self.__user_name_index is None:
+            self.__user_name_index = TourneyNameIndex((user_id, user_name) for user_id, user_name, _, _ in self.get_user_summaries())
+        return self.__user_name_index
+
+    @property
+    def users_table(self) -> Optional['TourneyUsersTable']:
+        """
+        Columnar user data, if available.
+        """
+        return self.__users_table
+
+
+    def create_name_indices(self) -> None:
+        """
+        Blocking. Creates the search indices over the fleet and user names, so that the first lookup by name doesn't have to.
+        """
+        _ = self.fleet_name_index
+        _ = self.user_name_index
+
 
-    def get_fleet_data_by_id(self, fleet_id: str) -> EntityInfo:
+    def get_fleet_data_by_id(self, fleet_id: str) -> Optional[EntityInfo]:
         """
-        Look up fleet by id
+        Look up fleet by id. Returns None, if the fleet can't be found.
         """
-        return dict(self.__fleets.get(fleet_id, None))
+        fleet_info = self.__fleets.get(fleet_id, None)
+        if fleet_info is None:
+            return None
+        return dict(fleet_info)
 
 
     def get_fleet_data_by_name(self, fleet_name: str) -> EntitiesData:
@@ -205,19 +272,17 @@ class TourneyData(object):
         Looks up fleets having the specified fleet_name in their name.
         Case-insensitive.
         """
-        result = {}
-        for current_fleet_id, current_fleet_data in self.__fleets.items():
-            current_fleet_name = current_fleet_data.get('Name', None)
-            if current_fleet_name and fleet_name.lower() in current_fleet_name.lower():
-                result[current_fleet_id] = dict(current_fleet_data)
-        return result
+        return {fleet_id: dict(self.__fleets[fleet_id]) for fleet_id in self.fleet_name_index.get_ids(fleet_name)}
 
 
-    def get_user_data_by_id(self, user_id: str) -> EntityInfo:
+    def get_user_data_by_id(self, user_id: str) -> Optional[EntityInfo]:
         """
-        Look up user by id
+        Look up user by id. Returns None, if the user can't be found.
         """
-        return dict(self.__users.get(user_id, None))
+        user_info = self.__users.get(user_id, None)
+        if user_info is None:
+            return None
+        return dict(user_info)
 
 
     def get_user_data_by_name(self, user_name: str) -> EntitiesData:
@@ -225,13 +290,50 @@ class TourneyData(object):
         Looks up users having the specified user_name in their name.
         Case-insensitive.
         """
-        result = {}
-        for current_user_id, current_user_data in self.__users.items():
-            current_user_name = str(current_user_data.get('Name', '')) or None
-            if current_user_name and user_name.lower() in current_user_name.lower():
-                result[current_user_id] = dict(current_user_data)
-        return result
-    
+        return {user_id: dict(self.__users[user_id]) for user_id in self.user_name_index.get_ids(user_name)}
+
+
+    def get_user_summaries(self) -> List[Tuple[str, str, str, str]]:
+        """
+        Returns tuples of (user id, user name, fleet id, trophies) for all users without creating the user dicts.
+        """
+        if self.__users_table is not None:
+            return self.__users_table.get_user_summaries()
+        return [(user_id, user_info.get('Name'), str(user_info.get('AllianceId') or '0'), str(user_info.get('Trophy') or '')) for user_id, user_info in self.__users.items()]
+
+
+    def get_users_data_by_fleet_id(self, fleet_id: str) -> EntitiesData:
+        """
+        Returns copies of the user data of the members of a fleet. Only the matching users get created, if the data is stored in columns.
+        """
+        if self.__users_table is not None:
+            return self.__users.get_users_by_fleet_id(fleet_id)
+        return {user_id: dict(user_info) for user_id, user_info in self.__users.items() if user_info.get('AllianceId') == fleet_id}
+
+
+    def __getstate__(self) -> Dict[str, object]:
+        """
+        The name indices don't get pickled. They'll be created again, when needed.
+        """
+        state = dict(self.__dict__)
+        state['_TourneyData__fleet_name_index'] = None
+        state['_TourneyData__user_name_index'] = None
+        return state
+
+
+    def __setstate__(self, state: Dict[str, object]) -> None:
+        state.setdefault('_TourneyData__fleet_name_index', None)
+        state.setdefault('_TourneyData__user_name_index', None)
+        self.__dict__.update(state)
+
+
+    @staticmethod
+    def convert_timestamp(timestamp: int) -> str:
+        """
+        Converts a timestamp from the tournament data (seconds since the PSS start date) to a PSS datetime string.
+        """
+        return TourneyData.__convert_timestamp_v4(timestamp)
+
 
     @staticmethod
     def create_data_date_key(dt: datetime) -> str:
@@ -546,8 +648,279 @@ class TourneyData(object):
 
 
 
+class TourneyDataCache():
+    """
+    In-memory LRU cache for `TourneyData` with a budget in bytes. Entries can be pinned, so they won't get evicted. Evicted entries can be spilled to a folder on disk, so they can be loaded again without downloading them. At most max_spill_files files are kept on disk, the least recently used ones get removed.
+
+    The size of an entry is estimated by the size of the file it has been retrieved from.
+    """
+    def __init__(self, max_bytes: int, spill_path: str = None, max_spill_files: int = None) -> None:
+        self.__max_bytes: int = max_bytes
+        self.__spill_path: str = spill_path
+        self.__max_spill_files: int = max_spill_files
+        self.__entries: 'OrderedDict[str, Tuple[TourneyData, int]]' = OrderedDict()
+        self.__pinned_keys: Set[str] = set()
+        self.__size: int = 0
+
+        self.__evictions: int = 0
+        self.__hits: int = 0
+        self.__misses: int = 0
+        self.__spill_hits: int = 0
+        self.__spills: int = 0
+
+
+    @property
+    def max_bytes(self) -> int:
+        return self.__max_bytes
+
+    @property
+    def size(self) -> int:
+        """
+        Estimated number of bytes held in memory.
+        """
+        return self.__size
+
+    @property
+    def statistics(self) -> Dict[str, int]:
+        return {
+            'entries': len(self.__entries),
+            'size': self.__size,
+            'max_bytes': self.__max_bytes,
+            'hits': self.__hits,
+            'misses': self.__misses,
+            'evictions': self.__evictions,
+            'spills': self.__spills,
+            'spill_hits': self.__spill_hits,
+        }
+
+
+    def get(self, data_date_key: str) -> Optional[TourneyData]:
+        entry = self.__entries.get(data_date_key)
+        if entry is None:
+            self.__misses += 1
+            return None
+        self.__hits += 1
+        self.__entries.move_to_end(data_date_key)
+        return entry[0]
+
+
+    def pin(self, data_date_keys: List[str]) -> None:
+        """
+        Replaces the keys of entries that must not be evicted.
+        """
+        self.__pinned_keys = set(data_date_keys)
+
+
+    def put(self, tourney_data: TourneyData, size: int) -> List[Tuple[TourneyData, int]]:
+        """
+        Adds the data and evicts the least recently used entries, which are not pinned, until the cache fits its budget.
+
+        Returns the evicted entries. Pass them to `spill` to keep them on disk.
+        """
+        key = tourney_data.data_date_key
+        old_entry = self.__entries.pop(key, None)
+        if old_entry:
+            self.__size -= old_entry[1]
+        self.__entries[key] = (tourney_data, size)
+        self.__size += size
+
+        result = []
+        for evict_key in list(self.__entries.keys()):
+            if self.__size <= self.__max_bytes:
+                break
+            if evict_key == key or evict_key in self.__pinned_keys:
+                continue
+            evicted_entry = self.__entries.pop(evict_key)
+            self.__size -= evicted_entry[1]
+            self.__evictions += 1
+            result.append(evicted_entry)
+        return result
+
+
+    def read_spilled(self, data_date_key: str) -> Optional[Tuple[TourneyData, int]]:
+        """
+        Blocking. Loads an entry from disk, if it has been spilled before.
+        """
+        file_path = self.__get_spill_file_path(data_date_key)
+        if not file_path or not os.path.isfile(file_path):
+            return None
+        try:
+            with open(file_path, 'rb') as spill_file:
+                result = pickle.loads(zlib.decompress(spill_file.read()))
+            # Mark the file as recently used
+            os.utime(file_path)
+        except Exception as ex:
+            print(f'[TourneyDataCache] Could not read spilled data from file \'{file_path}\': {ex}')
+            return None
+        self.__spill_hits += 1
+        return result
+
+
+    def spill(self, tourney_data: TourneyData, size: int) -> bool:
+        """
+        Blocking. Writes an entry to disk, if it hasn't been written, yet.
+        """
+        file_path = self.__get_spill_file_path(tourney_data.data_date_key)
+        if not file_path:
+            return False
+        if os.path.isfile(file_path):
+            return True
+        os.makedirs(self.__spill_path, exist_ok=True)
+        temp_file_path = f'{file_path}.tmp'
+        with open(temp_file_path, 'wb') as spill_file:
+            spill_file.write(zlib.compress(pickle.dumps((tourney_data, size), protocol=pickle.HIGHEST_PROTOCOL), 1))
+        os.replace(temp_file_path, file_path)
+        self.__spills += 1
+        self.__remove_outdated_spill_files(file_path)
+        return True
+
+
+    def __get_spill_file_path(self, data_date_key: str) -> Optional[str]:
+        if not self.__spill_path:
+            return None
+        file_name = data_date_key.replace(':', '-')
+        return os.path.join(self.__spill_path, f'{file_name}.bin')
+
+
+    def __remove_outdated_spill_files(self, keep_file_path: str) -> None:
+        """
+        Blocking. Removes the least recently used spill files, if there are more than max_spill_files.
+        """
+        if not self.__max_spill_files:
+            return
+        file_paths = [entry.path for entry in os.scandir(self.__spill_path) if entry.is_file() and entry.name.endswith('.bin')]
+        if len(file_paths) <= self.__max_spill_files:
+            return
+        file_paths.sort(key=TourneyDataCache.__get_mtime, reverse=True)
+        for file_path in file_paths[self.__max_spill_files:]:
+            if file_path != keep_file_path:
+                try:
+                    os.remove(file_path)
+                except OSError:
+                    pass
+
+
+    @staticmethod
+    def __get_mtime(file_path: str) -> float:
+        try:
+            return os.path.getmtime(file_path)
+        except OSError:
+            return 0.0
+
+
+
+
+
+class TourneyUserHistory():
+    """
+    Names, fleets and trophies of users per tournament month, recorded from the `TourneyData` loaded by a `TourneyDataClient`. The records stay available after the data has been evicted from the cache.
+
+    For every month the most recently retrieved data recorded wins.
+    """
+    def __init__(self) -> None:
+        self.__lock: threading.Lock = threading.Lock()
+        self.__months: Dict[Tuple[int, int], datetime] = {}
+        self.__users: Dict[str, Dict[Tuple[int, int], Tuple[str, str, str, str]]] = {}
+        self.__name_index: TourneyNameIndex = None
+
+
+    @property
+    def months(self) -> List[Tuple[int, int]]:
+        """
+        Tuples of (year, month) that have been recorded in chronological order.
+        """
+        with self.__lock:
+            return sorted(self.__months.keys())
+
+    @property
+    def statistics(self) -> Dict[str, int]:
+        with self.__lock:
+            return {
+                'months': len(self.__months),
+                'users': len(self.__users),
+            }
+
+
+    def add(self, tourney_data: TourneyData) -> bool:
+        """
+        Blocking. Records the users of tourney_data, unless more recent data of the same tournament month has been recorded already.
+        """
+        month = (tourney_data.retrieved_year, tourney_data.retrieved_month)
+        fleet_names = {fleet_id: fleet_info.get('AllianceName') for fleet_id, fleet_info in tourney_data.fleets.items()}
+
+        with self.__lock:
+            recorded_at = self.__months.get(month)
+            if recorded_at is not None and recorded_at >= tourney_data.retrieved_at:
+                return False
+            for user_id, user_name, fleet_id, trophies in tourney_data.get_user_summaries():
+                user_id = sys.intern(str(user_id))
+                fleet_id = sys.intern(fleet_id)
+                fleet_name = fleet_names.get(fleet_id)
+                self.__users.setdefault(user_id, {})[month] = (
+                    sys.intern(str(user_name or '')),
+                    fleet_id,
+                    sys.intern(fleet_name) if fleet_name else None,
+                    trophies,
+                )
+            self.__months[month] = tourney_data.retrieved_at
+            self.__name_index = None
+        return True
+
+
+    def contains_user(self, user_id: str) -> bool:
+        with self.__lock:
+            return user_id in self.__users
+
+
+    def get_user_history(self, user_id: str) -> List[EntityInfo]:
+        """
+        Returns a user dict for every recorded month the user appeared in in chronological order. Each dict has the keys 'Id', 'Name', 'AllianceId', 'AllianceName', 'Trophy', 'Year' and 'Month'.
+        """
+        with self.__lock:
+            user_months = dict(self.__users.get(user_id, {}))
+        result = []
+        for (year, month), (user_name, fleet_id, fleet_name, trophies) in sorted(user_months.items()):
+            result.append({
+                'Id': user_id,
+                'Name': user_name,
+                'AllianceId': fleet_id,
+                'AllianceName': fleet_name,
+                'Trophy': trophies,
+                'Year': year,
+                'Month': month,
+            })
+        return result
+
+
+    def get_user_ids_by_name(self, user_name: str) -> List[str]:
+        """
+        Returns the ids of the users who had the specified user_name in their name in any recorded month.
+        Case-insensitive.
+        """
+        with self.__lock:
+            if self.__name_index is None:
+                self.__name_index = TourneyNameIndex(
+                    (user_id, name)
+                    for user_id, user_months in self.__users.items()
+                    for name in set(entry[0] for entry in user_months.values())
+                )
+            name_index = self.__name_index
+        return name_index.get_ids(user_name)
+
+
+
+
+
 class TourneyDataClient():
-    def __init__(self, project_id: str, private_key_id: str, private_key: str, client_email: str, client_id: str, scopes: List[str], folder_id: str, service_account_file_path: str, settings_file_path: str, earliest_date: datetime) -> None:
+    def __init__(self, project_id: str, private_key_id: str, private_key: str, client_email: str, client_id: str, scopes: List[str], folder_id: str, service_account_file_path: str, settings_file_path: str, earliest_date: datetime, drive: 'MockDrive' = None, max_workers: int = None, cache: TourneyDataCache = None) -> None:
+        """
+        Parameter 'drive':
+        - If specified, it will be used instead of connecting to Google Drive. Use a `MockDrive` to work with local files.
+        Parameter 'max_workers':
+        - Number of threads used to download and parse files. Defaults to `settings.GDRIVE_MAX_WORKERS`.
+        Parameter 'cache':
+        - Holds the retrieved data. Defaults to a `TourneyDataCache` configured via `settings.TOURNEY_DATA_CACHE_MAX_BYTES` and `settings.TOURNEY_DATA_CACHE_SPILL_PATH`.
+        """
         print('Create TourneyDataClient')
         self._client_email: str = client_email
         self._client_id: str = client_id
@@ -561,17 +934,22 @@ class TourneyDataClient():
         self.__earliest_date: datetime = earliest_date
         self.__earliest_data_date: datetime = TourneyDataClient.make_data_date(self.__earliest_date.year, self.__earliest_date.month, self.__earliest_date.day, self.__earliest_date.hour)
 
-        self.__READ_LOCK: Lock = Lock()
-        self.__WRITE_LOCK: Lock = Lock()
-        self.__write_requested: bool = False
-        self.__reader_count: int = 0
-
-        self.__cache: Dict[int, Dict[int, Dict[int, TourneyData]]] = {}
+        self.__cache: TourneyDataCache = cache or TourneyDataCache(settings.TOURNEY_DATA_CACHE_MAX_BYTES, spill_path=settings.TOURNEY_DATA_CACHE_SPILL_PATH, max_spill_files=settings.TOURNEY_DATA_CACHE_SPILL_MAX_FILES)
+        self.__drive: pydrive.drive.GoogleDrive = drive
+        self.__executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=max_workers or settings.GDRIVE_MAX_WORKERS, thread_name_prefix='TourneyDataClient')
+        self.__spill_executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='TourneyDataClientSpill')
+        self.__retrieval_tasks: Dict[str, asyncio.Task] = {}
+        self.__user_history: TourneyUserHistory = TourneyUserHistory()
 
         self.__initialized = False
-        self.__initialize()
+        for tourney_data, size in self.__initialize():
+            self.__cache_data(tourney_data, size)
 
 
+    @property
+    def cache_statistics(self) -> Dict[str, int]:
+        return self.__cache.statistics
+
     @property
     def earliest_data_date(self) -> datetime:
         return self.__earliest_data_date
@@ -581,8 +959,18 @@ class TourneyDataClient():
         utc_now = utils.get_utc_now()
         return TourneyDataClient.make_data_date(utc_now.year, utc_now.month, utc_now.day, utc_now.hour)
 
+    @property
+    def user_history(self) -> TourneyUserHistory:
+        """
+        Names, fleets and trophies of the users in every tournament month loaded so far.
+        """
+        return self.__user_history
 
-    def get_data(self, data_date: datetime, initializing: bool = False) -> TourneyData:
+
+    async def get_data(self, data_date: datetime) -> TourneyData:
+        """
+        Downloads and parses the data in a worker thread, if it's not cached. Concurrent requests for the same data share a single download.
+        """
         if data_date < self.earliest_data_date:
             raise ValueError(f'There\'s no data from {data_date}. Earliest data available is from {self.earliest_data_date}.')
         
@@ -593,64 +981,59 @@ class TourneyDataClient():
         result = self.__read_data(data_date)
 
         if result is None:
-            result = self.__retrieve_data(data_date, initializing=initializing)
-            self.__cache_data(result)
+            data_date_key = TourneyData.create_data_date_key(data_date)
+            retrieval_task = self.__retrieval_tasks.get(data_date_key)
+            if retrieval_task is None:
+                retrieval_task = asyncio.create_task(self.__retrieve_and_cache_data(data_date))
+                self.__retrieval_tasks[data_date_key] = retrieval_task
+                retrieval_task.add_done_callback(lambda _: self.__retrieval_tasks.pop(data_date_key, None))
+            result = await asyncio.shield(retrieval_task)
 
         return result
 
 
-    def get_latest_daily_data(self, initializing: bool = False) -> TourneyData:
-        utc_now = utils.get_utc_now()
-        data_date = utils.datetime.strip_time(utc_now)
-        result = self.get_data(data_date, initializing=initializing)
+    async def get_latest_daily_data(self) -> TourneyData:
+        result = await self.get_data(TourneyDataClient.__get_latest_daily_data_date())
         return result
 
 
-    def get_latest_monthly_data(self, initializing: bool = False) -> TourneyData:
-        utc_now = utils.get_utc_now()
-        data_date = datetime(utc_now.year, utc_now.month, 1, tzinfo=timezone.utc)
-        result = self.get_data(data_date, initializing=initializing)
+    async def get_latest_monthly_data(self) -> TourneyData:
+        result = await self.get_data(TourneyDataClient.__get_latest_monthly_data_date())
         return result
 
 
-    def get_second_latest_daily_data(self, initializing: bool = False) -> TourneyData:
-        utc_now = utils.get_utc_now()
-        data_date = utils.datetime.strip_time(utc_now - timedelta(days=1))
-        result = self.get_data(data_date, initializing=initializing)
+    async def get_second_latest_daily_data(self) -> TourneyData:
+        result = await self.get_data(TourneyDataClient.__get_second_latest_daily_data_date())
         return result
 
 
-    def __add_reader(self) -> None:
-        with self.__READ_LOCK:
-            self.__reader_count = self.__reader_count + 1
-
-
     def __assert_initialized(self) -> None:
         if self.__drive is None:
             raise Exception('The __drive object has not been initialized, yet!')
 
 
-    def __cache_data(self, tourney_data: TourneyData) -> bool:
+    def __cache_data(self, tourney_data: TourneyData, size: int) -> bool:
+        """
+        Evicted data gets written to disk by a dedicated worker thread, so spilling doesn't delay downloads.
+        """
         if tourney_data:
-            self.__request_write()
-            can_write = False
-            while not can_write:
-                can_write = self.__get_reader_count() == 0
-                if not can_write:
-                    time.sleep(random.random())
-                with self.__WRITE_LOCK:
-                    self.__cache[tourney_data.data_date_key] = tourney_data
-                    self.__write_requested = False
-                return True
-            return False
+            self.__cache.pin([TourneyData.create_data_date_key(data_date) for data_date in TourneyDataClient.__get_pinned_data_dates()])
+            for evicted_tourney_data, evicted_size in self.__cache.put(tourney_data, size):
+                self.__spill_executor.submit(self.__cache.spill, evicted_tourney_data, evicted_size)
+            return True
         return False
 
 
     def __ensure_initialized(self) -> None:
+        """
+        Blocking. Gets called from the worker threads, so it must not access the cache.
+        """
+        if isinstance(self.__drive, MockDrive):
+            return
         try:
             self.__drive.ListFile({'q': f'\'{self._folder_id}\' in parents and title contains \'random string\''}).GetList()
         except pydrive.auth.InvalidConfigError:
-            self.__initialize()
+            self.__initialize_drive()
 
 
     def __get_first_file(self, file_name: str) -> pydrive.files.GoogleDriveFile:
@@ -678,65 +1061,74 @@ class TourneyDataClient():
         return None
 
 
-    def __get_reader_count(self) -> int:
-        with self.__READ_LOCK:
-            result = self.__reader_count
+    def __initialize(self) -> List[Tuple[Optional[TourneyData], int]]:
+        """
+        Blocking. Returns the loaded data and sizes of the pinned data dates not being cached, yet. The caller has to put them into the cache.
+        """
+        self.__initialize_drive()
+        result = []
+        for data_date in TourneyDataClient.__get_pinned_data_dates():
+            if self.__read_data(data_date) is None:
+                result.append(self.__load_data(data_date, initializing=True))
+        self.__initialized = True
         return result
 
 
-    def __get_write_requested(self) -> bool:
-        with self.__WRITE_LOCK:
-            result = self.__write_requested
-        return result
-
+    def __initialize_drive(self) -> None:
+        if not isinstance(self.__drive, MockDrive):
+            TourneyDataClient.create_service_account_credential_json(self._project_id, self._private_key_id, self._private_key, self._client_email, self._client_id, self._service_account_file_path)
+            TourneyDataClient.create_service_account_settings_yaml(self._settings_file_path, self._service_account_file_path, self._scopes)
+            self.__gauth: pydrive.auth.GoogleAuth = pydrive.auth.GoogleAuth(settings_file=self._settings_file_path)
+            credentials = pydrive.auth.ServiceAccountCredentials.from_json_keyfile_name(self._service_account_file_path, self._scopes)
+            self.__gauth.credentials = credentials
+            self.__drive = pydrive.drive.GoogleDrive(self.__gauth)
 
-    def __initialize(self) -> None:
-        TourneyDataClient.create_service_account_credential_json(self._project_id, self._private_key_id, self._private_key, self._client_email, self._client_id, self._service_account_file_path)
-        TourneyDataClient.create_service_account_settings_yaml(self._settings_file_path, self._service_account_file_path, self._scopes)
-        self.__gauth: pydrive.auth.GoogleAuth = pydrive.auth.GoogleAuth(settings_file=self._settings_file_path)
-        credentials = pydrive.auth.ServiceAccountCredentials.from_json_keyfile_name(self._service_account_file_path, self._scopes)
-        self.__gauth.credentials = credentials
-        self.__drive: pydrive.drive.GoogleDrive = pydrive.drive.GoogleDrive(self.__gauth)
-        self.get_latest_monthly_data(initializing=True)
-        self.get_latest_daily_data(initializing=True)
-        self.get_second_latest_daily_data(initializing=True)
-        self.__initialized = True
 
+    def __load_data(self, data_date: datetime, initializing: bool = False) -> Tuple[Optional[TourneyData], int]:
+        """
+        Blocking. Reads spilled data from disk or retrieves it from Google Drive. Creates the name indices of the data and records its users in the user history.
+        """
+        spilled_entry = self.__cache.read_spilled(TourneyData.create_data_date_key(data_date))
+        if spilled_entry:
+            result, size = spilled_entry
+        else:
+            result, size = self.__retrieve_data(data_date, initializing=initializing)
+        if result:
+            result.create_name_indices()
+            self.__user_history.add(result)
+        return result, size
 
-    def __read_data(self, data_date: datetime) -> Optional[TourneyData]:        
-        can_read = False
-        while not can_read:
-            can_read = not self.__get_write_requested()
-            if not can_read:
-                time.sleep(random.random())
 
-        self.__add_reader()
+    def __read_data(self, data_date: datetime) -> Optional[TourneyData]:
         result = self.__cache.get(TourneyData.create_data_date_key(data_date))
-        self.__remove_reader()
         return result
 
 
-    def __remove_reader(self) -> None:
-        with self.__READ_LOCK:
-            self.__reader_count = self.__reader_count - 1
-
+    async def __retrieve_and_cache_data(self, data_date: datetime) -> TourneyData:
+        loop = asyncio.get_running_loop()
+        result, size = await loop.run_in_executor(self.__executor, self.__load_data, data_date)
+        self.__cache_data(result, size)
+        return result
 
-    def __request_write(self) -> None:
-        with self.__WRITE_LOCK:
-            self.__write_requested = True
 
+    def __retrieve_data(self, data_date: datetime, initializing: bool = False) -> Tuple[Optional[TourneyData], int]:
+        """
+        Blocking. Call it via `__retrieve_and_cache_data`, if the event loop is running.
 
-    def __retrieve_data(self, data_date: datetime, initializing: bool = False) -> TourneyData:
+        Returns the data and the size of the retrieved file.
+        """
         if not initializing:
             self.__ensure_initialized()
         g_file = self.__get_latest_file(data_date, initializing=initializing)
         result = None
+        size = 0
         if g_file:
             raw_data = g_file.GetContentString()
+            size = len(raw_data)
             data = json.loads(raw_data)
             if data:
                 result = TourneyData(data)
-        return result
+        return result, size
 
 
     @staticmethod
@@ -778,6 +1170,33 @@ class TourneyDataClient():
             print(f'Created settings yaml file at: {settings_file_path}')
     
 
+    @staticmethod
+    def __get_pinned_data_dates() -> List[datetime]:
+        return [
+            TourneyDataClient.__get_latest_monthly_data_date(),
+            TourneyDataClient.__get_latest_daily_data_date(),
+            TourneyDataClient.__get_second_latest_daily_data_date(),
+        ]
+
+
+    @staticmethod
+    def __get_latest_daily_data_date() -> datetime:
+        utc_now = utils.get_utc_now()
+        return utils.datetime.strip_time(utc_now)
+
+
+    @staticmethod
+    def __get_latest_monthly_data_date() -> datetime:
+        utc_now = utils.get_utc_now()
+        return datetime(utc_now.year, utc_now.month, 1, tzinfo=timezone.utc)
+
+
+    @staticmethod
+    def __get_second_latest_daily_data_date() -> datetime:
+        utc_now = utils.get_utc_now()
+        return utils.datetime.strip_time(utc_now - timedelta(days=1))
+
+
     @staticmethod
     def __get_gdrive_file_name_prefix(data_date: datetime, include_day: bool = True, include_hour: bool = True) -> str:
         data_date = data_date - timedelta(minutes=1)
@@ -892,3 +1311,330 @@ class TourneyDataClient():
             return datetime(year, month, 1, tzinfo=timezone.utc)
         
         return datetime(year + make_future_data_date * 1, 1, 1, tzinfo=timezone.utc)
+
+
+
+
+
+class TourneyUsersTable():
+    """
+    Columnar store for the users of tournament data with schema version 4 or later. Numeric values are kept in typed arrays and user ids are mapped to rows.
+    """
+    # (property name, index in the raw user data, minimum schema version)
+    __NUMERIC_COLUMNS: List[Tuple[str, int, int]] = [
+        ('AllianceId', 2, 4),
+        ('Trophy', 3, 4),
+        ('AllianceScore', 4, 4),
+        ('AllianceMembership', 5, 4),
+        ('AllianceJoinDate', 6, 5),
+        ('LastLoginDate', 7, 5),
+        ('LastHeartBeatDate', 8, 5),
+        ('CrewDonated', 9, 4),
+        ('CrewReceived', 10, 4),
+        ('PVPAttackWins', 11, 4),
+        ('PVPAttackLosses', 12, 4),
+        ('PVPAttackDraws', 13, 4),
+        ('PVPDefenceWins', 14, 4),
+        ('PVPDefenceLosses', 15, 4),
+        ('PVPDefenceDraws', 16, 4),
+        ('ChampionshipScore', 17, 6),
+        ('HighestTrophy', 18, 8),
+        ('TournamentBonusScore', 19, 9),
+    ]
+    __COUNTER_PROPERTY_NAMES: List[str] = ['CrewDonated', 'CrewReceived', 'PVPAttackWins', 'PVPAttackLosses', 'PVPAttackDraws', 'PVPDefenceWins', 'PVPDefenceLosses', 'PVPDefenceDraws']
+
+    def __init__(self, users: List[List[Union[int, str]]], fleet_data: EntitiesData, schema_version: int) -> None:
+        self.__schema_version: int = schema_version
+        self.__fleet_data: EntitiesData = fleet_data
+        self.__names: List[str] = [user[1] for user in users]
+        self.__rows: Dict[str, int] = {}
+        for row, user in enumerate(users):
+            self.__rows[str(user[0])] = row
+
+        self.__user_rows: np.ndarray = None
+        self.__columns: Dict[str, np.ndarray] = {}
+        for property_name, index, min_schema_version in TourneyUsersTable.__NUMERIC_COLUMNS:
+            if schema_version >= min_schema_version:
+                column = np.fromiter((int(user[index] or 0) for user in users), dtype=np.int64, count=len(users))
+                column.flags.writeable = False
+                self.__columns[property_name] = column
+
+
+    @property
+    def property_names(self) -> List[str]:
+        """
+        Names of the numeric columns.
+        """
+        return list(self.__columns.keys())
+
+    @property
+    def schema_version(self) -> int:
+        return self.__schema_version
+
+    @property
+    def user_ids(self) -> List[str]:
+        return list(self.__rows.keys())
+
+
+    def get_column(self, property_name: str) -> Optional[np.ndarray]:
+        """
+        Returns the read-only values of a numeric property for all rows. Use `get_rows` to get the rows of users.
+        """
+        return self.__columns.get(property_name)
+
+
+    def get_fleet_info(self, fleet_id: str) -> EntityInfo:
+        return self.__fleet_data.get(fleet_id, {})
+
+
+    def get_row(self, user_id: str) -> Optional[int]:
+        return self.__rows.get(user_id)
+
+
+    def get_rows(self) -> np.ndarray:
+        """
+        Returns the read-only row of every user in the order of `user_ids`.
+        """
+        if self.__user_rows is None:
+            user_rows = np.fromiter(self.__rows.values(), dtype=np.int64, count=len(self.__rows))
+            user_rows.flags.writeable = False
+            self.__user_rows = user_rows
+        return self.__user_rows
+
+
+    def get_top_user_ids(self, property_name: str, count: int) -> List[str]:
+        """
+        Returns the ids of the users with the highest values of a numeric property. Users with equal values keep the order of `user_ids`.
+        """
+        user_ids = self.user_ids
+        column = self.__columns[property_name][self.get_rows()]
+        order = np.argsort(-column, kind='stable')[:count]
+        return [user_ids[position] for position in order.tolist()]
+
+
+    def get_user_ids_by_fleet_id(self, fleet_id: str) -> List[str]:
+        """
+        Returns the ids of the users being members of the specified fleet in the order of `user_ids` without creating the user dicts.
+        """
+        try:
+            fleet_id = int(fleet_id)
+        except (TypeError, ValueError):
+            return []
+        user_ids = self.user_ids
+        positions = np.flatnonzero(self.__columns['AllianceId'][self.get_rows()] == fleet_id)
+        return [user_ids[position] for position in positions.tolist()]
+
+
+    def get_user_info(self, user_id: str) -> EntityInfo:
+        """
+        Creates a new dict with the same contents as the user dicts of the non-columnar data. Raises a KeyError, if the user can't be found.
+        """
+        row = self.__rows[user_id]
+        columns = self.__columns
+        fleet_id = str(columns['AllianceId'].item(row))
+        result = {
+            'Id': user_id,
+            'AllianceId': fleet_id,
+            'Trophy': str(columns['Trophy'].item(row)),
+            'AllianceScore': str(columns['AllianceScore'].item(row)),
+            'AllianceMembership': lookups.ALLIANCE_MEMBERSHIP_LOOKUP[columns['AllianceMembership'].item(row)],
+        }
+        if self.__schema_version >= 5:
+            alliance_join_date = columns['AllianceJoinDate'].item(row)
+            result['AllianceJoinDate'] = TourneyData.convert_timestamp(alliance_join_date) if alliance_join_date else None
+            result['LastLoginDate'] = TourneyData.convert_timestamp(columns['LastLoginDate'].item(row))
+        result['Name'] = self.__names[row]
+        if self.__schema_version >= 5:
+            result['LastHeartBeatDate'] = TourneyData.convert_timestamp(columns['LastHeartBeatDate'].item(row))
+        for property_name in TourneyUsersTable.__COUNTER_PROPERTY_NAMES:
+            result[property_name] = str(columns[property_name].item(row))
+        for property_name in ('ChampionshipScore', 'HighestTrophy', 'TournamentBonusScore'):
+            if property_name in columns:
+                result[property_name] = str(columns[property_name].item(row))
+        result['Alliance'] = {}
+        if fleet_id and fleet_id != '0':
+            result['Alliance'] = dict(self.__fleet_data.get(fleet_id, {}))
+        return result
+
+
+    def get_user_summaries(self) -> List[Tuple[str, str, str, str]]:
+        """
+        Returns tuples of (user id, user name, fleet id, trophies) in the order of `user_ids`.
+        """
+        fleet_ids = self.__columns['AllianceId']
+        trophies = self.__columns['Trophy']
+        return [(user_id, self.__names[row], str(fleet_ids.item(row)), str(trophies.item(row))) for user_id, row in self.__rows.items()]
+
+
+    def get_user_value(self, user_id: str, property_name: str) -> Optional[str]:
+        """
+        Returns the value of a numeric property of a user as it would appear in the user's dict or None, if the user can't be found.
+        """
+        row = self.__rows.get(user_id)
+        if row is None or property_name not in self.__columns:
+            return None
+        return str(self.__columns[property_name].item(row))
+
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self.__rows
+
+
+    def __setstate__(self, state: Dict[str, object]) -> None:
+        state.setdefault('_TourneyUsersTable__user_rows', None)
+        self.__dict__.update(state)
+
+
+    def __len__(self) -> int:
+        return len(self.__rows)
+
+
+class TourneyUsersView(Mapping):
+    """
+    Read-only mapping of user ids to user dicts backed by a `TourneyUsersTable`. Every access creates new dicts, so callers may alter them.
+    """
+    def __init__(self, users_table: TourneyUsersTable) -> None:
+        self.__users_table: TourneyUsersTable = users_table
+
+
+    @property
+    def users_table(self) -> TourneyUsersTable:
+        return self.__users_table
+
+
+    def get_users_by_fleet_id(self, fleet_id: str) -> EntitiesData:
+        """
+        Returns new user dicts of the members of the specified fleet. Only the matching users get created.
+        """
+        return {user_id: self.__users_table.get_user_info(user_id) for user_id in self.__users_table.get_user_ids_by_fleet_id(fleet_id)}
+
+
+    def __contains__(self, user_id: object) -> bool:
+        return user_id in self.__users_table
+
+
+    def __getitem__(self, user_id: str) -> EntityInfo:
+        return self.__users_table.get_user_info(user_id)
+
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__users_table.user_ids)
+
+
+    def __len__(self) -> int:
+        return len(self.__users_table)
+
+
+
+class TourneyNameIndex():
+    """
+    Case-insensitive substring search over the names of fleets or users. Names get lowercased once and their trigrams point to the positions of the names containing them, so a lookup only has to check the names sharing all trigrams with the searched name.
+    """
+    NGRAM_LENGTH: int = 3
+
+    def __init__(self, entries: Iterable[Tuple[str, str]]) -> None:
+        """
+        Parameter 'entries':
+        - Tuples of (id, name). Entries without a name are skipped. An id may occur with several names.
+        """
+        self.__ids: List[str] = []
+        self.__names: List[str] = []
+        self.__ngrams: Dict[str, List[int]] = {}
+        for entry_id, name in entries:
+            name_lower = str(name or '').lower()
+            if not name_lower:
+                continue
+            position = len(self.__ids)
+            self.__ids.append(entry_id)
+            self.__names.append(name_lower)
+            for ngram in set(TourneyNameIndex.__get_ngrams(name_lower)):
+                self.__ngrams.setdefault(ngram, []).append(position)
+
+
+    def get_ids(self, name: str) -> List[str]:
+        """
+        Returns the ids of the entries having name in their name in the order the entries have been added. Every id is returned once.
+        """
+        name_lower = name.lower()
+        ngrams = set(TourneyNameIndex.__get_ngrams(name_lower))
+        if ngrams:
+            postings = sorted((self.__ngrams.get(ngram, []) for ngram in ngrams), key=len)
+            positions = set(postings[0])
+            for posting in postings[1:]:
+                if not positions:
+                    break
+                positions.intersection_update(posting)
+            positions = sorted(positions)
+        else:
+            positions = range(len(self.__names))
+
+        result = []
+        found_ids = set()
+        for position in positions:
+            entry_id = self.__ids[position]
+            if entry_id not in found_ids and name_lower in self.__names[position]:
+                found_ids.add(entry_id)
+                result.append(entry_id)
+        return result
+
+
+    def __len__(self) -> int:
+        return len(self.__ids)
+
+
+    @staticmethod
+    def __get_ngrams(value: str) -> List[str]:
+        return [value[i:i + TourneyNameIndex.NGRAM_LENGTH] for i in range(len(value) - TourneyNameIndex.NGRAM_LENGTH + 1)]
+
+
+
+
+
+# ---------- Mocks ----------
+
+class MockDriveFile(dict):
+    """
+    Emulates a `pydrive.files.GoogleDriveFile` backed by a local file.
+    """
+    def __init__(self, file_path: str) -> None:
+        super().__init__(title=os.path.basename(file_path))
+        self.__file_path: str = file_path
+
+
+    def GetContentString(self) -> str:
+        with open(self.__file_path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+
+class MockFileList():
+    def __init__(self, files: List[MockDriveFile]) -> None:
+        self.__files: List[MockDriveFile] = files
+
+
+    def GetList(self) -> List[MockDriveFile]:
+        return list(self.__files)
+
+
+class MockDrive():
+    """
+    Emulates the parts of a `pydrive.drive.GoogleDrive` used by the `TourneyDataClient`. Serves the files in a local folder, so that tournament data can be retrieved offline.
+
+    Only supports queries of the form `'<folder id>' in parents and title contains '<text>'` or `... and title = '<text>'`.
+    """
+    __RX_TITLE_QUERY: re.Pattern = re.compile(r'title (contains|=) \'(.*?)\'')
+
+    def __init__(self, folder_path: str) -> None:
+        self.__folder_path: str = folder_path
+
+
+    def ListFile(self, param: Dict[str, str]) -> MockFileList:
+        match = MockDrive.__RX_TITLE_QUERY.search(param.get('q', ''))
+        file_names = sorted(file_name for file_name in os.listdir(self.__folder_path) if os.path.isfile(os.path.join(self.__folder_path, file_name)))
+        if match:
+            operator, title = match.groups()
+            if operator == '=':
+                file_names = [file_name for file_name in file_names if file_name == title]
+            else:
+                file_names = [file_name for file_name in file_names if title in file_name]
+        result = MockFileList([MockDriveFile(os.path.join(self.__folder_path, file_name)) for file_name in file_names])
+        return result
@@ -1,15 +1,14 @@
 from datetime import datetime
 import json
 import re
-from typing import Any, Callable, Dict, List, Optional
-
-import aiohttp
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
 
 from . import pss_entity as entity
 from .pss_exception import MaintenanceError
 from . import settings
 from .typehints import EntitiesData, EntityInfo
 from . import utils
+from . import web
 
 
 # ---------- Constants ----------
@@ -19,12 +18,175 @@ LIVEOPS_BASE_PATH: str = 'LiveOpsService/GetTodayLiveOps?deviceType=DeviceTypeAn
 __RX_PROPERTY_FIX_REPLACE: re.Pattern = re.compile(r'[^a-z0-9]', re.IGNORECASE)
 __RX_ALLOWED_CANDIDATE_FIX_REPLACE: re.Pattern = re.compile(r'(\(.*?\)|[^a-z0-9 ])', re.IGNORECASE)
 
+NAME_INDEX_NGRAM_LENGTH: int = 3
+
+
+
+
+
+# ---------- Classes ----------
+
+class EntitiesDataChanges():
+    """
+    Differences between two versions of an EntitiesData dict. Create it via `get_entities_data_changes`.
+    """
+    def __init__(self, added: List[str], removed: Dict[str, EntityInfo], modified: Dict[str, Dict[str, Tuple[Any, Any]]], old_version: Any = None, new_version: Any = None) -> None:
+        self.__added: List[str] = added
+        self.__removed: Dict[str, EntityInfo] = removed
+        self.__modified: Dict[str, Dict[str, Tuple[Any, Any]]] = modified
+        self.__old_version: Any = old_version
+        self.__new_version: Any = new_version
+
+
+    @property
+    def added(self) -> List[str]:
+        """
+        Ids of the entities only contained in the new data in the order of the new data.
+        """
+        return list(self.__added)
+
+    @property
+    def changed_ids(self) -> FrozenSet[str]:
+        return frozenset(self.__added).union(self.__removed.keys(), self.__modified.keys())
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.__added or self.__removed or self.__modified)
+
+    @property
+    def modified(self) -> Dict[str, Dict[str, Tuple[Any, Any]]]:
+        """
+        Changed fields by id of the entities contained in both versions of the data. The changes of a field are tuples of (old value, new value). A field missing in one of the versions has the value None there.
+        """
+        return {entity_id: dict(fields) for entity_id, fields in self.__modified.items()}
+
+    @property
+    def modified_field_names(self) -> FrozenSet[str]:
+        return frozenset(field_name for fields in self.__modified.values() for field_name in fields)
+
+    @property
+    def new_version(self) -> Any:
+        return self.__new_version
+
+    @property
+    def old_version(self) -> Any:
+        return self.__old_version
+
+    @property
+    def removed(self) -> Dict[str, EntityInfo]:
+        """
+        The old entity infos of the entities only contained in the old data by id.
+        """
+        return dict(self.__removed)
+
+
+    def __len__(self) -> int:
+        return len(self.__added) + len(self.__removed) + len(self.__modified)
+
+
+    def __str__(self) -> str:
+        return f'{len(self.__added)} added, {len(self.__removed)} removed, {len(self.__modified)} modified'
+
+
+
+
+
+class EntitiesNameIndex():
+    """
+    Search index over the fixed values of one property of an EntitiesData dict. Create it via `create_name_index`.
+    """
+    def __init__(self, data: EntitiesData, property_name: str, fix_data_delegate: Callable[[str], str], version: Any = None) -> None:
+        self.__property_name: str = property_name
+        self.__fix_data_delegate: Callable[[str], str] = fix_data_delegate
+        self.__version: Any = version
+        self.__entity_ids: FrozenSet[str] = frozenset(data.keys())
+
+        self.__entries: List[Tuple[str, str]] = [(entry_id, fix_data_delegate(entry_data[property_name])) for entry_id, entry_data in data.items() if entry_data.get(property_name)]
+        self.__exact_matches: Dict[str, List[str]] = {}
+        self.__ngrams: Dict[str, List[int]] = {}
+        for position, (entry_id, entry_property) in enumerate(self.__entries):
+            self.__exact_matches.setdefault(entry_property, []).append(entry_id)
+            for ngram in set(_get_ngrams(entry_property)):
+                self.__ngrams.setdefault(ngram, []).append(position)
+
+
+    @property
+    def entries(self) -> List[Tuple[str, str]]:
+        """
+        Tuples of (entity id, fixed property value) in the order of the source data.
+        """
+        return list(self.__entries)
+
+    @property
+    def fix_data_delegate(self) -> Callable[[str], str]:
+        return self.__fix_data_delegate
+
+    @property
+    def property_name(self) -> str:
+        return self.__property_name
+
+    @property
+    def version(self) -> Any:
+        return self.__version
+
+
+    def get_candidates(self, fixed_value: str) -> List[Tuple[str, str]]:
+        """
+        Returns the entries containing fixed_value in the order of the source data.
+        """
+        ngrams = set(_get_ngrams(fixed_value))
+        if not ngrams:
+            return [entry for entry in self.__entries if fixed_value in entry[1]]
+
+        postings = sorted((self.__ngrams.get(ngram, []) for ngram in ngrams), key=len)
+        positions = set(postings[0])
+        for posting in postings[1:]:
+            if not positions:
+                break
+            positions.intersection_update(posting)
+        result = [self.__entries[position] for position in sorted(positions) if fixed_value in self.__entries[position][1]]
+        return result
+
+
+    def get_exact_matches(self, fixed_value: str) -> List[str]:
+        return list(self.__exact_matches.get(fixed_value, []))
+
+
+    def is_affected_by(self, changes: EntitiesDataChanges) -> bool:
+        """
+        Checks, if entities have been added or removed or if the indexed property of any entity has changed.
+        """
+        return bool(changes.added or changes.removed) or self.__property_name in changes.modified_field_names
+
+
+    def is_derived_from(self, data: EntitiesData) -> bool:
+        """
+        Checks, if this index has been built from data containing the same entities.
+        """
+        return data is not None and len(data) == len(self.__entity_ids) and self.__entity_ids == data.keys()
+
+
+    def update_version(self, version: Any) -> None:
+        """
+        Only to be called, if the index hasn't been affected by the changes leading to the new version.
+        """
+        self.__version = version
+
+
+    def __len__(self) -> int:
+        return len(self.__entity_ids)
+
 
 
 
 
 # ---------- Functions ----------
 
+def create_name_index(data: EntitiesData, property_name: str, fix_data_delegate: Callable[[str], str] = None, version: Any = None) -> EntitiesNameIndex:
+    if not fix_data_delegate:
+        fix_data_delegate = __fix_property_value
+    return EntitiesNameIndex(data or {}, property_name, fix_data_delegate, version=version)
+
 def filter_entities_data(data: EntitiesData, by: Dict[str, str], ignore_case: bool = False) -> Optional[EntitiesData]:
     """Parameter 'data':
        - A dict with entity ids as keys and entity info as values.
@@ -58,6 +220,33 @@ async def get_data_from_path(path: str) -> str:
     return await __get_data_from_url(url)
 
 
+def get_entities_data_changes(old_data: EntitiesData, new_data: EntitiesData, old_version: Any = None, new_version: Any = None) -> EntitiesDataChanges:
+    """
+    Compares the entities by id. Only the fields of entities with differing entity infos get compared one by one.
+    """
+    old_data = old_data or {}
+    new_data = new_data or {}
+
+    added = []
+    modified = {}
+    for entity_id, new_entity_info in new_data.items():
+        old_entity_info = old_data.get(entity_id)
+        if old_entity_info is None:
+            added.append(entity_id)
+        elif old_entity_info != new_entity_info:
+            fields = {}
+            for field_name in {**old_entity_info, **new_entity_info}.keys():
+                old_value = old_entity_info.get(field_name)
+                new_value = new_entity_info.get(field_name)
+                if old_value != new_value:
+                    fields[field_name] = (old_value, new_value)
+            modified[entity_id] = fields
+    removed = {entity_id: entity_info for entity_id, entity_info in old_data.items() if entity_id not in new_data}
+
+    result = EntitiesDataChanges(added, removed, modified, old_version=old_version, new_version=new_version)
+    return result
+
+
 async def get_latest_settings(language_key: str = 'en', base_url: str = None) -> EntityInfo:
     if not language_key:
         language_key = 'en'
@@ -77,6 +266,23 @@ async def get_liveops_info(language_key: str = 'en') -> EntityInfo:
     return result
 
 
+def get_ids_from_name_index(name_index: EntitiesNameIndex, property_value: str, match_exact: bool = False) -> List[str]:
+    """
+    Returns the same results as `get_ids_from_property_value` for the data the index has been created from.
+    """
+    if not name_index or not property_value:
+        print(f'- get_ids_from_name_index: invalid index or property value. Return empty list.')
+        return []
+
+    fixed_value = name_index.fix_data_delegate(property_value)
+    if match_exact:
+        results = name_index.get_exact_matches(fixed_value)
+    else:
+        candidates = name_index.get_candidates(fixed_value)
+        results = __sort_ids_by_similarity(candidates, fixed_value)
+    return results
+
+
 def get_ids_from_property_value(data: EntitiesData, property_name: str, property_value: str, fix_data_delegate: Callable[[str], str] = None, match_exact: bool = False) -> List[str]:
     # data structure: {id: content}
     # fixed_data structure: {description: id}
@@ -93,22 +299,8 @@ def get_ids_from_property_value(data: EntitiesData, property_name: str, property
     if match_exact:
         results = [key for key, value in fixed_data.items() if value == fixed_value]
     else:
-        similarity_map = {}
-        for entry_id, entry_property in fixed_data.items():
-            if entry_property.startswith(fixed_value) or fixed_value in entry_property:
-                similarity_value = utils.get_similarity(entry_property, fixed_value)
-                if similarity_value in similarity_map.keys():
-                    similarity_map[similarity_value].append((entry_id, entry_property))
-                else:
-                    similarity_map[similarity_value] = [(entry_id, entry_property)]
-        for similarity_value, entries in similarity_map.items():
-            similarity_map[similarity_value] = sorted(entries, key=lambda entry: entry[1])
-        similarity_values = sorted(list(similarity_map.keys()), reverse=True)
-        results = []
-        for similarity_value in similarity_values:
-            if not match_exact or (match_exact is True and similarity_value.is_integer()):
-                entry_ids = [entry_id for (entry_id, _) in similarity_map[similarity_value]]
-                results.extend(entry_ids)
+        candidates = [(entry_id, entry_property) for entry_id, entry_property in fixed_data.items() if entry_property.startswith(fixed_value) or fixed_value in entry_property]
+        results = __sort_ids_by_similarity(candidates, fixed_value)
 
     return results
 
@@ -175,6 +367,10 @@ def transform_sanitize_text(*args, **kwargs) -> Optional[str]:
         return None
 
 
+def _get_ngrams(value: str, length: int = NAME_INDEX_NGRAM_LENGTH) -> List[str]:
+    return [value[i:i + length] for i in range(len(value) - length + 1)]
+
+
 def __filter_data_dict(data: EntitiesData, by_key: Any, by_value: Any, ignore_case: bool) -> Optional[EntitiesData]:
     """Parameter 'data':
        - A dict with entity ids as keys and entity info as values. """
@@ -206,14 +402,12 @@ def __fix_property_value(property_value: str) -> str:
 async def __get_data_from_url(url: str) -> str:
     if settings.PRINT_DEBUG_WEB_REQUESTS:
         print(f'[WebRequest] Attempting to get data from url: {url}')
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            data = await response.text(encoding='utf-8')
-            if settings.PRINT_DEBUG_WEB_REQUESTS:
-                log_data = data or ''
-                if log_data and len(log_data) > 100:
-                    log_data = log_data[:100]
-                print(f'[WebRequest] Returned data: {log_data}')
+    data = await web.get_text(url)
+    if settings.PRINT_DEBUG_WEB_REQUESTS:
+        log_data = data or ''
+        if log_data and len(log_data) > 100:
+            log_data = log_data[:100]
+        print(f'[WebRequest] Returned data: {log_data}')
     return data
 
 
@@ -229,4 +423,22 @@ def __parse_entity_datetime(*args, **kwargs) -> Optional[datetime]:
     entity_property = kwargs.get('entity_property')
     if entity_property:
         result = utils.parse.pss_datetime(entity_property)
-    return result
\ No newline at end of file
+    return result
+
+
+def __sort_ids_by_similarity(candidates: List[Tuple[str, str]], fixed_value: str) -> List[str]:
+    """
+    Parameter 'candidates':
+    - A list of tuples (entity id, fixed property value) in the order of the source data.
+    """
+    similarity_map = {}
+    for entry_id, entry_property in candidates:
+        similarity_value = utils.get_similarity(entry_property, fixed_value)
+        similarity_map.setdefault(similarity_value, []).append((entry_id, entry_property))
+    for similarity_value, entries in similarity_map.items():
+        similarity_map[similarity_value] = sorted(entries, key=lambda entry: entry[1])
+    similarity_values = sorted(list(similarity_map.keys()), reverse=True)
+    results = []
+    for similarity_value in similarity_values:
+        results.extend([entry_id for (entry_id, _) in similarity_map[similarity_value]])
+    return results
\ No newline at end of file
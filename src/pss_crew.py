@@ -60,13 +60,12 @@ async def get_char_details_by_name(ctx: Context, char_name: str, level: int, as_
     pss_assert.valid_entity_name(char_name, 'char_name', min_length=2)
     pss_assert.parameter_is_valid_integer(level, 'level', min_value=1, max_value=40, allow_none=True)
 
-    chars_data = await characters_designs_retriever.get_data_dict3()
+    chars_data, collections_data = await entity.get_data_dicts3(characters_designs_retriever, collections_designs_retriever)
     char_info = await characters_designs_retriever.get_entity_info_by_name(char_name, chars_data)
 
     if char_info is None:
         raise NotFound(f'Could not find a crew named `{char_name}`.')
     else:
-        collections_data = await collections_designs_retriever.get_data_dict3()
         characters_details_collection = __create_characters_details_collection_from_infos([char_info], chars_data, collections_data, level)
         if as_embed:
             return (await characters_details_collection.get_entities_details_as_embed(ctx))
@@ -83,8 +82,7 @@ async def get_collection_details_by_name(ctx: Context, collection_name: str, as_
     pss_assert.valid_entity_name(collection_name, parameter_name='collection_name', allow_none_or_empty=True)
 
     print_all = not collection_name
-    collections_data = await collections_designs_retriever.get_data_dict3()
-    characters_data = await characters_designs_retriever.get_data_dict3()
+    collections_data, characters_data = await entity.get_data_dicts3(collections_designs_retriever, characters_designs_retriever)
     collections_designs_infos = []
     if print_all:
         collections_designs_infos = collections_data.values()
@@ -476,7 +474,8 @@ def __get_stat(character_info: EntityInfo, characters_data: EntitiesData, collec
 # ---------- Create entity.entity.EntityDetails ----------
 
 def __create_character_details_from_info(character_info: EntityInfo, characters_data: EntitiesData, collections_data: EntitiesData, level: int) -> entity.entity.EntityDetails:
-    return entity.entity.EntityDetails(character_info, __properties['character_title'], __properties['character_description'], __properties['character_properties'], __properties['character_embed_settings'], characters_data, collections_data, level=level)
+    render_cache_key = entity.get_render_cache_key('character', characters_designs_retriever, collections_designs_retriever)
+    return entity.entity.EntityDetails(character_info, __properties['character_title'], __properties['character_description'], __properties['character_properties'], __properties['character_embed_settings'], characters_data, collections_data, render_cache_key=render_cache_key, level=level)
 
 
 def __create_characters_details_collection_from_infos(characters_designs_infos: List[EntityInfo], characters_data: EntitiesData, collections_data: EntitiesData, level: int) -> entity.EntityDetailsCollection:
@@ -487,7 +486,8 @@ def __create_characters_details_collection_from_infos(characters_designs_infos:
 
 
 def __create_collection_details_from_info(collection_info: EntityInfo, collections_data: EntitiesData, characters_data: EntitiesData) -> entity.entity.EntityDetails:
-    return entity.entity.EntityDetails(collection_info, __properties['collection_title'], __properties['collection_description'], __properties['collection_properties'], __properties['collection_embed_settings'], collections_data, characters_data)
+    render_cache_key = entity.get_render_cache_key('collection', collections_designs_retriever, characters_designs_retriever)
+    return entity.entity.EntityDetails(collection_info, __properties['collection_title'], __properties['collection_description'], __properties['collection_properties'], __properties['collection_embed_settings'], collections_data, characters_data, render_cache_key=render_cache_key)
 
 
 def __create_collections_details_collection_from_infos(collections_infos: List[EntityInfo], collections_data: EntitiesData, characters_data: EntitiesData) -> entity.EntityDetailsCollection:
@@ -245,13 +245,15 @@ def get_sales_search_details_with_id(entity_info: EntityInfo) -> str:
 
 
 async def __process_db_sales_infos(db_sales_infos: List[Dict[str, Any]], utc_now: datetime, filter_old: bool = True) -> List[Dict[str, Any]]:
-    chars_data = await crew.characters_designs_retriever.get_data_dict3()
-    collections_data = await crew.collections_designs_retriever.get_data_dict3()
-    items_data = await item.items_designs_retriever.get_data_dict3()
-    researches_data = await research.researches_designs_retriever.get_data_dict3()
-    rooms_data = await room.rooms_designs_retriever.get_data_dict3()
-    rooms_designs_sprites_data = await room.rooms_designs_sprites_retriever.get_data_dict3()
-    trainings_data = await training.trainings_designs_retriever.get_data_dict3()
+    chars_data, collections_data, items_data, researches_data, rooms_data, rooms_designs_sprites_data, trainings_data = await entity.get_data_dicts3(
+        crew.characters_designs_retriever,
+        crew.collections_designs_retriever,
+        item.items_designs_retriever,
+        research.researches_designs_retriever,
+        room.rooms_designs_retriever,
+        room.rooms_designs_sprites_retriever,
+        training.trainings_designs_retriever,
+    )
 
     result = []
 
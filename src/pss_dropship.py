@@ -60,13 +60,15 @@ async def get_dropship_text(bot: Bot = None, guild: Guild = None, daily_info: di
     if not daily_info:
         daily_info = await daily.get_daily_info(language_key)
 
-    chars_designs_data = await crew.characters_designs_retriever.get_data_dict3()
-    collections_designs_data = await crew.collections_designs_retriever.get_data_dict3()
-    items_designs_data = await item.items_designs_retriever.get_data_dict3()
-    missions_designs_data = await mission.missions_designs_retriever.get_data_dict3()
-    rooms_designs_data = await room.rooms_designs_retriever.get_data_dict3()
-    situations_designs_data = await situation.situations_designs_retriever.get_data_dict3()
-    trainings_designs_data = await training.trainings_designs_retriever.get_data_dict3()
+    chars_designs_data, collections_designs_data, items_designs_data, missions_designs_data, rooms_designs_data, situations_designs_data, trainings_designs_data = await entity.get_data_dicts3(
+        crew.characters_designs_retriever,
+        crew.collections_designs_retriever,
+        item.items_designs_retriever,
+        mission.missions_designs_retriever,
+        room.rooms_designs_retriever,
+        situation.situations_designs_retriever,
+        training.trainings_designs_retriever,
+    )
 
     try:
         daily_msg = __get_daily_news_from_info_as_text(daily_info)
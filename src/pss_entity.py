@@ -1,16 +1,20 @@
+import asyncio
+from collections import OrderedDict
 from enum import IntEnum
+import hashlib
 import inspect
 import json
-from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Set, Tuple, Union
 from xml.etree import ElementTree
 
 from discord import Embed
 from discord.ext.commands import Context
 
-from .cache import PssCache
+from . import cache
 from . import pss_core as core
 from . import pss_entity as entity
-from .pss_exception import Error
+from .pss_exception import DataDependenciesError, Error, MaintenanceError
 from . import settings
 from .typehints import EntitiesData, EntityInfo
 from . import utils
@@ -30,6 +34,8 @@ ERROR_ENTITY_DETAILS_TYPE_NONE_NOT_ALLOWED: str = f'You have to provide a detail
 
 NO_PROPERTY: 'EntityDetailProperty'
 
+RENDER_DURATION_HISTOGRAM_BUCKETS: Tuple[float, ...] = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
 
 
 
@@ -364,6 +370,115 @@ class EntityDetailPropertyListCollection(object):
 
 
 
+class RenderedEntityDetails(object):
+    """
+    The calculated titles, descriptions, details and embed settings of an EntityDetails object. Gets shared by all EntityDetails objects with the same render cache key.
+    """
+    def __init__(self) -> None:
+        self.titles: Dict[EntityDetailsType, str] = {}
+        self.descriptions: Dict[EntityDetailsType, str] = {}
+        self.details: Dict[bool, Dict[EntityDetailsType, List[CalculatedEntityDetailProperty]]] = {
+            False: {
+                EntityDetailsType.LONG: None,
+                EntityDetailsType.MEDIUM: None,
+                EntityDetailsType.SHORT: None,
+                EntityDetailsType.MINI: None
+            },
+            True: {
+                EntityDetailsType.LONG: None,
+                EntityDetailsType.MEDIUM: None,
+                EntityDetailsType.SHORT: None,
+                EntityDetailsType.MINI: None
+            }
+        }
+        self.embed_settings: Dict[str, str] = None
+
+
+
+
+
+class EntityDetailsRenderCache(object):
+    """
+    LRU cache of RenderedEntityDetails. The keys should contain the versions of the data the details have been calculated from, so that outdated entries don't get hit and age out.
+    """
+    def __init__(self, max_entries: int) -> None:
+        self.__max_entries: int = max_entries
+        self.__entries: 'OrderedDict[Tuple, RenderedEntityDetails]' = OrderedDict()
+        self.__hits: int = 0
+        self.__misses: int = 0
+        self.__evictions: int = 0
+        self.__render_durations: List[int] = [0] * (len(RENDER_DURATION_HISTOGRAM_BUCKETS) + 1)
+        self.__render_duration_total: float = 0.0
+
+
+    @property
+    def hit_rate(self) -> float:
+        requests = self.__hits + self.__misses
+        if requests:
+            return self.__hits / requests
+        return 0.0
+
+    @property
+    def render_duration_histogram(self) -> Dict[str, int]:
+        """
+        Number of renderings by upper bound of their duration in milliseconds.
+        """
+        result = {f'<={bucket * 1000:g}ms': count for bucket, count in zip(RENDER_DURATION_HISTOGRAM_BUCKETS, self.__render_durations)}
+        result[f'>{RENDER_DURATION_HISTOGRAM_BUCKETS[-1] * 1000:g}ms'] = self.__render_durations[-1]
+        return result
+
+    @property
+    def statistics(self) -> Dict[str, Union[int, float, Dict[str, int]]]:
+        return {
+            'entries': len(self.__entries),
+            'max_entries': self.__max_entries,
+            'hits': self.__hits,
+            'misses': self.__misses,
+            'hit_rate': self.hit_rate,
+            'evictions': self.__evictions,
+            'render_duration_avg': self.__render_duration_total / self.__misses if self.__misses else 0.0,
+            'render_duration_histogram': self.render_duration_histogram,
+        }
+
+
+    def add_hit(self) -> None:
+        self.__hits += 1
+
+
+    def add_miss(self, render_duration: float) -> None:
+        self.__misses += 1
+        self.__render_duration_total += render_duration
+        for i, bucket in enumerate(RENDER_DURATION_HISTOGRAM_BUCKETS):
+            if render_duration <= bucket:
+                self.__render_durations[i] += 1
+                break
+        else:
+            self.__render_durations[-1] += 1
+
+
+    def clear(self) -> None:
+        self.__entries.clear()
+
+
+    def get_or_create(self, key: Tuple) -> RenderedEntityDetails:
+        """
+        Returns the rendered details for key. Creates and stores an empty entry, if there's none.
+        """
+        result = self.__entries.get(key)
+        if result is None:
+            result = RenderedEntityDetails()
+            self.__entries[key] = result
+            while len(self.__entries) > self.__max_entries:
+                self.__entries.popitem(last=False)
+                self.__evictions += 1
+        else:
+            self.__entries.move_to_end(key)
+        return result
+
+
+
+
+
 class EntityDetails(object):
     def __init__(self, entity_info: EntityInfo,
                        title: EntityDetailPropertyCollection,
@@ -372,9 +487,10 @@ class EntityDetails(object):
                        embed_settings: Dict[str, EntityDetailProperty],
                        *entities_data: Optional[EntitiesData],
                        prefix: str = None,
+                       render_cache_key: Tuple = None,
                        **kwargs):
         """
-
+        render_cache_key: if specified, the calculated details get shared via RENDER_CACHE with all EntityDetails created with the same key, entity info, prefix and kwargs. Create it via `get_render_cache_key`.
         """
         self.__entities_data: EntitiesData = entities_data or {}
         self.__entity_info: EntityInfo = entity_info or {}
@@ -413,25 +529,18 @@ class EntityDetails(object):
                 }
             }
         self.__embed_settings: Dict[str, EntityDetailProperty] = embed_settings or {}
-        self.__calculated_embed_settings: Dict[str, str] = None
-        self.__titles: Dict[EntityDetailsType, str] = {}
-        self.__descriptions: Dict[EntityDetailsType, str] = {}
-        self.__details: Dict[bool, Dict[EntityDetailsType, List[CalculatedEntityDetailProperty]]] = {
-            False: {
-                EntityDetailsType.LONG: None,
-                EntityDetailsType.MEDIUM: None,
-                EntityDetailsType.SHORT: None,
-                EntityDetailsType.MINI: None
-            },
-            True: {
-                EntityDetailsType.LONG: None,
-                EntityDetailsType.MEDIUM: None,
-                EntityDetailsType.SHORT: None,
-                EntityDetailsType.MINI: None
-            }
-        }
         self.__prefix: str = prefix or ''
         self.__kwargs: Dict[str, object] = kwargs
+        self.__render_cache_key: Tuple = render_cache_key
+        self.__rendered: RenderedEntityDetails = None
+        self.__requested_details: Set[Tuple[bool, EntityDetailsType]] = set()
+        if render_cache_key is None:
+            self.__rendered = RenderedEntityDetails()
+        else:
+            # The data versions in render_cache_key don't cover subsets of the data being passed, so the ids of each dataset are part of the key
+            entities_data_ids = [(len(data), hash(frozenset(data))) if data else None for data in self.__entities_data]
+            rendered_key = json.dumps((self.__entity_info, entities_data_ids, self.__prefix, kwargs), sort_keys=True, default=str)
+            self.__rendered = RENDER_CACHE.get_or_create((render_cache_key, hashlib.sha1(rendered_key.encode('utf-8')).digest()))
 
 
     @property
@@ -503,14 +612,14 @@ class EntityDetails(object):
 
 
     async def get_embed_settings(self) -> Dict[str, str]:
-        if self.__calculated_embed_settings is None and self.__embed_settings:
+        if self.__rendered.embed_settings is None and self.__embed_settings:
             result = {}
             for setting_name, setting_value in self.__embed_settings.items():
                 value = await self.__get_calculated_property(setting_value)
                 if value and value.value:
                     result[setting_name] = value.value
-            self.__calculated_embed_settings = result
-        return self.__calculated_embed_settings
+            self.__rendered.embed_settings = result
+        return self.__rendered.embed_settings
 
 
     async def get_full_details(self, as_embed: bool, details_type: EntityDetailsType) -> Tuple[str, str, List[CalculatedEntityDetailProperty]]:
@@ -530,10 +639,14 @@ class EntityDetails(object):
         """
         if self.__entity_info:
             self.__entity_info = new_entity_info
+            if self.__render_cache_key is not None:
+                # The calculated details may differ for the new entity info, so stop sharing them
+                self.__render_cache_key = None
+                self.__rendered = RenderedEntityDetails()
 
 
     async def _get_description(self, details_type: EntityDetailsType = EntityDetailsType.LONG) -> str:
-        return await self.__get_property_from_collection(self.__description_property_collection, self.__descriptions, details_type)
+        return await self.__get_property_from_collection(self.__description_property_collection, self.__rendered.descriptions, details_type)
 
 
     async def _get_details_properties(self, as_embed: bool, details_type: EntityDetailsType) -> List[CalculatedEntityDetailProperty]:
@@ -541,16 +654,26 @@ class EntityDetails(object):
         if details_type == EntityDetailsType.EMBED:
             as_embed = True
             details_type = EntityDetailsType.LONG
-        if self.__details[as_embed][details_type] is None and self.__properties[as_embed][details_type] is not None:
-            self.__details[as_embed][details_type] = []
+        rendered_details = self.__rendered.details
+        # Only count the first request of this object for the cache statistics
+        count_request = self.__render_cache_key is not None and (as_embed, details_type) not in self.__requested_details
+        self.__requested_details.add((as_embed, details_type))
+        if rendered_details[as_embed][details_type] is None and self.__properties[as_embed][details_type] is not None:
+            start = time.perf_counter()
+            # The details may be shared with other EntityDetails, so only store them when they're complete
+            details = []
             for entity_detail_property in self.__properties[as_embed][details_type]:
-                self.__details[as_embed][details_type].append(await self.__get_calculated_property(entity_detail_property))
-            #self.__details[as_embed][details_type] = [await self.__get_calculated_property(entity_detail_property) for entity_detail_property in self.__properties[as_embed][details_type]]
-        return self.__details[as_embed][details_type]
+                details.append(await self.__get_calculated_property(entity_detail_property))
+            rendered_details[as_embed][details_type] = details
+            if count_request:
+                RENDER_CACHE.add_miss(time.perf_counter() - start)
+        elif count_request:
+            RENDER_CACHE.add_hit()
+        return rendered_details[as_embed][details_type]
 
 
     async def _get_title(self, details_type: EntityDetailsType = EntityDetailsType.LONG) -> str:
-        return await self.__get_property_from_collection(self.__title_property_collection, self.__titles, details_type)
+        return await self.__get_property_from_collection(self.__title_property_collection, self.__rendered.titles, details_type)
 
 
     async def __create_base_embed(self, ctx: Context) -> Embed:
@@ -805,32 +928,77 @@ class EntityRetriever:
         self.__description_property_name: str = entity_description_property_name
         self.__sorted_key_function: Callable[[dict, dict], str] = sorted_key_function
         self.__fix_data_delegate: Callable[[str], str] = fix_data_delegate
+        self.__derived_data: Dict[Hashable, Any] = {}
 
-        self.__cache = PssCache(
+        self.__cache = cache.PssCache(
             self.__base_path,
             self.__cache_name,
             key_name=self.__key_name,
             update_interval=cache_update_interval
         )
+        self.__cache.add_listener(self.__on_cache_changed)
 
 
     @property
     def base_path(self) -> str:
         return self.__base_path
 
+    @property
+    def changes(self) -> Optional['core.EntitiesDataChanges']:
+        """
+        Differences between the data before and after the latest change. None, if unknown.
+        """
+        return self.__cache.changes
+
+    @property
+    def data_version(self) -> Any:
+        """
+        Changes, whenever the cached data changes. Can be used to invalidate data derived from it.
+        """
+        return self.__cache.modify_date
+
     @property
     def description_property_name(self) -> str:
         return self.__description_property_name
 
+    @property
+    def name(self) -> str:
+        return self.__cache_name or self.__base_path
+
     @property
     def key_name(self) -> str:
         return self.__key_name
 
 
+    def add_change_listener(self, listener: 'cache.CacheListener') -> None:
+        """
+        Registers a listener to be called, whenever the cached data has changed.
+        """
+        self.__cache.add_listener(listener)
+
+
     async def get_data_dict3(self) -> Dict[str, Dict[str, object]]:
         return await self.__cache.get_data_dict3()
 
 
+    def get_derived_data(self, key: Hashable, entities_data: EntitiesData, create_delegate: Callable[[EntitiesData, Any], Any]) -> Any:
+        """
+        Returns the data derived from entities_data by calling create_delegate(entities_data, version). The derived data only gets created again, when the cached data changes or entities_data contains different entities.
+
+        The derived data must have a property 'version', a method 'is_derived_from(entities_data)' and a length.
+        """
+        version = self.__cache.modify_date
+        derived_data = self.__derived_data.get(key)
+        if derived_data is not None and derived_data.version == version and derived_data.is_derived_from(entities_data):
+            return derived_data
+
+        result = create_delegate(entities_data, version)
+        # Don't replace derived data for the full data with derived data for a subset of it
+        if derived_data is None or derived_data.version != version or len(result) >= len(derived_data):
+            self.__derived_data[key] = result
+        return result
+
+
     async def get_entity_info_by_name(self, entity_name: str, entities_data: EntitiesData = None) -> Dict[str, object]:
         entities_data = entities_data or await self.get_data_dict3()
         entity_id = await self.get_entity_id_by_name(entity_name, entities_data=entities_data)
@@ -863,10 +1031,24 @@ class EntityRetriever:
 
     async def get_entities_ids_by_name(self, entity_name: str, entities_data: EntitiesData = None) -> List[str]:
         entities_data = entities_data or await self.get_data_dict3()
-        results = core.get_ids_from_property_value(entities_data, self.__description_property_name, entity_name, fix_data_delegate=self.__fix_data_delegate)
+        results = self.get_ids_from_property_value(entities_data, self.__description_property_name, entity_name, fix_data_delegate=self.__fix_data_delegate)
         return results
 
 
+    def get_ids_from_property_value(self, entities_data: EntitiesData, property_name: str, property_value: str, fix_data_delegate: Callable[[str], str] = None, match_exact: bool = False) -> List[str]:
+        """
+        Same as `core.get_ids_from_property_value`, but uses a search index that only gets rebuilt, when the cached data changes.
+        """
+        if not entities_data or not property_name or not property_value:
+            return core.get_ids_from_property_value(entities_data, property_name, property_value, fix_data_delegate=fix_data_delegate, match_exact=match_exact)
+        name_index = self.get_derived_data(
+            (property_name, fix_data_delegate),
+            entities_data,
+            lambda data, version: core.create_name_index(data, property_name, fix_data_delegate=fix_data_delegate, version=version)
+        )
+        return core.get_ids_from_name_index(name_index, property_value, match_exact=match_exact)
+
+
     async def get_raw_data(self) -> str:
         return await self.__cache.get_raw_data()
 
@@ -896,11 +1078,64 @@ class EntityRetriever:
         await self.__cache.update_data()
 
 
+    def __on_cache_changed(self, pss_cache: 'cache.PssCache') -> None:
+        changes = pss_cache.changes
+        if changes is None:
+            self.__derived_data.clear()
+            return
+        # Name indices not affected by the changes can be kept
+        for key, derived_data in list(self.__derived_data.items()):
+            if isinstance(derived_data, core.EntitiesNameIndex) and derived_data.version == changes.old_version and not derived_data.is_affected_by(changes):
+                derived_data.update_version(changes.new_version)
+            else:
+                self.__derived_data.pop(key)
+
+
 
 
 
 # ---------- Helper ----------
 
+async def get_data_dicts3(*retrievers: EntityRetriever, timeout: float = settings.DATA_DEPENDENCIES_TIMEOUT) -> Tuple[EntitiesData, ...]:
+    """
+    Retrieves the data of the specified retrievers concurrently within a shared deadline of timeout seconds. Returns the data in the order of the retrievers.
+
+    Raises a DataDependenciesError naming every dataset that couldn't be retrieved in time or failed. If the game is under maintenance, the MaintenanceError gets raised instead.
+    """
+    tasks = [asyncio.ensure_future(retriever.get_data_dict3()) for retriever in retrievers]
+    try:
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+    except asyncio.CancelledError:
+        for task in tasks:
+            task.cancel()
+        raise
+    for task in pending:
+        task.cancel()
+
+    errors = {}
+    for retriever, task in zip(retrievers, tasks):
+        if task in pending:
+            errors[retriever.name] = asyncio.TimeoutError(f'Timed out after {timeout} seconds.')
+        elif task.exception():
+            errors[retriever.name] = task.exception()
+    if errors:
+        for error in errors.values():
+            if isinstance(error, MaintenanceError):
+                raise error
+        raise DataDependenciesError(errors)
+    return tuple(task.result() for task in tasks)
+
+
+def get_render_cache_key(entity_type: str, *retrievers: EntityRetriever) -> Optional[Tuple]:
+    """
+    Returns a render cache key for EntityDetails of entity_type calculated from the data of the specified retrievers. Returns None, if any of the retrievers hasn't retrieved data, yet.
+    """
+    data_versions = tuple(retriever.data_version for retriever in retrievers)
+    if None in data_versions:
+        return None
+    return (entity_type, *data_versions)
+
+
 def entity_property_has_value(entity_property: str) -> bool:
     return entity_property and entity_property != '0' and entity_property.lower() != 'none' and entity_property.strip()
 
@@ -1052,4 +1287,6 @@ class LegacyEntityDetails(object):
 
 # ---------- Initialization ----------
 
-NO_PROPERTY = EntityDetailProperty(None, False)
\ No newline at end of file
+NO_PROPERTY = EntityDetailProperty(None, False)
+
+RENDER_CACHE: EntityDetailsRenderCache = EntityDetailsRenderCache(settings.ENTITY_DETAILS_CACHE_MAX_ENTRIES)
\ No newline at end of file
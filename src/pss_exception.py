@@ -1,4 +1,5 @@
 from typing import Any as _Any
+from typing import Dict as _Dict
 from typing import List as _List
 from typing import Optional as _Optional
 from typing import Sequence as _Sequence
@@ -34,6 +35,25 @@ class BotPermissionError(Error):
     pass
 
 
+class DataDependenciesError(Error):
+    """Exception raised, if some of the data required couldn't be retrieved.
+
+    Attributes:
+        errors -- the errors by name of the dataset
+    """
+    def __init__(self, errors: _Dict[str, Exception]) -> None:
+        self.__errors: _Dict[str, Exception] = dict(errors)
+        datasets = ', '.join(f'{name} ({type(error).__name__})' for name, error in self.__errors.items())
+        super().__init__(f'Could not retrieve the required data: {datasets}. Please try again later.')
+
+    @property
+    def errors(self) -> _Dict[str, Exception]:
+        return dict(self.__errors)
+
+    def __str__(self) -> str:
+        return self.msg
+
+
 class InvalidParameterValueError(Error):
     """Exception raised for invalid parameter values."""
     def __init__(self, parameter_name: str = None, invalid_value: _Any = None, min_length: int = None, valid_values: _List[str] = None, allow_none_or_empty: bool = False) -> None:
@@ -1,7 +1,11 @@
+import asyncio
 import calendar
 from datetime import datetime
+import gzip
+import os
+import shutil
 import time
-from typing import Any, Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 
 from discord import ApplicationContext
 from discord import Embed
@@ -12,7 +16,7 @@ from discord.ext.commands import Context
 
 from . import emojis
 from . import excel
-from .gdrive import TourneyData
+from .gdrive import TourneyData, TourneyUsersView
 from .pagination import SelectView
 from . import pss_assert
 from . import pss_core as core
@@ -67,6 +71,8 @@ FLEET_SHEET_COLUMN_FORMATS: Dict[str, Optional[str]] = {
     'Star value': settings.EXCEL_COLUMN_FORMAT_NUMBER,
 }
 
+__FLEETS_SHEET_CSV_TASKS: Dict[str, asyncio.Future] = {}
+
 
 
 
@@ -86,6 +92,28 @@ def create_fleets_sheet_csv(fleet_users_data: EntitiesData, retrieved_at: dateti
     return fleet_sheet_path
 
 
+async def get_fleets_sheet_csv(tourney_data: TourneyData, file_name: str) -> str:
+    """
+    Returns the path of the fleets sheet CSV (gzip compressed, if `settings.FLEETS_SHEET_CSV_GZIP` is set) of a tournament data snapshot. As a snapshot doesn't change, the file gets created in a worker thread only once per snapshot and file name and is kept in `settings.FLEETS_SHEET_CSV_CACHE_PATH`.
+
+    The file must not be removed by the caller. It's kept for at least `settings.FLEETS_SHEET_CSV_CACHE_MIN_AGE` seconds after it has been returned, so that the caller can post it.
+    """
+    file_path = __get_fleets_sheet_csv_cache_file_path(tourney_data.data_date_key, file_name)
+    if os.path.isfile(file_path):
+        __touch_fleets_sheet_csv_snapshot(file_path)
+        return file_path
+
+    creation_task = __FLEETS_SHEET_CSV_TASKS.get(file_path)
+    if creation_task is None:
+        in_flight_snapshot_paths = {os.path.dirname(in_flight_file_path) for in_flight_file_path in __FLEETS_SHEET_CSV_TASKS.keys()}
+        creation_task = asyncio.get_running_loop().run_in_executor(None, __create_fleets_sheet_csv_cache_file, tourney_data.users, tourney_data.retrieved_at, file_path, in_flight_snapshot_paths)
+        __FLEETS_SHEET_CSV_TASKS[file_path] = creation_task
+        creation_task.add_done_callback(lambda _: __FLEETS_SHEET_CSV_TASKS.pop(file_path, None))
+    result = await asyncio.shield(creation_task)
+    __touch_fleets_sheet_csv_snapshot(result)
+    return result
+
+
 async def get_current_tournament_fleet_infos_by_name(fleet_name: str) -> List[EntityInfo]:
     pss_assert.valid_parameter_value(fleet_name, 'fleet_name', min_length=0)
 
@@ -93,15 +121,15 @@ async def get_current_tournament_fleet_infos_by_name(fleet_name: str) -> List[En
     return fleet_infos
 
 
-async def get_fleet_infos_from_tourney_data_by_name(fleet_name: str, fleet_data: EntitiesData) -> List[EntityInfo]:
-    fleet_name_lower = fleet_name.lower()
-    result = {fleet_id: fleet_info for (fleet_id, fleet_info) in fleet_data.items() if fleet_name_lower in fleet_info.get(fleet.FLEET_DESCRIPTION_PROPERTY_NAME, '').lower()}
+async def get_fleet_infos_from_tourney_data_by_name(fleet_name: str, tourney_data: TourneyData) -> List[EntityInfo]:
+    result = tourney_data.get_fleet_data_by_name(fleet_name)
     fleet_infos_current = await __get_fleets_data_by_name(fleet_name)
     for fleet_info in fleet_infos_current.values():
         fleet_id = fleet_info[fleet.FLEET_KEY_NAME]
-        if fleet_id in fleet_data:
+        tourney_fleet_info = result.get(fleet_id) or tourney_data.get_fleet_data_by_id(fleet_id)
+        if tourney_fleet_info:
             if fleet_id not in result:
-                result[fleet_id] = fleet_data[fleet_id]
+                result[fleet_id] = tourney_fleet_info
             if result[fleet_id][fleet.FLEET_DESCRIPTION_PROPERTY_NAME] != fleet_info[fleet.FLEET_DESCRIPTION_PROPERTY_NAME]:
                 result[fleet_id]['CurrentAllianceName'] = fleet_info[fleet.FLEET_DESCRIPTION_PROPERTY_NAME]
     return list(result.values())
@@ -156,7 +184,7 @@ async def get_full_fleet_info_as_text(ctx: Context, fleet_info: EntityInfo, max_
             current_fleet_info = await get_fleets_data_by_id(fleet_id)
             if current_fleet_info[FLEET_DESCRIPTION_PROPERTY_NAME] != fleet_info[FLEET_DESCRIPTION_PROPERTY_NAME]:
                 fleet_info['CurrentAllianceName'] = current_fleet_info[FLEET_DESCRIPTION_PROPERTY_NAME]
-        fleet_users_data = {user_id: user_info for user_id, user_info in past_users_data.items() if user_info.get(FLEET_KEY_NAME) == fleet_id}
+        fleet_users_data = __get_fleet_users_data_from_users_data(fleet_id, past_users_data)
     else:
         retrieved_at = utils.get_utc_now()
         fleet_info = await get_fleets_data_by_id(fleet_id)
@@ -187,6 +215,15 @@ async def __get_fleets_data_by_name(fleet_name: str) -> EntitiesData:
     return result
 
 
+def __get_fleet_users_data_from_users_data(fleet_id: str, users_data: EntitiesData) -> EntitiesData:
+    """
+    Only creates the user dicts of the fleet's members, if users_data is backed by columnar tournament data.
+    """
+    if isinstance(users_data, TourneyUsersView):
+        return users_data.get_users_by_fleet_id(fleet_id)
+    return {user_id: user_info for user_id, user_info in users_data.items() if user_info.get(FLEET_KEY_NAME) == fleet_id}
+
+
 async def __get_fleet_users_data_by_fleet_id(alliance_id: str, yesterday_tourney_data: TourneyData = None) -> EntitiesData:
     path = await __get_search_fleet_users_base_path(alliance_id)
     fleet_users_data_raw = await core.get_data_from_path(path)
@@ -258,7 +295,7 @@ async def get_fleet_users_stars_from_tournament_data(ctx, fleet_info: EntityInfo
     fleet_users_infos = {}
     if fleet_id in fleet_data.keys():
         fleet_info[top.DIVISION_DESIGN_KEY_NAME] = fleet_data[fleet_id][top.DIVISION_DESIGN_KEY_NAME]
-        fleet_users_infos = dict({user_info[user.USER_KEY_NAME]: user_info for user_info in user_data.values() if user_info[FLEET_KEY_NAME] == fleet_id})
+        fleet_users_infos = __get_fleet_users_data_from_users_data(fleet_id, user_data)
     return await get_fleet_users_stars_from_info(ctx, fleet_info, fleet_users_infos, max_tourney_battle_attempts, retrieved_at=retrieved_date, as_embed=as_embed)
 
 
@@ -367,6 +404,54 @@ def __get_type(fleet_info: EntityInfo, fleet_users_data: EntitiesData, **kwargs)
 
 # ---------- Helper functions ----------
 
+def __create_fleets_sheet_csv_cache_file(fleet_users_data: EntitiesData, retrieved_at: datetime, file_path: str, in_flight_snapshot_paths: Set[str]) -> str:
+    """
+    Blocking. Writes the file atomically and removes the files of the least recently used snapshots, if there are more than `settings.FLEETS_SHEET_CSV_CACHE_MAX_SNAPSHOTS`.
+
+    Snapshots with files being created or having been used within the last `settings.FLEETS_SHEET_CSV_CACHE_MIN_AGE` seconds are kept, so that no file gets removed while it's being posted.
+    """
+    snapshot_path = os.path.dirname(file_path)
+    os.makedirs(snapshot_path, exist_ok=True)
+    temp_file_path = f'{file_path}.{os.getpid()}.tmp'
+    create_fleets_sheet_csv(fleet_users_data, retrieved_at, temp_file_path)
+    if settings.FLEETS_SHEET_CSV_GZIP:
+        temp_csv_file_path = temp_file_path
+        temp_file_path = f'{temp_csv_file_path}.gz'
+        with open(temp_csv_file_path, 'rb') as csv_file, gzip.open(temp_file_path, 'wb') as gzip_file:
+            shutil.copyfileobj(csv_file, gzip_file)
+        os.remove(temp_csv_file_path)
+    os.replace(temp_file_path, file_path)
+
+    cache_path = os.path.dirname(snapshot_path)
+    snapshot_paths = sorted((entry.path for entry in os.scandir(cache_path) if entry.is_dir()), key=os.path.getmtime, reverse=True)
+    min_used_at = time.time() - settings.FLEETS_SHEET_CSV_CACHE_MIN_AGE
+    for outdated_snapshot_path in snapshot_paths[settings.FLEETS_SHEET_CSV_CACHE_MAX_SNAPSHOTS:]:
+        if outdated_snapshot_path == snapshot_path or outdated_snapshot_path in in_flight_snapshot_paths:
+            continue
+        try:
+            if os.path.getmtime(outdated_snapshot_path) >= min_used_at:
+                continue
+        except OSError:
+            continue
+        shutil.rmtree(outdated_snapshot_path, ignore_errors=True)
+    return file_path
+
+
+def __get_fleets_sheet_csv_cache_file_path(data_date_key: str, file_name: str) -> str:
+    if settings.FLEETS_SHEET_CSV_GZIP:
+        file_name = f'{file_name}.gz'
+    return os.path.join(settings.FLEETS_SHEET_CSV_CACHE_PATH, data_date_key.replace(':', '-'), file_name)
+
+
+def __touch_fleets_sheet_csv_snapshot(file_path: str) -> None:
+    """
+    Marks the snapshot of the file as used.
+    """
+    try:
+        os.utime(os.path.dirname(file_path))
+    except OSError:
+        pass
+
 async def find_fleet(ctx: ApplicationContext, fleet_name: str) -> Tuple[EntityInfo, Interaction]:
     response = await utils.discord.respond_with_output(ctx, ['Searching fleet...'])
     fleet_infos = await get_fleet_infos_by_name(fleet_name)
@@ -389,7 +474,7 @@ async def find_fleet(ctx: ApplicationContext, fleet_name: str) -> Tuple[EntityIn
 
 async def find_tournament_fleet(ctx: ApplicationContext, fleet_name: str, tourney_data: TourneyData) -> Tuple[EntityInfo, Interaction]:
     response = await utils.discord.edit_original_response(ctx, ctx.interaction, ['Searching fleet...'])
-    fleet_infos = await get_fleet_infos_from_tourney_data_by_name(fleet_name, tourney_data.fleets)
+    fleet_infos = await get_fleet_infos_from_tourney_data_by_name(fleet_name, tourney_data)
     if fleet_infos:
         fleet_info = None
         if len(fleet_infos) == 1:
@@ -425,12 +510,11 @@ def is_tournament_fleet(fleet_info: EntityInfo) -> bool:
 def __create_fleet_sheet_xl(fleet_users_data: EntitiesData, retrieved_at: datetime, file_name: str, max_tourney_battle_attempts: int = None, include_player_id: bool = False, include_fleet_id: bool = False, sort_data: bool = True) -> str:
     start = time.perf_counter()
     fleet_sheet_lines = __get_fleet_sheet_lines(fleet_users_data, retrieved_at, max_tourney_battle_attempts=max_tourney_battle_attempts, include_player_id=include_player_id, include_fleet_id=include_fleet_id, sort_lines=sort_data)
-    fleet_sheet_data = __get_fleet_sheet_data_from_lines(fleet_sheet_lines)
     time1 = time.perf_counter() - start
     print(f'Creating the fleet users data took {time1:.2f} seconds.')
 
     start = time.perf_counter()
-    fleet_sheet_path = excel.create_xl_from_raw_data_dict(fleet_sheet_data, None, retrieved_at, file_name=file_name)
+    fleet_sheet_path = excel.create_xl_from_rows(fleet_sheet_lines[1:], fleet_sheet_lines[0], None, retrieved_at, file_name=file_name, consider_tourney=False)
     time2 = time.perf_counter() - start
     print(f'Creating the excel sheet took {time2:.2f} seconds ({time1+time2:.2f} seconds in total).')
 
@@ -445,16 +529,6 @@ async def __get_fleet_details_by_info(ctx: Context, fleet_info: EntityInfo, flee
         return (await fleet_details.get_details_as_text(entity.EntityDetailsType.LONG))
 
 
-def __get_fleet_sheet_data_from_lines(fleet_sheet_lines: List[List]) -> List[Dict]:
-    fleet_sheet_data = []
-    for i in range(1, len(fleet_sheet_lines)):
-        d = {}
-        for j in range(len(fleet_sheet_lines[0])):
-            d[fleet_sheet_lines[0][j]] = fleet_sheet_lines[i][j]
-        fleet_sheet_data.append(d)
-    return fleet_sheet_data
-
-
 def __get_fleet_sheet_lines(fleet_users_data: EntitiesData, retrieved_at: datetime, max_tourney_battle_attempts: int = None, fleet_name: str = None, include_player_id: bool = False, include_fleet_id: bool = False, include_division_name: bool = False, include_pvp_stats: bool = False, sort_lines: bool = True, escape_equal_sign: bool = True) -> List[Any]:
     titles = list(FLEET_SHEET_COLUMN_DEFAULT_HEADERS)
     include_tourney_battle_attempts = max_tourney_battle_attempts is not None
@@ -477,6 +551,7 @@ def __get_fleet_sheet_lines(fleet_users_data: EntitiesData, retrieved_at: dateti
             'Defense draws',
         ))
 
+    retrieved_at_for_excel = utils.format.datetime_for_excel(retrieved_at)
     result = []
     for user_info in fleet_users_data.values():
         user_fleet_name = fleet_name or user_info.get(FLEET_DESCRIPTION_PROPERTY_NAME, user_info.get('Alliance', {}).get(FLEET_DESCRIPTION_PROPERTY_NAME, ''))
@@ -486,26 +561,27 @@ def __get_fleet_sheet_lines(fleet_users_data: EntitiesData, retrieved_at: dateti
         if escape_equal_sign and user_name.startswith('='):
             user_name = f'="{user_name}"'
 
-        last_login_date = user_info.get('LastLoginDate')
-        alliance_join_date = user_info.get('AllianceJoinDate')
+        # Parse each timestamp once, it's the most expensive part of a line
+        last_login_date = utils.parse.pss_datetime(user_info.get('LastLoginDate'))
+        alliance_join_date = utils.parse.pss_datetime(user_info.get('AllianceJoinDate'))
         logged_in_ago = None
         joined_ago = None
         if last_login_date:
-            logged_in_ago = retrieved_at - utils.parse.pss_datetime(last_login_date)
+            logged_in_ago = retrieved_at - last_login_date
         if alliance_join_date:
-            joined_ago = retrieved_at - utils.parse.pss_datetime(alliance_join_date)
+            joined_ago = retrieved_at - alliance_join_date
         if fleet_name is None and FLEET_DESCRIPTION_PROPERTY_NAME in user_info.keys():
             fleet_name = user_info[FLEET_DESCRIPTION_PROPERTY_NAME]
         line = [
-            utils.format.datetime_for_excel(retrieved_at),
+            retrieved_at_for_excel,
             user_fleet_name,
             user_name,
             user_info.get('AllianceMembership', ''),
-            utils.convert.pss_timestamp_to_excel(last_login_date),
+            utils.format.datetime_for_excel(last_login_date) or '',
             int(user_info['Trophy']) if 'Trophy' in user_info else '',
             int(user_info['HighestTrophy']) if 'HighestTrophy' in user_info else '',
             int(user_info['AllianceScore'] if 'AllianceScore' in user_info else ''),
-            utils.convert.pss_timestamp_to_excel(alliance_join_date),
+            utils.format.datetime_for_excel(alliance_join_date) or '',
             int(user_info['CrewDonated']) if 'CrewDonated' in user_info else '',
             int(user_info['CrewReceived']) if 'CrewReceived' in user_info else '',
             utils.format.timedelta(logged_in_ago, include_relative_indicator=False),
@@ -540,8 +616,9 @@ def __get_fleet_sheet_lines(fleet_users_data: EntitiesData, retrieved_at: dateti
         result.append(line)
 
     if sort_lines:
+        membership_ranks = {membership: rank for rank, membership in enumerate(lookups.ALLIANCE_MEMBERSHIP_LOOKUP)}
         result = sorted(result, key=lambda x: (
-            lookups.ALLIANCE_MEMBERSHIP_LOOKUP.index(x[3]),
+            membership_ranks[x[3]],
             -x[7],
             -x[5],
             x[2]
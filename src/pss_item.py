@@ -1,5 +1,5 @@
 import re
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple, Union
 
 from discord import Embed
 from discord.ext.commands import Context
@@ -18,14 +18,6 @@ from .typehints import EntitiesData, EntityInfo
 from . import utils
 
 
-# ---------- Typehint definitions -----------
-
-IngredientsTree = Tuple[str, int, 'IngredientsTree']
-
-
-
-
-
 # ---------- Constants ----------
 
 ALLOWED_ITEM_NAMES: List[str]
@@ -55,18 +47,218 @@ __STATS_AVAILABLE: str = f'These are valid values for the _stat_ parameter: {",
 
 
 
+# ---------- Classes ----------
+
+class CraftingTree():
+    """
+    Recipes of all item designs, parsed once. The ingredients levels and crafting costs of each item design are calculated on first request and then memoized. Create it via `get_crafting_tree`.
+
+    Level 0 of an item's ingredients are its direct ingredients. On every following level, the craftable ingredients of the previous level get replaced by their ingredients.
+    """
+    def __init__(self, items_data: EntitiesData, version: Any = None) -> None:
+        self.__items_data: EntitiesData = items_data
+        self.__version: Any = version
+        self.__item_ids: FrozenSet[str] = frozenset(items_data.keys())
+        self.__last_checked_items_data: EntitiesData = items_data
+        self.__recipes: Dict[str, List[Tuple[str, int]]] = {}
+        self.__is_partial_artifact: Dict[str, bool] = {}
+        self.__prices: Dict[str, int] = {}
+        self.__levels: Dict[Tuple[str, bool], List[Dict[str, int]]] = {}
+        self.__costs: Dict[Tuple[str, bool], List[int]] = {}
+        for item_id, item_info in items_data.items():
+            self.__recipes[item_id] = [(ingredient_item_id, int(amount)) for ingredient_item_id, amount in get_ingredients_dict(item_info.get('Ingredients')).items()]
+            item_name = (item_info.get(ITEM_DESIGN_DESCRIPTION_PROPERTY_NAME) or '').lower()
+            # Void particles and fragments
+            self.__is_partial_artifact[item_id] = 'void particle' in item_name or ' fragment' in item_name
+
+
+    @property
+    def version(self) -> Any:
+        return self.__version
+
+
+    def get_cheapest_to_craft(self, count: int) -> List[Tuple[str, int]]:
+        """
+        Returns tuples of (item design id, crafting costs) of the count craftable item designs with the lowest crafting costs. Ties are ordered like the source data.
+        """
+        crafting_costs = []
+        for item_id, recipe in self.__recipes.items():
+            if recipe:
+                costs = self.get_crafting_costs(item_id)
+                if costs is not None:
+                    crafting_costs.append((item_id, costs))
+        crafting_costs.sort(key=lambda item_costs: item_costs[1])
+        return crafting_costs[:count]
+
+
+    def get_crafting_costs(self, item_id: str, include_partial_artifacts: bool = None) -> Optional[int]:
+        """
+        Returns the lowest market price of any ingredients level of the specified item design or None, if it can't be crafted.
+        """
+        costs = self.get_levels_costs(item_id, include_partial_artifacts=include_partial_artifacts)
+        return min(costs, default=None)
+
+
+    def get_ingredients_levels(self, item_id: str, include_partial_artifacts: bool = None) -> List[Dict[str, int]]:
+        """
+        Returns a dict of ingredient item design ids and amounts per ingredients level of the specified item design. Levels without ingredients are omitted.
+
+        If include_partial_artifacts is None, it's determined by `get_include_partial_artifacts`.
+        """
+        return [dict(level) for level in self.__get_levels(item_id, include_partial_artifacts)]
+
+
+    def get_levels_costs(self, item_id: str, include_partial_artifacts: bool = None) -> List[int]:
+        """
+        Returns the summed market price of the ingredients per ingredients level of the specified item design.
+        """
+        key = self.__get_key(item_id, include_partial_artifacts)
+        result = self.__costs.get(key)
+        if result is None:
+            result = [sum(self.get_price(ingredient_item_id) * amount for ingredient_item_id, amount in level.items()) for level in self.__get_levels(*key)]
+            self.__costs[key] = result
+        return list(result)
+
+
+    def get_price(self, item_id: str) -> int:
+        result = self.__prices.get(item_id)
+        if result is None:
+            result = int(self.__items_data[item_id]['MarketPrice'])
+            self.__prices[item_id] = result
+        return result
+
+
+    def is_derived_from(self, items_data: EntitiesData) -> bool:
+        """
+        Checks, if this tree has been built from data containing the same item designs.
+        """
+        if items_data is self.__last_checked_items_data:
+            return True
+        result = items_data is not None and len(items_data) == len(self.__item_ids) and self.__item_ids == items_data.keys()
+        if result:
+            self.__last_checked_items_data = items_data
+        return result
+
+
+    def __get_children(self, item_id: str, include_partial_artifacts: bool) -> List[Tuple[str, int]]:
+        if include_partial_artifacts:
+            return self.__recipes[item_id]
+        return [(ingredient_item_id, amount) for ingredient_item_id, amount in self.__recipes[item_id] if not self.__is_partial_artifact[ingredient_item_id]]
+
+
+    def __get_key(self, item_id: str, include_partial_artifacts: Optional[bool]) -> Tuple[str, bool]:
+        if include_partial_artifacts is None:
+            include_partial_artifacts = get_include_partial_artifacts(self.__items_data[item_id])
+        return (item_id, include_partial_artifacts)
+
+
+    def __get_levels(self, item_id: str, include_partial_artifacts: Optional[bool]) -> List[Dict[str, int]]:
+        key = self.__get_key(item_id, include_partial_artifacts)
+        result = self.__levels.get(key)
+        if result is None:
+            result = self.__create_levels(*key)
+            self.__levels[key] = result
+        return result
+
+
+    def __create_levels(self, item_id: str, include_partial_artifacts: bool) -> List[Dict[str, int]]:
+        result = []
+        ingredients = self.__get_children(item_id, include_partial_artifacts)
+        while ingredients:
+            level = {}
+            for ingredient_item_id, amount in ingredients:
+                level[ingredient_item_id] = level.get(ingredient_item_id, 0) + amount
+            result.append(level)
+
+            # Merging the amounts of an ingredient occurring multiple times on one level doesn't change the order of the ingredients on the following levels
+            ingredients_without_subs = []
+            sub_ingredients = []
+            for ingredient_item_id, amount in level.items():
+                children = self.__get_children(ingredient_item_id, include_partial_artifacts)
+                if children:
+                    sub_ingredients.extend((child_item_id, child_amount * amount) for child_item_id, child_amount in children)
+                else:
+                    ingredients_without_subs.append((ingredient_item_id, amount))
+            if not sub_ingredients:
+                break
+            sub_ingredients.extend(ingredients_without_subs)
+            ingredients = sub_ingredients
+        return result
+
+
+    def __len__(self) -> int:
+        return len(self.__item_ids)
+
+
+class ItemsIngredientsIndex():
+    """
+    Maps item design ids to the ids of the item designs requiring them as ingredients. Create it via `get_ingredients_index`.
+    """
+    def __init__(self, items_data: EntitiesData, version: Any = None) -> None:
+        self.__version: Any = version
+        self.__item_ids: FrozenSet[str] = frozenset(items_data.keys())
+        self.__used_in: Dict[str, List[str]] = {}
+        for item_id, item_info in items_data.items():
+            for ingredient_item_id in get_ingredients_dict(item_info.get('Ingredients')).keys():
+                self.__used_in.setdefault(ingredient_item_id, []).append(item_id)
+
+
+    @property
+    def version(self) -> Any:
+        return self.__version
+
+
+    def get_used_in(self, item_id: str) -> List[str]:
+        """
+        Returns the ids of the item designs directly requiring the specified item in the order of the source data.
+        """
+        return list(self.__used_in.get(item_id, []))
+
+
+    def get_used_in_transitively(self, item_id: str) -> List[str]:
+        """
+        Returns the ids of the item designs requiring the specified item, directly or via any of their ingredients. Items requiring it directly come first.
+        """
+        result = []
+        visited = {item_id}
+        current_ids = [item_id]
+        while current_ids:
+            next_ids = []
+            for current_id in current_ids:
+                for used_in_id in self.__used_in.get(current_id, []):
+                    if used_in_id not in visited:
+                        visited.add(used_in_id)
+                        next_ids.append(used_in_id)
+            result.extend(next_ids)
+            current_ids = next_ids
+        return result
+
+
+    def is_derived_from(self, items_data: EntitiesData) -> bool:
+        """
+        Checks, if this index has been built from data containing the same item designs.
+        """
+        return items_data is not None and len(items_data) == len(self.__item_ids) and self.__item_ids == items_data.keys()
+
+
+    def __len__(self) -> int:
+        return len(self.__item_ids)
+
+
+
+
+
 # ---------- Item info ----------
 
 async def get_item_details_by_name(ctx: Context, item_name: str, as_embed: bool = settings.USE_EMBEDS) -> Union[List[Embed], List[str]]:
     pss_assert.valid_entity_name(item_name, allowed_values=ALLOWED_ITEM_NAMES)
 
-    items_data = await items_designs_retriever.get_data_dict3()
+    items_data, trainings_data = await entity.get_data_dicts3(items_designs_retriever, training.trainings_designs_retriever)
     item_infos = __get_item_infos_by_name(item_name, items_data)
 
     if not item_infos:
         raise NotFound(f'Could not find an item named `{item_name}`.')
     else:
-        trainings_data = await training.trainings_designs_retriever.get_data_dict3()
         items_data_for_sort = {item_info.get(ITEM_DESIGN_KEY_NAME): item_info for item_info in item_infos}
         item_infos = sorted(item_infos, key=lambda item_info: (
             __get_key_for_base_items_sort(item_info, items_data_for_sort)
@@ -273,58 +465,6 @@ async def get_ingredients_for_item(ctx: Context, item_name: str, as_embed: bool
             return (await ingredients_details_collection.get_entities_details_as_text(custom_footer_text=resources.get_resource('PRICE_NOTE')))
 
 
-def __flatten_ingredients_tree(ingredients_tree: IngredientsTree) -> List[Dict[str, int]]:
-    """Returns a list of dicts"""
-    ingredients = {}
-    ingredients_without_subs = []
-    sub_ingredients = []
-
-    for item_id, item_amount, item_ingredients in ingredients_tree:
-        if item_id in ingredients.keys():
-            ingredients[item_id] += item_amount
-        else:
-            ingredients[item_id] = item_amount
-
-        if item_ingredients:
-            sub_ingredients.extend(item_ingredients)
-        else:
-            ingredients_without_subs.append((item_id, item_amount, item_ingredients))
-
-    result = [ingredients]
-
-    if len(ingredients_without_subs) != len(ingredients_tree):
-        sub_ingredients.extend(ingredients_without_subs)
-        flattened_subs = __flatten_ingredients_tree(sub_ingredients)
-        result.extend(flattened_subs)
-
-    return result
-
-
-def __parse_ingredients_tree(ingredients_str: str, items_data: EntitiesData, include_partial_artifacts: bool, parent_amount: int = 1) -> List[IngredientsTree]:
-    """returns a tree structure: [(item_id, item_amount, item_ingredients[])]"""
-    if not ingredients_str:
-        return []
-
-    # Ingredients format is: [<id>x<amount>][|<id>x<amount>]*
-    ingredients_dict = get_ingredients_dict(ingredients_str)
-    result = []
-
-    for item_id, item_amount in ingredients_dict.items():
-        item_info = items_data[item_id]
-        item_name = item_info[ITEM_DESIGN_DESCRIPTION_PROPERTY_NAME].lower()
-        item_amount = int(item_amount)
-        # Filter out void particles and fragments
-        if include_partial_artifacts or ('void particle' not in item_name and ' fragment' not in item_name):
-            combined_amount = item_amount * parent_amount
-            item_ingredients = __parse_ingredients_tree(item_info['Ingredients'], items_data, include_partial_artifacts, combined_amount)
-            result.append((item_id, combined_amount, item_ingredients))
-
-    return result
-
-
-
-
-
 # ---------- Upgrade info ----------
 
 async def get_item_upgrades_from_name(ctx: Context, item_name: str, as_embed: bool = settings.USE_EMBEDS) -> Union[List[Embed], List[str]]:
@@ -337,11 +477,12 @@ async def get_item_upgrades_from_name(ctx: Context, item_name: str, as_embed: bo
     if not items_ids or not items_infos:
         raise NotFound(f'Could not find an item named `{item_name}` that can be upgraded.')
     else:
+        ingredients_index = get_ingredients_index(items_data)
         upgrades_infos = []
         found_upgrades_for_data = {}
         no_upgrades_for_data = {}
         for item_id in items_ids:
-            upgrades_for = __get_upgrades_for(item_id, items_data)
+            upgrades_for = __get_upgrades_for(item_id, items_data, ingredients_index)
             upgrades_infos.extend(upgrades_for)
             if all(upgrades_for):
                 found_upgrades_for_data[item_id] = items_data[item_id]
@@ -379,13 +520,9 @@ def __get_title_upgrades(upgrades_infos_count: int, items_data: EntitiesData) ->
     return result
 
 
-def __get_upgrades_for(item_id: str, items_data: EntitiesData) -> List[Optional[EntityInfo]]:
-    # iterate through item_design_data and return every item_design containing the item id in question in property 'Ingredients'
-    result = []
-    for item_info in items_data.values():
-        ingredient_item_ids = list(get_ingredients_dict(item_info['Ingredients']).keys())
-        if item_id in ingredient_item_ids:
-            result.append(item_info)
+def __get_upgrades_for(item_id: str, items_data: EntitiesData, ingredients_index: ItemsIngredientsIndex) -> List[Optional[EntityInfo]]:
+    # return every item_design containing the item id in question in property 'Ingredients'
+    result = [items_data[used_in_id] for used_in_id in ingredients_index.get_used_in(item_id)]
     if not result:
         result = [None]
     return result
@@ -397,21 +534,17 @@ def __get_upgrades_for(item_id: str, items_data: EntitiesData) -> List[Optional[
 # ---------- Transformation functions ----------
 
 def __get_all_ingredients(item_info: EntityInfo, items_data: EntitiesData, trainings_data: EntitiesData = None, **kwargs) -> Optional[str]:
-    include_partial_artifacts = get_include_partial_artifacts(item_info)
-    ingredients_tree = __parse_ingredients_tree(item_info['Ingredients'], items_data, include_partial_artifacts)
-    ingredients_dicts = __flatten_ingredients_tree(ingredients_tree)
-    ingredients_dicts = [d for d in ingredients_dicts if d]
+    crafting_tree = get_crafting_tree(items_data)
+    item_id = item_info[ITEM_DESIGN_KEY_NAME]
+    ingredients_dicts = crafting_tree.get_ingredients_levels(item_id)
     lines = []
     if ingredients_dicts:
-        for ingredients_dict in ingredients_dicts:
+        for ingredients_dict, current_level_costs in zip(ingredients_dicts, crafting_tree.get_levels_costs(item_id)):
             current_level_lines = []
-            current_level_costs = 0
             for ingredient_item_id, ingredient_amount in ingredients_dict.items():
-                ingredient_item_info = items_data[ingredient_item_id]
-                ingredient_name = ingredient_item_info[ITEM_DESIGN_DESCRIPTION_PROPERTY_NAME]
-                ingredient_price = int(ingredient_item_info['MarketPrice'])
+                ingredient_name = items_data[ingredient_item_id][ITEM_DESIGN_DESCRIPTION_PROPERTY_NAME]
+                ingredient_price = crafting_tree.get_price(ingredient_item_id)
                 price_sum = ingredient_price * ingredient_amount
-                current_level_costs += price_sum
                 current_level_lines.append(f'> {ingredient_amount} x {ingredient_name} ({ingredient_price} bux ea): {price_sum} bux')
             lines.extend(current_level_lines)
             lines.append(f'Crafting costs: {current_level_costs} bux')
@@ -636,7 +769,7 @@ def get_item_details_by_id(item_design_id: str, items_data: EntitiesData, traini
 
 
 def get_item_details_by_training_id(training_id: str, items_data: EntitiesData, trainings_data: EntitiesData) -> List[entity.EntityDetails]:
-    items_designs_ids = core.get_ids_from_property_value(items_data, training.TRAINING_DESIGN_KEY_NAME, training_id, fix_data_delegate=__fix_item_name, match_exact=True)
+    items_designs_ids = items_designs_retriever.get_ids_from_property_value(items_data, training.TRAINING_DESIGN_KEY_NAME, training_id, fix_data_delegate=__fix_item_name, match_exact=True)
     result = [get_item_details_by_id(item_design_id, items_data, trainings_data) for item_design_id in items_designs_ids]
     return result
 
@@ -647,8 +780,7 @@ async def get_item_search_details(item_details: entity.EntityDetails) -> List[st
 
 
 async def get_items_details_by_name(item_name: str, sorted: bool = True) -> List[entity.EntityDetails]:
-    items_data = await items_designs_retriever.get_data_dict3()
-    trainings_data = await training.trainings_designs_retriever.get_data_dict3()
+    items_data, trainings_data = await entity.get_data_dicts3(items_designs_retriever, training.trainings_designs_retriever)
     item_infos = __get_item_infos_by_name(item_name, items_data)
     if sorted:
         item_infos = entity.sort_entities_by(item_infos, [(ITEM_DESIGN_DESCRIPTION_PROPERTY_NAME, None, False)])
@@ -722,6 +854,20 @@ def __get_allowed_item_names(items_data: EntitiesData, not_allowed_item_names: L
     return result
 
 
+def get_crafting_tree(items_data: EntitiesData) -> CraftingTree:
+    """
+    Returns the crafting tree for items_data. The tree only gets rebuilt, when the cached item designs change.
+    """
+    return items_designs_retriever.get_derived_data(CraftingTree, items_data, CraftingTree)
+
+
+def get_ingredients_index(items_data: EntitiesData) -> ItemsIngredientsIndex:
+    """
+    Returns the reverse ingredients index for items_data. The index only gets rebuilt, when the cached item designs change.
+    """
+    return items_designs_retriever.get_derived_data(ItemsIngredientsIndex, items_data, ItemsIngredientsIndex)
+
+
 def get_ingredients_dict(ingredients: str) -> Dict[str, str]:
     result = {}
     if entity.entity_property_has_value(ingredients):
@@ -742,7 +888,7 @@ def __get_parents(item_info: EntityInfo, items_data: EntitiesData) -> List[Entit
 
 
 def __get_item_design_ids_from_name(item_name: str, items_data: EntitiesData) -> List[str]:
-    results = core.get_ids_from_property_value(items_data, ITEM_DESIGN_DESCRIPTION_PROPERTY_NAME, item_name, fix_data_delegate=__fix_item_name)
+    results = items_designs_retriever.get_ids_from_property_value(items_data, ITEM_DESIGN_DESCRIPTION_PROPERTY_NAME, item_name, fix_data_delegate=__fix_item_name)
     return results
 
 
@@ -786,7 +932,8 @@ def __get_stat_filter(stat: str) -> str:
 # ---------- Create entity.EntityDetails ----------
 
 def __create_base_details_from_info(item_info: EntityInfo, items_data: EntitiesData, trainings_data: EntitiesData) -> entity.EntityDetails:
-    return entity.EntityDetails(item_info, __properties['title'], __properties['description'], __properties['base'], __properties['embed_settings'], items_data, trainings_data)
+    render_cache_key = entity.get_render_cache_key('item_base', items_designs_retriever, training.trainings_designs_retriever)
+    return entity.EntityDetails(item_info, __properties['title'], __properties['description'], __properties['base'], __properties['embed_settings'], items_data, trainings_data, render_cache_key=render_cache_key)
 
 
 def __create_base_details_collection_from_infos(items_infos: List[EntityInfo], items_data: EntitiesData, trainings_data: EntitiesData) -> entity.EntityDetailsCollection:
@@ -802,7 +949,8 @@ def __create_base_details_list_from_infos(items_infos: List[EntityInfo], items_d
 
 
 def __create_best_item_details_from_info(item_info: EntityInfo, items_data: EntitiesData) -> entity.EntityDetails:
-    return entity.EntityDetails(item_info, __properties['title'], __properties['description'], __properties['best'], __properties['embed_settings'], items_data, prefix='> ')
+    render_cache_key = entity.get_render_cache_key('item_best', items_designs_retriever)
+    return entity.EntityDetails(item_info, __properties['title'], __properties['description'], __properties['best'], __properties['embed_settings'], items_data, prefix='> ', render_cache_key=render_cache_key)
 
 
 def __create_best_item_details_collection_from_details(best_details: List[entity.EntityDetails]) -> entity.EntityDetailsCollection:
@@ -812,7 +960,8 @@ def __create_best_item_details_collection_from_details(best_details: List[entity
 
 
 def __create_ingredients_design_data_from_info(item_info: EntityInfo, items_data: EntitiesData) -> entity.EntityDetails:
-    return entity.EntityDetails(item_info, __properties['title_ingredients'], __properties['description_ingredients'], None, __properties['embed_settings'], items_data)
+    render_cache_key = entity.get_render_cache_key('item_ingredients', items_designs_retriever)
+    return entity.EntityDetails(item_info, __properties['title_ingredients'], __properties['description_ingredients'], None, __properties['embed_settings'], items_data, render_cache_key=render_cache_key)
 
 
 def __create_ingredients_details_collection_from_infos(items_designs_infos: List[EntityInfo], items_data: EntitiesData) -> entity.EntityDetailsCollection:
@@ -823,7 +972,8 @@ def __create_ingredients_details_collection_from_infos(items_designs_infos: List
 
 
 def __create_price_design_data_from_info(item_info: EntityInfo, items_data: EntitiesData) -> entity.EntityDetails:
-    return entity.EntityDetails(item_info, __properties['title'], __properties['description'], __properties['price'], __properties['embed_settings'], items_data)
+    render_cache_key = entity.get_render_cache_key('item_price', items_designs_retriever)
+    return entity.EntityDetails(item_info, __properties['title'], __properties['description'], __properties['price'], __properties['embed_settings'], items_data, render_cache_key=render_cache_key)
 
 
 def __create_price_details_collection_from_infos(items_designs_infos: List[EntityInfo], items_data: EntitiesData) -> entity.EntityDetailsCollection:
@@ -834,7 +984,8 @@ def __create_price_details_collection_from_infos(items_designs_infos: List[Entit
 
 
 def __create_upgrade_design_data_from_info(item_info: EntityInfo, items_data: EntitiesData, found_upgrades_for_data: EntitiesData, no_upgrades_for_data: EntitiesData, upgrades_infos_count: int) -> entity.EntityDetails:
-    return entity.EntityDetails(item_info, __properties['title'], entity.NO_PROPERTY, __properties['upgrade'], __properties['embed_settings'], items_data, found_upgrades_for_data=found_upgrades_for_data, no_upgrades_for_data=no_upgrades_for_data, upgrades_infos_count=upgrades_infos_count)
+    render_cache_key = entity.get_render_cache_key('item_upgrade', items_designs_retriever)
+    return entity.EntityDetails(item_info, __properties['title'], entity.NO_PROPERTY, __properties['upgrade'], __properties['embed_settings'], items_data, render_cache_key=render_cache_key, found_upgrades_for_data=found_upgrades_for_data, no_upgrades_for_data=no_upgrades_for_data, upgrades_infos_count=upgrades_infos_count)
 
 
 def __create_upgrade_details_collection_from_infos(items_designs_infos: List[EntityInfo], items_data: EntitiesData, found_upgrades_for_data: EntitiesData, no_upgrades_for_data: EntitiesData, upgrades_infos_count: int) -> entity.EntityDetailsCollection:
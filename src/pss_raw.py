@@ -2,19 +2,53 @@ from datetime import datetime
 import json
 import os
 import time
-from typing import Any, List
+from typing import Any, Dict, List
 
 from discord.ext.commands import Context
 
 from . import excel
+from . import pss_core as core
 from . import pss_entity as entity
 from . import settings
 from .typehints import EntitiesData, EntityInfo
 from . import utils
 
 
+# ---------- Constants ----------
+
+CHANGES_MAX_ENTITIES_PER_TYPE: int = 20
+CHANGES_MAX_FIELDS_PER_ENTITY: int = 5
+CHANGES_MAX_VALUE_LENGTH: int = 50
+
+
+
+
+
 # ---------- Raw info ----------
 
+async def post_raw_changes(ctx: Context, retrievers: Dict[str, entity.EntityRetriever]) -> None:
+    """
+    Parameter 'retrievers':
+    - Retrievers of the entity types to list the changes for by entity type name.
+    """
+    if ctx.author.id in settings.RAW_COMMAND_USERS:
+        output = []
+        for entity_name, retriever in retrievers.items():
+            changes = retriever.changes
+            if changes is not None and changes.has_changes:
+                data = await retriever.get_data_dict3()
+                output.extend(__get_changes_as_text(entity_name, changes, data, retriever.description_property_name))
+                output.append(utils.discord.ZERO_WIDTH_SPACE)
+        if output:
+            output = output[:-1]
+        else:
+            output = ['No changes to the design data have been detected since the bot has been started.']
+        await utils.discord.post_output(ctx, output)
+    else:
+        await ctx.send('You are not allowed to use this command. If you think this is an error, join the support server and contact the bot\'s author.')
+
+
+
 async def post_raw_data(ctx: Context, retriever: entity.EntityRetriever, entity_name: str, entity_id: str) -> None:
     if ctx.author.id in settings.RAW_COMMAND_USERS:
         retrieved_at = utils.get_utc_now()
@@ -26,6 +60,9 @@ async def post_raw_data(ctx: Context, retriever: entity.EntityRetriever, entity_
             elif '--xml' in entity_id:
                 entity_id = entity_id.replace('--xml', '').strip()
                 mode = 'xml'
+            elif '--csv' in entity_id:
+                entity_id = entity_id.replace('--csv', '').strip()
+                mode = 'csv'
         if entity_id:
             try:
                 entity_id = int(entity_id)
@@ -54,6 +91,38 @@ def create_raw_file(content: str, file_type: str, file_name_prefix: str, retriev
     return file_name
 
 
+def __format_changed_value(value: Any) -> str:
+    if value is None:
+        return '-'
+    result = str(value)
+    if len(result) > CHANGES_MAX_VALUE_LENGTH:
+        result = f'{result[:CHANGES_MAX_VALUE_LENGTH - 3]}...'
+    return result
+
+
+def __get_changes_as_text(entity_name: str, changes: core.EntitiesDataChanges, data: EntitiesData, description_property_name: str) -> List[str]:
+    def get_description(entity_info: EntityInfo) -> str:
+        return (entity_info or {}).get(description_property_name) or ''
+
+    lines = []
+    for entity_id in changes.added:
+        lines.append(f'+ `{entity_id}` {get_description(data.get(entity_id))}')
+    for entity_id, entity_info in changes.removed.items():
+        lines.append(f'- `{entity_id}` {get_description(entity_info)}')
+    for entity_id, fields in changes.modified.items():
+        field_changes = [f'{field_name}: `{__format_changed_value(old_value)}` → `{__format_changed_value(new_value)}`' for field_name, (old_value, new_value) in list(fields.items())[:CHANGES_MAX_FIELDS_PER_ENTITY]]
+        if len(fields) > CHANGES_MAX_FIELDS_PER_ENTITY:
+            field_changes.append(f'{len(fields) - CHANGES_MAX_FIELDS_PER_ENTITY} more')
+        lines.append(f'~ `{entity_id}` {get_description(data.get(entity_id))}: {", ".join(field_changes)}')
+
+    changed_at = f' on {utils.format.datetime(changes.new_version)}' if changes.new_version else ''
+    result = [f'**{entity_name}** data changed{changed_at}: {changes}']
+    result.extend(lines[:CHANGES_MAX_ENTITIES_PER_TYPE])
+    if len(lines) > CHANGES_MAX_ENTITIES_PER_TYPE:
+        result.append(f'... and {len(lines) - CHANGES_MAX_ENTITIES_PER_TYPE} more')
+    return result
+
+
 def __flatten_raw_data(data: EntitiesData) -> List[EntityInfo]:
     flat_data = []
     for row in data.values():
@@ -104,7 +173,7 @@ async def __post_raw_entity(ctx: Context, retriever: entity.EntityRetriever, ent
         title = [f'Could not find raw **{entity_name}** data for id **{entity_id}**.']
     else:
         title = [f'Raw **{entity_name}** data for id **{entity_id}**:']
-        if not mode:
+        if not mode or mode == 'csv':
             flat_entity = __flatten_raw_entity(entity_info)
             for key, value in flat_entity.items():
                 output.append(f'{key} = {value}')
@@ -145,9 +214,12 @@ async def __post_raw_file(ctx: Context, retriever: entity.EntityRetriever, entit
         utils.dbg_prnt(f'Flattening the {entity_name} data took {time1:.2f} seconds.')
 
         start = time.perf_counter()
-        file_path = excel.create_xl_from_raw_data_dict(flattened_data, file_name_prefix, retrieved_at)
+        if mode == 'csv':
+            file_path = excel.create_csv_from_raw_data_dict(flattened_data, file_name_prefix, retrieved_at)
+        else:
+            file_path = excel.create_xl_from_raw_data_dict(flattened_data, file_name_prefix, retrieved_at)
         time2 = time.perf_counter() - start
-        utils.dbg_prnt(f'Creating the excel sheet took {time2:.2f} seconds ({time1+time2:.2f} seconds in total).')
+        utils.dbg_prnt(f'Creating the {mode or "excel"} file took {time2:.2f} seconds ({time1+time2:.2f} seconds in total).')
     file_paths = []
     if file_path:
         file_paths.append(file_path)
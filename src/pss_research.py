@@ -159,7 +159,8 @@ def get_research_name_from_id(research_id: str, researches_data: EntitiesData) -
 # ---------- Create entity.EntityDetails ----------
 
 def __create_research_details_from_info(research_info: EntityInfo, researches_data: EntitiesData) -> entity.EntityDetails:
-    return entity.EntityDetails(research_info, __properties['title'], __properties['description'], __properties['properties'], __properties['embed_settings'], researches_data)
+    render_cache_key = entity.get_render_cache_key('research', researches_designs_retriever)
+    return entity.EntityDetails(research_info, __properties['title'], __properties['description'], __properties['properties'], __properties['embed_settings'], researches_data, render_cache_key=render_cache_key)
 
 
 def __create_researches_details_collection_from_infos(researches_designs_infos: List[EntityInfo], researches_data: EntitiesData) -> entity.EntityDetailsCollection:
@@ -193,16 +193,17 @@ def get_room_details_by_id(room_design_id: str, rooms_data: EntitiesData, items_
 async def get_room_details_by_name(room_name: str, ctx: Context = None, as_embed: bool = settings.USE_EMBEDS) -> Union[List[Embed], List[str]]:
     pss_assert.valid_entity_name(room_name, allowed_values=ALLOWED_ROOM_NAMES)
 
-    rooms_data = await rooms_designs_retriever.get_data_dict3()
+    rooms_data, items_data, researches_data, rooms_designs_sprites_data = await entity.get_data_dicts3(
+        rooms_designs_retriever,
+        item.items_designs_retriever,
+        research.researches_designs_retriever,
+        rooms_designs_sprites_retriever,
+    )
     rooms_designs_infos = get_room_infos_by_name(room_name, rooms_data)
 
     if not rooms_designs_infos:
         raise NotFound(f'Could not find a room named **{room_name}**.')
     else:
-        items_data = await item.items_designs_retriever.get_data_dict3()
-        researches_data = await research.researches_designs_retriever.get_data_dict3()
-        rooms_designs_sprites_data = await rooms_designs_sprites_retriever.get_data_dict3()
-
         exact_match_details = None
         exact_room_info = None
         big_set_threshold = BIG_SET_THRESHOLD
@@ -255,7 +256,7 @@ def get_room_infos_by_name(room_name: str, rooms_data: EntitiesData) -> List[Ent
 
 
 def _get_room_design_ids_from_name(room_name: str, rooms_data: EntitiesData) -> List[str]:
-    results = core.get_ids_from_property_value(rooms_data, ROOM_DESIGN_DESCRIPTION_PROPERTY_NAME, room_name)
+    results = rooms_designs_retriever.get_ids_from_property_value(rooms_data, ROOM_DESIGN_DESCRIPTION_PROPERTY_NAME, room_name)
     return results
 
 
@@ -264,7 +265,7 @@ def _get_room_design_ids_from_room_shortname(room_short_name: str, rooms_data: E
     if room_level and room_level > 0:
         room_short_name = f'{room_short_name}{room_level}'
         match_exact = True
-    results = core.get_ids_from_property_value(rooms_data, ROOM_DESIGN_DESCRIPTION_PROPERTY_NAME_2, room_short_name, match_exact=match_exact)
+    results = rooms_designs_retriever.get_ids_from_property_value(rooms_data, ROOM_DESIGN_DESCRIPTION_PROPERTY_NAME_2, room_short_name, match_exact=match_exact)
     return results
 
 
@@ -286,7 +287,8 @@ def _get_key_for_room_sort(room_info: EntityInfo, rooms_data: EntitiesData) -> s
 # ---------- Create entity.EntityDetails ----------
 
 def __create_room_details_from_info(room_info: EntityInfo, rooms_data: EntitiesData, items_data: EntitiesData, researches_data: EntitiesData, rooms_designs_sprites_data: EntitiesData) -> entity.EntityDetails:
-    return entity.EntityDetails(room_info, __properties['title'], __properties['description'], __properties['properties'], __properties['embed_settings'], rooms_data, items_data, researches_data, rooms_designs_sprites_data)
+    render_cache_key = entity.get_render_cache_key('room', rooms_designs_retriever, item.items_designs_retriever, research.researches_designs_retriever, rooms_designs_sprites_retriever)
+    return entity.EntityDetails(room_info, __properties['title'], __properties['description'], __properties['properties'], __properties['embed_settings'], rooms_data, items_data, researches_data, rooms_designs_sprites_data, render_cache_key=render_cache_key)
 
 
 def __create_room_details_list_from_infos(rooms_designs_infos: List[EntityInfo], rooms_data: EntitiesData, items_data: EntitiesData, researches_data: EntitiesData, rooms_designs_sprites_data: EntitiesData) -> List[entity.EntityDetails]:
@@ -860,17 +862,21 @@ def __parse_value(value: str, max_decimal_count: int = utils.DEFAULT_FLOAT_PRECI
 # ---------- Sprite Helper Functions ----------
 
 
-async def create_room_sprite(room_sprite_id: str, room_decoration_sprite: Image.Image, room_design_info: entity.EntityInfo, brightness_value: float, hue_value: float, saturation_value: float) -> Image.Image:
-    result = await sprites.load_sprite(room_sprite_id)
+def create_room_sprite(room_sprite_id: str, room_decoration_sprite: Image.Image, room_design_info: entity.EntityInfo, brightness_value: float, hue_value: float, saturation_value: float, room_decoration_sprite_key: str = None) -> Image.Image:
+    """
+    Parameter 'room_decoration_sprite_key':
+    - Identifies the room decoration sprite, so that it can be cached after being enhanced.
+    """
+    result = sprites.load_downloaded_sprite(room_sprite_id)
     room_sprite_draw: ImageDraw.ImageDraw = ImageDraw.Draw(result)
     if not room_decoration_sprite:
-        result = sprites.enhance_sprite(result, brightness=brightness_value, hue=hue_value, saturation=saturation_value)
+        result = sprites.enhance_sprite(result, brightness=brightness_value, hue=hue_value, saturation=saturation_value, cache_key=room_sprite_id)
     else:
-        room_decoration_sprite = sprites.enhance_sprite(room_decoration_sprite, brightness=brightness_value, hue=hue_value, saturation=saturation_value)
+        room_decoration_sprite = sprites.enhance_sprite(room_decoration_sprite, brightness=brightness_value, hue=hue_value, saturation=saturation_value, cache_key=room_decoration_sprite_key)
         result.paste(room_decoration_sprite, (0, 0), room_decoration_sprite)
         logo_sprite_id = room_design_info.get('LogoSpriteId')
         if entity.entity_property_has_value(logo_sprite_id):
-            logo_sprite = await sprites.load_sprite(logo_sprite_id)
+            logo_sprite = sprites.load_downloaded_sprite(logo_sprite_id)
             result.paste(logo_sprite, (1, 2), logo_sprite)
         power_bars_count = None
         max_system_power = room_design_info.get('MaxSystemPower')
@@ -912,13 +918,17 @@ def fit_door_frame_to_room_height(door_frame_sprite: Image.Image, room_height: i
     return result
 
 
-async def get_room_decoration_sprite(room_frame_sprite_id: str, door_frame_left_sprite_id: str, door_frame_right_sprite_id: str, room_width: int, room_height: int) -> Image.Image:
-    result = await sprites.load_sprite_from_disk(room_frame_sprite_id, suffix=f'{door_frame_left_sprite_id}_{door_frame_right_sprite_id}_{room_width}x{room_height}')
+def get_room_decoration_sprite(room_frame_sprite_id: str, door_frame_left_sprite_id: str, door_frame_right_sprite_id: str, room_width: int, room_height: int) -> Image.Image:
+    result = sprites.load_sprite_from_disk(room_frame_sprite_id, suffix=get_room_decoration_sprite_suffix(door_frame_left_sprite_id, door_frame_right_sprite_id, room_width, room_height))
     if not result:
-        result = await make_room_decoration_sprite(room_frame_sprite_id, door_frame_left_sprite_id, door_frame_right_sprite_id, room_width, room_height)
+        result = make_room_decoration_sprite(room_frame_sprite_id, door_frame_left_sprite_id, door_frame_right_sprite_id, room_width, room_height)
     return result
 
 
+def get_room_decoration_sprite_suffix(door_frame_left_sprite_id: str, door_frame_right_sprite_id: str, room_width: int, room_height: int) -> str:
+    return f'{door_frame_left_sprite_id}_{door_frame_right_sprite_id}_{room_width}x{room_height}'
+
+
 def get_room_sprite_id(room_design_info: entity.EntityInfo, under_construction: bool, has_decoration_sprite: bool, rooms_designs_sprites_ids: Dict[str, str]) -> str:
     if under_construction:
         result = room_design_info['ConstructionSpriteId']
@@ -930,9 +940,9 @@ def get_room_sprite_id(room_design_info: entity.EntityInfo, under_construction:
     return result
 
 
-async def make_door_frame_sprite(door_frame_left_sprite_id: str, door_frame_right_sprite_id: str, room_height: int) -> Image.Image:
-    door_frame_left_sprite = await sprites.load_sprite(door_frame_left_sprite_id)
-    door_frame_right_sprite = await sprites.load_sprite(door_frame_right_sprite_id)
+def make_door_frame_sprite(door_frame_left_sprite_id: str, door_frame_right_sprite_id: str, room_height: int) -> Image.Image:
+    door_frame_left_sprite = sprites.load_downloaded_sprite(door_frame_left_sprite_id)
+    door_frame_right_sprite = sprites.load_downloaded_sprite(door_frame_right_sprite_id)
     width = door_frame_left_sprite.width + door_frame_right_sprite.width - 2
 
     result = sprites.create_empty_sprite(width, door_frame_left_sprite.height)
@@ -945,17 +955,17 @@ async def make_door_frame_sprite(door_frame_left_sprite_id: str, door_frame_righ
     return result
 
 
-async def make_room_decoration_sprite(room_frame_sprite_id: str, door_frame_left_sprite_id: str, door_frame_right_sprite_id: str, room_width: int, room_height: int) -> Image.Image:
+def make_room_decoration_sprite(room_frame_sprite_id: str, door_frame_left_sprite_id: str, door_frame_right_sprite_id: str, room_width: int, room_height: int) -> Image.Image:
     if room_width == 3 and room_height == 2:
-        room_frame_sprite = await sprites.load_sprite(room_frame_sprite_id)
+        room_frame_sprite = sprites.load_downloaded_sprite(room_frame_sprite_id)
     else: # edit frame sprite
-        room_frame_sprite = await sprites.load_sprite_from_disk(room_frame_sprite_id, suffix=f'{room_width}x{room_height}')
+        room_frame_sprite = sprites.load_sprite_from_disk(room_frame_sprite_id, suffix=f'{room_width}x{room_height}')
         if not room_frame_sprite:
-            room_frame_sprite = await make_room_frame_sprite(room_frame_sprite_id, room_width, room_height)
+            room_frame_sprite = make_room_frame_sprite(room_frame_sprite_id, room_width, room_height)
 
-    door_frame_sprite = await sprites.load_sprite_from_disk(door_frame_left_sprite_id, prefix='door_frame', suffix=f'{door_frame_right_sprite_id}_{room_height}')
+    door_frame_sprite = sprites.load_sprite_from_disk(door_frame_left_sprite_id, prefix='door_frame', suffix=f'{door_frame_right_sprite_id}_{room_height}')
     if not door_frame_sprite:
-        door_frame_sprite = await make_door_frame_sprite(door_frame_left_sprite_id, door_frame_right_sprite_id, room_height)
+        door_frame_sprite = make_door_frame_sprite(door_frame_left_sprite_id, door_frame_right_sprite_id, room_height)
 
     room_decoration_sprite = room_frame_sprite.copy()
     door_frame_y = room_frame_sprite.height - door_frame_sprite.height - 1
@@ -966,8 +976,8 @@ async def make_room_decoration_sprite(room_frame_sprite_id: str, door_frame_left
     return room_decoration_sprite
 
 
-async def make_room_frame_sprite(room_frame_sprite_id: str, room_width: int, room_height: int) -> Image.Image:
-    room_frame_sprite = await sprites.load_sprite(room_frame_sprite_id)
+def make_room_frame_sprite(room_frame_sprite_id: str, room_width: int, room_height: int) -> Image.Image:
+    room_frame_sprite = sprites.load_downloaded_sprite(room_frame_sprite_id)
     result = sprites.create_empty_room_sprite(room_width, room_height)
     from_left = sprites.TILE_SIZE // 2 # 12
     from_right = sprites.TILE_SIZE - from_left # 13
@@ -1,4 +1,14 @@
-from typing import Dict, List, Optional, Tuple, Union
+import asyncio
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import copy
+import hashlib
+import io
+import json
+import multiprocessing
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
 
 from discord import Embed
 from discord.ext.commands.context import Context
@@ -8,6 +18,7 @@ from PIL import Image, ImageDraw
 
 from . import pss_core as core
 from . import pss_entity as entity
+from .pss_exception import Error
 from . import pss_fleet as fleet
 from . import pss_login as login
 from . import pss_room as room
@@ -31,6 +42,259 @@ SHIP_DESIGN_KEY_NAME: str = 'ShipDesignId'
 
 
 
+# ---------- Typehint definitions ----------
+
+# Keys: 'brightness', 'hue', 'saturation', 'rooms' (list of [room design id, under construction, column, row])
+ShipLayout = Dict[str, Any]
+
+
+
+
+
+# ---------- Classes ----------
+
+class ShipLayoutRenderer():
+    """
+    Renders ship layouts in worker processes, so that the event loop doesn't get blocked by compositing sprites. If max_workers is 0, layouts get rendered on the event loop.
+
+    Rendered layouts are cached by a hash of everything they're rendered from. Concurrent requests for the same layout share one rendering. If max_queue_depth layouts are being rendered, further requests get rejected.
+    """
+    def __init__(self, max_workers: int, max_queue_depth: int, cache_max_bytes: int) -> None:
+        self.__max_workers: int = max_workers
+        self.__max_queue_depth: int = max_queue_depth
+        self.__cache_max_bytes: int = cache_max_bytes
+        self.__cache: 'OrderedDict[str, bytes]' = OrderedDict()
+        self.__cache_size: int = 0
+        self.__executor: ProcessPoolExecutor = None
+        self.__render_tasks: Dict[str, asyncio.Task] = {}
+
+        self.__cache_hits: int = 0
+        self.__rejected: int = 0
+        self.__rendered: int = 0
+        self.__render_duration_max: float = 0.0
+        self.__render_duration_total: float = 0.0
+
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Number of layouts being rendered.
+        """
+        return len(self.__render_tasks)
+
+    @property
+    def statistics(self) -> Dict[str, Union[int, float]]:
+        return {
+            'queue_depth': self.queue_depth,
+            'rendered': self.__rendered,
+            'rejected': self.__rejected,
+            'cache_entries': len(self.__cache),
+            'cache_size': self.__cache_size,
+            'cache_hits': self.__cache_hits,
+            'render_duration_avg': self.__render_duration_total / self.__rendered if self.__rendered else 0.0,
+            'render_duration_max': self.__render_duration_max,
+        }
+
+
+    async def render(self, user_ship_info: EntityInfo, ship_design_info: EntityInfo, rooms_designs_data: EntitiesData, rooms_designs_sprites_ids: Dict[str, str]) -> bytes:
+        """
+        Returns the PNG encoded layout of the user's ship.
+        """
+        layout = get_ship_layout(user_ship_info)
+        room_design_ids = set(room_design_id for room_design_id, _, _, _ in layout['rooms'])
+        render_args = (
+            layout,
+            ship_design_info,
+            {room_design_id: rooms_designs_data[room_design_id] for room_design_id in room_design_ids},
+            {room_design_id: rooms_designs_sprites_ids[room_design_id] for room_design_id in room_design_ids if room_design_id in rooms_designs_sprites_ids},
+        )
+        key = hashlib.sha256(json.dumps(render_args, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+        result = self.__cache.get(key)
+        if result is not None:
+            self.__cache.move_to_end(key)
+            self.__cache_hits += 1
+            return result
+
+        render_task = self.__render_tasks.get(key)
+        if render_task is None:
+            if len(self.__render_tasks) >= self.__max_queue_depth:
+                self.__rejected += 1
+                raise Error('There are too many ship layouts being built at the moment. Please try again in a few seconds.')
+            render_task = asyncio.create_task(self.__render(key, render_args))
+            self.__render_tasks[key] = render_task
+            render_task.add_done_callback(lambda _: self.__render_tasks.pop(key, None))
+        result = await asyncio.shield(render_task)
+        return result
+
+
+    def shutdown(self) -> None:
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False, cancel_futures=True)
+            self.__executor = None
+
+
+    def __add_to_cache(self, key: str, data: bytes) -> None:
+        if len(data) > self.__cache_max_bytes:
+            return
+        self.__cache[key] = data
+        self.__cache_size += len(data)
+        while self.__cache_size > self.__cache_max_bytes:
+            _, evicted_data = self.__cache.popitem(last=False)
+            self.__cache_size -= len(evicted_data)
+
+
+    def __get_executor(self) -> ProcessPoolExecutor:
+        if self.__executor is None:
+            # Don't fork the bot's process with its running event loop and threads
+            self.__executor = ProcessPoolExecutor(max_workers=self.__max_workers, mp_context=multiprocessing.get_context('spawn'), initializer=sprites.init_sync)
+        return self.__executor
+
+
+    async def __render(self, key: str, render_args: Tuple[ShipLayout, EntityInfo, EntitiesData, Dict[str, str]]) -> bytes:
+        await asyncio.gather(*[sprites.download_sprite(sprite_id) for sprite_id in get_ship_layout_sprite_ids(*render_args)])
+
+        start = time.perf_counter()
+        if self.__max_workers > 0:
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(self.__get_executor(), render_ship_layout_sprite, *render_args)
+            except BrokenProcessPool:
+                self.__executor = None
+                raise
+        else:
+            result = render_ship_layout_sprite(*render_args)
+        duration = time.perf_counter() - start
+
+        self.__rendered += 1
+        self.__render_duration_total += duration
+        self.__render_duration_max = max(self.__render_duration_max, duration)
+        self.__add_to_cache(key, result)
+        return result
+
+
+
+
+
+class InspectShipService():
+    """
+    Sends InspectShip requests to the API, at most max_concurrency at a time. Responses are cached per user id for cache_ttl seconds, so that commands shortly after each other share them. Concurrent requests for the same user share a single API call.
+    """
+    def __init__(self, request_delegate: Callable[[str], Awaitable[Tuple[EntityInfo, EntityInfo]]], max_concurrency: int, cache_ttl: float, cache_max_entries: int) -> None:
+        """
+        Parameter 'request_delegate':
+        - Sends the request for a user id and returns (user info, ship info).
+        """
+        self.__request_delegate: Callable[[str], Awaitable[Tuple[EntityInfo, EntityInfo]]] = request_delegate
+        self.__max_concurrency: int = max(1, max_concurrency)
+        self.__cache_ttl: float = cache_ttl
+        self.__cache_max_entries: int = cache_max_entries
+        self.__cache: 'OrderedDict[str, Tuple[float, Tuple[EntityInfo, EntityInfo]]]' = OrderedDict()
+        self.__semaphore: asyncio.Semaphore = asyncio.Semaphore(self.__max_concurrency)
+        self.__request_tasks: Dict[str, asyncio.Task] = {}
+
+        self.__cache_hits: int = 0
+        self.__failed: int = 0
+        self.__requested: int = 0
+        self.__skipped: int = 0
+        self.__request_duration_max: float = 0.0
+        self.__request_duration_total: float = 0.0
+
+
+    @property
+    def statistics(self) -> Dict[str, Union[int, float]]:
+        return {
+            'max_concurrency': self.__max_concurrency,
+            'pending': len(self.__request_tasks),
+            'requested': self.__requested,
+            'failed': self.__failed,
+            'skipped': self.__skipped,
+            'cache_entries': len(self.__cache),
+            'cache_hits': self.__cache_hits,
+            'request_duration_avg': self.__request_duration_total / self.__requested if self.__requested else 0.0,
+            'request_duration_max': self.__request_duration_max,
+        }
+
+
+    async def get(self, user_id: str) -> Tuple[EntityInfo, EntityInfo]:
+        """
+        Returns copies of the user info and the ship info of the user. Both are None, if the user can't be found.
+        """
+        user_id = str(user_id)
+        result = self.__get_cached(user_id)
+        if result is None:
+            request_task = self.__request_tasks.get(user_id)
+            if request_task is None:
+                request_task = asyncio.create_task(self.__request(user_id))
+                self.__request_tasks[user_id] = request_task
+                request_task.add_done_callback(lambda _: self.__request_tasks.pop(user_id, None))
+            result = await asyncio.shield(request_task)
+        return copy.deepcopy(result)
+
+
+    async def get_many(self, user_ids: Iterable[str], max_requests: int) -> Dict[str, Tuple[EntityInfo, EntityInfo]]:
+        """
+        Returns the user info and the ship info per user id. Cached responses don't count towards max_requests.
+
+        Users are missing from the result, if their request failed or if max_requests had been reached before their turn.
+        """
+        result = {}
+        request_user_ids = []
+        for user_id in dict.fromkeys(str(user_id) for user_id in user_ids):
+            cached_result = self.__get_cached(user_id)
+            if cached_result is not None:
+                result[user_id] = copy.deepcopy(cached_result)
+            elif len(request_user_ids) < max_requests:
+                request_user_ids.append(user_id)
+            else:
+                self.__skipped += 1
+
+        responses = await asyncio.gather(*[self.get(user_id) for user_id in request_user_ids], return_exceptions=True)
+        for user_id, response in zip(request_user_ids, responses):
+            if isinstance(response, Exception):
+                print(f'[InspectShipService] Could not inspect the ship of user {user_id}: {response}')
+            else:
+                result[user_id] = response
+        return result
+
+
+    def __get_cached(self, user_id: str) -> Optional[Tuple[EntityInfo, EntityInfo]]:
+        entry = self.__cache.get(user_id)
+        if entry is None:
+            return None
+        expires_at, result = entry
+        if expires_at <= time.monotonic():
+            self.__cache.pop(user_id, None)
+            return None
+        self.__cache.move_to_end(user_id)
+        self.__cache_hits += 1
+        return result
+
+
+    async def __request(self, user_id: str) -> Tuple[EntityInfo, EntityInfo]:
+        async with self.__semaphore:
+            start = time.perf_counter()
+            try:
+                result = await self.__request_delegate(user_id)
+            except Exception:
+                self.__failed += 1
+                raise
+            finally:
+                duration = time.perf_counter() - start
+                self.__requested += 1
+                self.__request_duration_total += duration
+                self.__request_duration_max = max(self.__request_duration_max, duration)
+
+        if self.__cache_ttl > 0:
+            self.__cache[user_id] = (time.monotonic() + self.__cache_ttl, result)
+            self.__cache.move_to_end(user_id)
+            while len(self.__cache) > self.__cache_max_entries:
+                self.__cache.popitem(last=False)
+        return result
+
+
+
+
+
 # ---------- Ship builder links ----------
 
 async def get_ship_builder_links(ctx: Context, user_info: entity.EntityInfo, as_embed: bool = settings.USE_EMBEDS) -> Union[List[Embed], List[str]]:
@@ -83,10 +347,10 @@ async def get_ship_builder_links(ctx: Context, user_info: entity.EntityInfo, as_
 # ---------- Helper functions ----------
 
 async def get_inspect_ship_for_user(user_id: str) -> Tuple[Dict, Dict]:
-    inspect_ship_path = await __get_inspect_ship_base_path(user_id)
-    inspect_ship_data = await core.get_data_from_path(inspect_ship_path)
-    result = utils.convert.xmltree_to_dict2(inspect_ship_data)
-    return result.get('User', None), result.get('Ship', None)
+    """
+    Responses are cached for `settings.INSPECT_SHIP_CACHE_TTL` seconds.
+    """
+    return await INSPECT_SHIP_SERVICE.get(user_id)
 
 
 async def get_ship_level(ship_info: EntityInfo, ship_design_data: EntitiesData = None) -> Optional[str]:
@@ -117,23 +381,74 @@ async def __get_inspect_ship_base_path(user_id: str) -> str:
     return result
 
 
+async def __request_inspect_ship_for_user(user_id: str) -> Tuple[Dict, Dict]:
+    inspect_ship_path = await __get_inspect_ship_base_path(user_id)
+    inspect_ship_data = await core.get_data_from_path(inspect_ship_path)
+    result = utils.convert.xmltree_to_dict2(inspect_ship_data)
+    return result.get('User', None), result.get('Ship', None)
+
+
 
 
 
 # ---------- Sprite helper functions ----------
 
+def get_ship_layout(user_ship_info: EntityInfo) -> ShipLayout:
+    """
+    Extracts the properties from the user's ship info, that are relevant for rendering its layout.
+    """
+    rooms = []
+    for ship_room_info in user_ship_info['Rooms'].values():
+        room_under_construction = 1 if ship_room_info.get('RoomStatus') == 'Upgrading' or entity.entity_property_has_value(ship_room_info.get('ConstructionStartDate')) else 0
+        rooms.append([ship_room_info[room.ROOM_DESIGN_KEY_NAME], room_under_construction, int(ship_room_info['Column']), int(ship_room_info['Row'])])
+    result = {
+        'brightness': float(user_ship_info.get('BrightnessValue', '0')),
+        'hue': float(user_ship_info.get('HueValue', '0')),
+        'saturation': float(user_ship_info.get('SaturationValue', '0')),
+        'rooms': rooms,
+    }
+    return result
+
+
+def get_ship_layout_sprite_ids(layout: ShipLayout, ship_design_info: EntityInfo, rooms_designs_data: EntitiesData, rooms_designs_sprites_ids: Dict[str, str]) -> Set[str]:
+    """
+    Returns the ids of the sprites that need to be downloaded before the layout can be rendered.
+    """
+    result = {ship_design_info['InteriorSpriteId']}
+    for room_design_id, room_under_construction, _, _ in layout['rooms']:
+        room_design_info = rooms_designs_data[room_design_id]
+        has_decoration_sprite = (int(room_design_info['Columns']), int(room_design_info['Rows'])) != (1, 1)
+        result.add(room.get_room_sprite_id(room_design_info, room_under_construction, has_decoration_sprite, rooms_designs_sprites_ids))
+        if has_decoration_sprite:
+            result.add(ship_design_info.get('RoomFrameSpriteId'))
+            result.add(ship_design_info.get('DoorFrameLeftSpriteId'))
+            result.add(ship_design_info.get('DoorFrameRightSpriteId'))
+            logo_sprite_id = room_design_info.get('LogoSpriteId')
+            if entity.entity_property_has_value(logo_sprite_id):
+                result.add(logo_sprite_id)
+    return result
+
+
 async def make_ship_layout_sprite(file_name_prefix: str, user_ship_info: entity.EntityInfo, ship_design_info: entity.EntityInfo, rooms_designs_data: entity.EntitiesData, rooms_designs_sprites_ids: Dict[str, str]) -> str:
     user_id = user_ship_info['UserId']
+    layout_data = await LAYOUT_RENDERER.render(user_ship_info, ship_design_info, rooms_designs_data, rooms_designs_sprites_ids)
+    file_path = sprites.save_sprite_data(layout_data, f'{file_name_prefix}_{user_id}_layout')
+    return file_path
 
-    brightness_value = float(user_ship_info.get('BrightnessValue', '0'))
-    hue_value = float(user_ship_info.get('HueValue', '0'))
-    saturation_value = float(user_ship_info.get('SaturationValue', '0'))
+
+def render_ship_layout_sprite(layout: ShipLayout, ship_design_info: EntityInfo, rooms_designs_data: EntitiesData, rooms_designs_sprites_ids: Dict[str, str]) -> bytes:
+    """
+    Blocking. Returns the PNG encoded layout. All sprites returned by `get_ship_layout_sprite_ids` must have been downloaded.
+    """
+    brightness_value = layout['brightness']
+    hue_value = layout['hue']
+    saturation_value = layout['saturation']
 
     interior_sprite_id = ship_design_info['InteriorSpriteId']
-    interior_sprite = await sprites.load_sprite(interior_sprite_id)
-    interior_sprite = sprites.enhance_sprite(interior_sprite, brightness=brightness_value, hue=hue_value, saturation=saturation_value)
+    interior_sprite = sprites.load_downloaded_sprite(interior_sprite_id)
+    interior_sprite = sprites.enhance_sprite(interior_sprite, brightness=brightness_value, hue=hue_value, saturation=saturation_value, cache_key=interior_sprite_id)
 
-    interior_grid_sprite = await sprites.load_sprite_from_disk(interior_sprite_id, suffix='grids')
+    interior_grid_sprite = sprites.load_sprite_from_disk(interior_sprite_id, suffix='grids')
     if not interior_grid_sprite:
         interior_grid_sprite = make_interior_grid_sprite(ship_design_info, interior_sprite.width, interior_sprite.height)
     interior_sprite.paste(interior_grid_sprite, (0, 0), interior_grid_sprite)
@@ -144,10 +459,7 @@ async def make_ship_layout_sprite(file_name_prefix: str, user_ship_info: entity.
 
     rooms_sprites_cache = {}
     rooms_decorations_sprites_cache = {}
-    for ship_room_info in user_ship_info['Rooms'].values():
-        room_design_id = ship_room_info[room.ROOM_DESIGN_KEY_NAME]
-        room_under_construction = 1 if ship_room_info.get('RoomStatus') == 'Upgrading' or entity.entity_property_has_value(ship_room_info.get('ConstructionStartDate')) else 0
-
+    for room_design_id, room_under_construction, room_column, room_row in layout['rooms']:
         room_sprite = rooms_sprites_cache.get(room_design_id, {}).get(room_under_construction)
 
         if not room_sprite:
@@ -156,19 +468,22 @@ async def make_ship_layout_sprite(file_name_prefix: str, user_ship_info: entity.
 
             if room_size == (1, 1):
                 room_decoration_sprite = None
+                room_decoration_sprite_key = None
             else:
-                room_decoration_sprite = rooms_decorations_sprites_cache.get(room_frame_sprite_id, {}).get(door_frame_left_sprite_id, {}).get(room_size)
+                room_decoration_sprite_key = sprites.get_file_path(room_frame_sprite_id, suffix=room.get_room_decoration_sprite_suffix(door_frame_left_sprite_id, door_frame_right_sprite_id, room_size[0], room_size[1]))
+                room_decoration_sprite = rooms_decorations_sprites_cache.get(room_size)
                 if not room_decoration_sprite:
-                    room_decoration_sprite = await room.get_room_decoration_sprite(room_frame_sprite_id, door_frame_left_sprite_id, door_frame_right_sprite_id, room_size[0], room_size[1])
-                    rooms_decorations_sprites_cache.setdefault(room_frame_sprite_id, {}).setdefault(door_frame_left_sprite_id, {}).setdefault(door_frame_right_sprite_id, {})[room_size] = room_decoration_sprite
+                    room_decoration_sprite = room.get_room_decoration_sprite(room_frame_sprite_id, door_frame_left_sprite_id, door_frame_right_sprite_id, room_size[0], room_size[1])
+                    rooms_decorations_sprites_cache[room_size] = room_decoration_sprite
 
             room_sprite_id = room.get_room_sprite_id(room_design_info, room_under_construction, room_decoration_sprite is not None, rooms_designs_sprites_ids)
-            room_sprite = await room.create_room_sprite(room_sprite_id, room_decoration_sprite, room_design_info, brightness_value, hue_value, saturation_value)
+            room_sprite = room.create_room_sprite(room_sprite_id, room_decoration_sprite, room_design_info, brightness_value, hue_value, saturation_value, room_decoration_sprite_key=room_decoration_sprite_key)
             rooms_sprites_cache.setdefault(room_design_id, {})[room_under_construction] = room_sprite
-        interior_sprite.paste(room_sprite, (int(ship_room_info['Column']) * sprites.TILE_SIZE, int(ship_room_info['Row']) * sprites.TILE_SIZE))
+        interior_sprite.paste(room_sprite, (room_column * sprites.TILE_SIZE, room_row * sprites.TILE_SIZE))
 
-    file_path = sprites.save_sprite(interior_sprite, f'{file_name_prefix}_{user_id}_layout')
-    return file_path
+    with io.BytesIO() as layout_file:
+        interior_sprite.save(layout_file, format='PNG')
+        return layout_file.getvalue()
 
 
 def make_interior_grid_sprite(ship_design_info: entity.EntityInfo, width: int, height: int) -> Image.Image:
@@ -201,6 +516,9 @@ def make_interior_grid_sprite(ship_design_info: entity.EntityInfo, width: int, h
 
 # ---------- Initilization ----------
 
+INSPECT_SHIP_SERVICE: InspectShipService = InspectShipService(__request_inspect_ship_for_user, settings.INSPECT_SHIP_MAX_CONCURRENCY, settings.INSPECT_SHIP_CACHE_TTL, settings.INSPECT_SHIP_CACHE_MAX_ENTRIES)
+LAYOUT_RENDERER: ShipLayoutRenderer = ShipLayoutRenderer(settings.LAYOUT_RENDER_MAX_WORKERS, settings.LAYOUT_RENDER_MAX_QUEUE_DEPTH, settings.LAYOUT_CACHE_MAX_BYTES)
+
 ships_designs_retriever = entity.EntityRetriever(
     SHIP_DESIGN_BASE_PATH,
     SHIP_DESIGN_KEY_NAME,
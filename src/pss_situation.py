@@ -84,11 +84,13 @@ async def get_event_details(ctx: Context, situation_id: str = None, all_events:
         else:
             raise NotFound(f'There\'s no event running currently.')
     else:
-        chars_data = await crew.characters_designs_retriever.get_data_dict3()
-        collections_data = await crew.collections_designs_retriever.get_data_dict3()
-        items_data = await item.items_designs_retriever.get_data_dict3()
-        missions_data = await mission.missions_designs_retriever.get_data_dict3()
-        rooms_data = await room.rooms_designs_retriever.get_data_dict3()
+        chars_data, collections_data, items_data, missions_data, rooms_data = await entity.get_data_dicts3(
+            crew.characters_designs_retriever,
+            crew.collections_designs_retriever,
+            item.items_designs_retriever,
+            mission.missions_designs_retriever,
+            room.rooms_designs_retriever,
+        )
 
         situations_details_collection = __create_situations_details_collection_from_infos(situation_infos, situations_data, chars_data, collections_data, items_data, missions_data, rooms_data, utc_now=utc_now)
         if as_embed:
@@ -1,7 +1,7 @@
-import aiohttp
-import colorsys
+import asyncio
+from collections import OrderedDict
 import os
-from typing import Iterable, Optional
+from typing import Dict, Iterable, Optional, Tuple
 
 from PIL import Image, ImageEnhance, ImageFont
 import numpy as np
@@ -10,14 +10,11 @@ from . import pss_core as core
 from . import pss_entity as entity
 from . import settings
 from .typehints import EntitiesData, EntityInfo
+from . import web
 
 
 # ---------- Constants ----------
 
-FUNC_HSV_TO_RGB = np.vectorize(colorsys.hsv_to_rgb)
-FUNC_RGB_TO_HSV = np.vectorize(colorsys.rgb_to_hsv)
-
-
 PIXELATED_FONT: ImageFont.ImageFont
 
 POWER_BAR_COLOR = (55, 255, 142)
@@ -32,6 +29,8 @@ PWD: str
 SPRITES_BASE_PATH: str = 'FileService/DownloadSprite?spriteId='
 SPRITES_CACHE_PATH: str
 
+__DOWNLOAD_TASKS: Dict[str, asyncio.Task] = {}
+
 
 TILE_SIZE = 25
 
@@ -39,6 +38,89 @@ TILE_SIZE = 25
 
 
 
+# ---------- Classes ----------
+
+class SpriteCache():
+    """
+    In-memory LRU cache for decoded RGBA sprites with a budget in bytes. Loaded sprites are keyed by the path of the file they've been loaded from.
+
+    Callers may modify the sprites they get, so copies are handed out and stored.
+    """
+    def __init__(self, max_bytes: int) -> None:
+        self.__max_bytes: int = max_bytes
+        self.__entries: 'OrderedDict[str, Tuple[Image.Image, int]]' = OrderedDict()
+        self.__size: int = 0
+
+        self.__evictions: int = 0
+        self.__hits: int = 0
+        self.__misses: int = 0
+
+
+    @property
+    def hit_rate(self) -> float:
+        requests = self.__hits + self.__misses
+        if requests:
+            return self.__hits / requests
+        return 0.0
+
+    @property
+    def max_bytes(self) -> int:
+        return self.__max_bytes
+
+    @property
+    def size(self) -> int:
+        """
+        Number of bytes of the decoded sprites held in memory.
+        """
+        return self.__size
+
+    @property
+    def statistics(self) -> Dict[str, int]:
+        return {
+            'entries': len(self.__entries),
+            'size': self.__size,
+            'max_bytes': self.__max_bytes,
+            'hits': self.__hits,
+            'misses': self.__misses,
+            'evictions': self.__evictions,
+        }
+
+
+    def get(self, key: str) -> Optional[Image.Image]:
+        entry = self.__entries.get(key)
+        if entry is None:
+            self.__misses += 1
+            return None
+        self.__hits += 1
+        self.__entries.move_to_end(key)
+        return entry[0].copy()
+
+
+    def invalidate(self, key: str) -> None:
+        entry = self.__entries.pop(key, None)
+        if entry:
+            self.__size -= entry[1]
+
+
+    def put(self, key: str, sprite: Image.Image) -> None:
+        """
+        Adds a copy of the sprite and evicts the least recently used entries until the cache fits its budget. Sprites larger than the budget won't be added.
+        """
+        size = len(sprite.getbands()) * sprite.width * sprite.height
+        self.invalidate(key)
+        if size > self.__max_bytes:
+            return
+        self.__entries[key] = (sprite.copy(), size)
+        self.__size += size
+        while self.__size > self.__max_bytes:
+            _, (_, evicted_size) = self.__entries.popitem(last=False)
+            self.__size -= evicted_size
+            self.__evictions += 1
+
+
+
+
+
 # ---------- Sprites ----------
 
 
@@ -46,10 +128,25 @@ def colorize(image: Image.Image, hue: float) -> Image.Image:
     """
     Colorize PIL image `original` with the given
     `hue` (hue within 0-360); returns another PIL image.
+
+    Sprites consist of few distinct colours, so the hue gets only shifted once per colour.
     """
     img = image.convert('RGBA')
-    arr = np.array(np.asarray(img).astype('float'))
-    new_img = Image.fromarray(shift_hue(arr, hue).astype('uint8'), 'RGBA')
+    arr = np.asarray(img)
+    rgb = arr[..., :3].reshape(-1, 3).astype(np.uint32)
+    packed_colors = (rgb[:, 0] << 16) | (rgb[:, 1] << 8) | rgb[:, 2]
+    unique_colors, inverse = np.unique(packed_colors, return_inverse=True)
+    colors = np.empty((1, len(unique_colors), 4), dtype=float)
+    colors[..., 0] = unique_colors >> 16
+    colors[..., 1] = (unique_colors >> 8) & 0xFF
+    colors[..., 2] = unique_colors & 0xFF
+    colors[..., 3] = 0
+    shifted_colors = shift_hue(colors, hue)[0, :, :3].astype('uint8')
+
+    new_arr = np.empty_like(arr)
+    new_arr[..., :3] = shifted_colors[inverse].reshape(arr.shape[:2] + (3,))
+    new_arr[..., 3] = arr[..., 3]
+    new_img = Image.fromarray(new_arr, 'RGBA')
 
     return new_img
 
@@ -64,19 +161,30 @@ def create_empty_sprite(width: int, height: int) -> Image.Image:
 
 async def download_sprite(sprite_id: str) -> str:
     """
-    Returns a file path and whether the file already existed before.
+    Returns the path of the file the sprite has been downloaded to. Concurrent requests for the same sprite share one download.
     """
     target_path = os.path.join(SPRITES_CACHE_PATH, f'{sprite_id}.png')
     if not os.path.isfile(target_path):
-        download_url = await get_download_sprite_link(sprite_id)
-        async with aiohttp.ClientSession() as session:
-            async with session.get(download_url) as response:
-                with open(target_path, 'wb') as f:
-                    f.write(await response.read())
+        download_task = __DOWNLOAD_TASKS.get(target_path)
+        if download_task is None:
+            download_task = asyncio.create_task(__download_sprite_to(sprite_id, target_path))
+            __DOWNLOAD_TASKS[target_path] = download_task
+            download_task.add_done_callback(lambda _: __DOWNLOAD_TASKS.pop(target_path, None))
+        await asyncio.shield(download_task)
     return target_path
 
 
-def enhance_sprite(sprite: Image.Image, brightness: float = None, hue: float = None, saturation: float = None) -> Image.Image:
+def enhance_sprite(sprite: Image.Image, brightness: float = None, hue: float = None, saturation: float = None, cache_key: str = None) -> Image.Image:
+    """
+    If a cache_key is provided, the enhanced sprite will be cached per cache_key, brightness, hue and saturation.
+    """
+    tinted_sprite_key = None
+    if cache_key and (brightness or hue or saturation):
+        tinted_sprite_key = f'{cache_key}:{brightness}:{hue}:{saturation}'
+        result = TINTED_SPRITE_CACHE.get(tinted_sprite_key)
+        if result is not None:
+            return result
+
     if brightness:
         enhancer = ImageEnhance.Brightness(sprite)
         sprite = enhancer.enhance(brightness + 1)
@@ -85,6 +193,8 @@ def enhance_sprite(sprite: Image.Image, brightness: float = None, hue: float = N
     if saturation:
         enhancer = ImageEnhance.Color(sprite)
         sprite = enhancer.enhance(saturation + 1)
+    if tinted_sprite_key:
+        TINTED_SPRITE_CACHE.put(tinted_sprite_key, sprite)
     return sprite
 
 
@@ -126,41 +236,140 @@ def get_sprite_download_url(sprite_id: int) -> str:
 
 
 async def load_sprite(sprite_id: str) -> Image.Image:
-    sprite_path = await download_sprite(sprite_id)
-    result = Image.open(sprite_path).convert('RGBA')
+    file_path = os.path.join(SPRITES_CACHE_PATH, f'{sprite_id}.png')
+    result = SPRITE_CACHE.get(file_path)
+    if result is None:
+        sprite_path = await download_sprite(sprite_id)
+        result = __load_sprite_from_file(sprite_path)
     return result
 
 
-async def load_sprite_from_disk(sprite_id: str, prefix: str = None, suffix: str = None) -> Optional[Image.Image]:
+def load_downloaded_sprite(sprite_id: str) -> Image.Image:
+    """
+    Same as `load_sprite`, but the sprite must have been downloaded before. Raises an IOError otherwise.
+    """
+    file_path = os.path.join(SPRITES_CACHE_PATH, f'{sprite_id}.png')
+    result = SPRITE_CACHE.get(file_path)
+    if result is None:
+        result = __load_sprite_from_file(file_path)
+    return result
+
+
+def load_sprite_from_disk(sprite_id: str, prefix: str = None, suffix: str = None) -> Optional[Image.Image]:
     file_path = get_file_path(sprite_id, prefix=prefix, suffix=suffix)
-    try:
-        return Image.open(file_path).convert('RGBA')
-    except IOError:
-        return None
+    result = SPRITE_CACHE.get(file_path)
+    if result is None:
+        try:
+            result = __load_sprite_from_file(file_path)
+        except IOError:
+            return None
+    return result
 
 
 def save_sprite(image: Image.Image, file_name_without_extension: str) -> str:
     target_file_path = os.path.join(SPRITES_CACHE_PATH, f'{file_name_without_extension}.png')
-    image.save(target_file_path)
+    # Sprites may be rendered in multiple processes, so no incomplete file must be read
+    temp_file_path = f'{target_file_path}.{os.getpid()}.tmp'
+    image.save(temp_file_path, format='PNG')
+    os.replace(temp_file_path, target_file_path)
+    SPRITE_CACHE.invalidate(target_file_path)
+    return target_file_path
+
+
+def save_sprite_data(data: bytes, file_name_without_extension: str) -> str:
+    """
+    Writes PNG encoded data to the sprite cache folder.
+    """
+    target_file_path = os.path.join(SPRITES_CACHE_PATH, f'{file_name_without_extension}.png')
+    # Sprites may be rendered in multiple processes, so no incomplete file must be read
+    temp_file_path = f'{target_file_path}.{os.getpid()}.tmp'
+    with open(temp_file_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_file_path, target_file_path)
+    SPRITE_CACHE.invalidate(target_file_path)
     return target_file_path
 
 
 def shift_hue(arr: Iterable, hue_out: float) -> Iterable:
     r, g, b, a = np.rollaxis(arr, axis=-1)
-    h, s, v = FUNC_RGB_TO_HSV(r, g, b)
+    h, s, v = __rgb_to_hsv(r, g, b)
     h = (h + hue_out) % 1
-    r, g, b = FUNC_HSV_TO_RGB(h, s, v)
+    r, g, b = __hsv_to_rgb(h, s, v)
     arr = np.dstack((r, g, b, a))
     return arr
 
 
+async def __download_sprite_to(sprite_id: str, target_path: str) -> None:
+    download_url = await get_download_sprite_link(sprite_id)
+    data = await web.get_bytes(download_url)
+    # Write to a temporary file first, so that no incomplete file can be read
+    temp_file_path = f'{target_path}.tmp'
+    with open(temp_file_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_file_path, target_path)
+
+
+def __hsv_to_rgb(h: np.ndarray, s: np.ndarray, v: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Same as `colorsys.hsv_to_rgb`, but for arrays.
+    """
+    h6 = h * 6.0
+    i = h6.astype(int)
+    f = h6 - i
+    p = v * (1.0 - s)
+    q = v * (1.0 - s * f)
+    t = v * (1.0 - s * (1.0 - f))
+    i = i % 6
+    is_grey = s == 0.0
+    r = np.where(is_grey, v, np.choose(i, [v, q, p, p, t, v]))
+    g = np.where(is_grey, v, np.choose(i, [t, v, v, q, p, p]))
+    b = np.where(is_grey, v, np.choose(i, [p, p, t, v, v, q]))
+    return r, g, b
+
+
+def __rgb_to_hsv(r: np.ndarray, g: np.ndarray, b: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Same as `colorsys.rgb_to_hsv`, but for arrays.
+    """
+    maxc = np.maximum(np.maximum(r, g), b)
+    minc = np.minimum(np.minimum(r, g), b)
+    rangec = maxc - minc
+    v = maxc
+    is_grey = minc == maxc
+    rangec_divisor = np.where(is_grey, 1.0, rangec)
+    s = np.where(is_grey, 0.0, rangec / np.where(is_grey, 1.0, maxc))
+    rc = (maxc - r) / rangec_divisor
+    gc = (maxc - g) / rangec_divisor
+    bc = (maxc - b) / rangec_divisor
+    h = np.where(r == maxc, bc - gc, np.where(g == maxc, 2.0 + rc - bc, 4.0 + gc - rc))
+    h = np.where(is_grey, 0.0, (h / 6.0) % 1.0)
+    return h, s, v
+
+
+def __load_sprite_from_file(file_path: str) -> Image.Image:
+    result = Image.open(file_path).convert('RGBA')
+    SPRITE_CACHE.put(file_path, result)
+    return result
+
+
 
 
 
 
 # ---------- Initialization ----------
 
+SPRITE_CACHE: SpriteCache = SpriteCache(settings.SPRITE_CACHE_MAX_BYTES)
+TINTED_SPRITE_CACHE: SpriteCache = SpriteCache(settings.TINTED_SPRITE_CACHE_MAX_BYTES)
+
+
 async def init():
+    init_sync()
+
+
+def init_sync() -> None:
+    """
+    Blocking. Also to be used as initializer for worker processes rendering sprites.
+    """
     global PWD
     PWD = os.getcwd()
     sprites_cache_path = os.path.join(PWD, settings.SPRITE_CACHE_SUB_PATH)
@@ -1,13 +1,15 @@
 import calendar
 from datetime import datetime
-from typing import List, Optional, Tuple, Union
+from typing import Dict, List, Optional, Tuple, Union
+import weakref
 
 from discord import Colour, Embed, OptionChoice
 from discord.ext.commands import Context
 from discord.utils import escape_markdown
+import numpy as np
 
 from . import emojis
-from .gdrive import TourneyData
+from .gdrive import TourneyData, TourneyUsersTable, TourneyUsersView
 from . import pss_assert
 from . import pss_core as core
 from . import pss_entity as entity
@@ -43,6 +45,8 @@ STARS_BASE_PATH: str = 'AllianceService/ListAlliancesWithDivision'
 
 TOP_FLEETS_BASE_PATH: str = 'AllianceService/ListAlliancesByRanking?skip=0&take='
 
+__TARGETS_ARRAYS_CACHE: 'weakref.WeakKeyDictionary[TourneyUsersTable, Dict[str, object]]' = weakref.WeakKeyDictionary()
+
 
 
 
@@ -331,6 +335,53 @@ def filter_targets(user_infos: List[EntityInfo], division_design_id: str, last_m
     return result
 
 
+def filter_targets_from_tourney_data(tourney_data: TourneyData, division_design_id: str, last_month_user_data: EntitiesData, current_fleet_data: EntitiesData = {}, min_star_value: int = None, max_star_value: int = None, min_trophies_value: int = None, max_trophies_value: int = None, max_highest_trophies: int = None) -> List[EntityInfo]:
+    """
+    Returns the same results as `filter_targets` for the users of tourney_data. If the user data is stored in columns, the filters get applied to whole columns at once.
+    """
+    users_table = tourney_data.users_table
+    if users_table is None:
+        return filter_targets(tourney_data.users.values(), division_design_id, last_month_user_data, current_fleet_data, min_star_value, max_star_value, min_trophies_value, max_trophies_value, max_highest_trophies)
+
+    arrays = __get_targets_arrays(users_table)
+    fleet_division_matches = []
+    for fleet_id, snapshot_division_design_id in zip(arrays['fleet_ids'], arrays['fleet_division_design_ids']):
+        current_division_design_id = current_fleet_data.get(fleet_id, {}).get(DIVISION_DESIGN_KEY_NAME)
+        fleet_division_matches.append(division_design_id == (current_division_design_id or snapshot_division_design_id))
+
+    trophies = arrays['trophies']
+    highest_trophies = arrays['highest_trophies']
+    star_values = arrays['star_values']
+    mask = np.array(fleet_division_matches, dtype=bool)[arrays['fleet_positions']]
+    if min_trophies_value:
+        mask &= trophies >= min_trophies_value
+    if max_trophies_value:
+        mask &= trophies <= max_trophies_value
+    if max_highest_trophies:
+        mask &= highest_trophies <= max_highest_trophies
+    if min_star_value:
+        mask &= star_values >= min_star_value
+    if max_star_value:
+        mask &= star_values <= max_star_value
+
+    positions = np.flatnonzero(mask)
+    # np.lexsort is stable and sorts by the last key first, so this equals sorting by (star value, stars, trophies) in reverse, like `filter_targets` does.
+    order = np.lexsort((-trophies[positions], -arrays['alliance_scores'][positions], -star_values[positions]))
+    last_month_users_table = last_month_user_data.users_table if isinstance(last_month_user_data, TourneyUsersView) else None
+    user_ids = arrays['user_ids']
+    result = []
+    for position in positions[order].tolist():
+        user_id = user_ids[position]
+        user_info = users_table.get_user_info(user_id)
+        user_info['StarValue'] = star_values.item(position) or 0
+        if last_month_users_table is not None:
+            user_info['LastMonthStarValue'] = last_month_users_table.get_user_value(user_id, 'AllianceScore') or '-'
+        else:
+            user_info['LastMonthStarValue'] = last_month_user_data.get(user_id, {}).get('AllianceScore') or '-'
+        result.append(user_info)
+    return result
+
+
 async def get_alliances_with_division() -> EntitiesData:
     data = await core.get_data_from_path(STARS_BASE_PATH)
     fleet_infos = utils.convert.xmltree_to_dict3(data)
@@ -398,6 +449,18 @@ def get_targets_parameters(star_value: str = None, trophies: str = None, max_hig
     return criteria_lines, min_star_value, max_star_value, min_trophies_value, max_trophies_value, max_highest_trophies
 
 
+def get_top_targets_per_fleet(user_infos: List[EntityInfo], count: int) -> Dict[str, List[EntityInfo]]:
+    """
+    Groups the targets returned by `filter_targets` by fleet id and keeps the first count targets of each fleet.
+    """
+    result = {}
+    for user_info in user_infos:
+        fleet_users_infos = result.setdefault(user_info[fleet.FLEET_KEY_NAME], [])
+        if len(fleet_users_infos) < count:
+            fleet_users_infos.append(user_info)
+    return result
+
+
 def is_valid_division_letter(div_letter: str) -> bool:
     if div_letter is None:
         result = True
@@ -442,6 +505,43 @@ def __get_fleet_division_designs(divisions_designs_data: EntitiesData) -> Entiti
     return result
 
 
+def __get_targets_arrays(users_table: TourneyUsersTable) -> Dict[str, object]:
+    """
+    Returns the per-snapshot arrays needed to search for targets in the order of the users. They're calculated once per snapshot.
+    """
+    result = __TARGETS_ARRAYS_CACHE.get(users_table)
+    if result is not None:
+        return result
+
+    rows = users_table.get_rows()
+    trophies = users_table.get_column('Trophy')[rows]
+    alliance_scores = users_table.get_column('AllianceScore')[rows]
+    highest_trophies_column = users_table.get_column('HighestTrophy')
+    highest_trophies = highest_trophies_column[rows] if highest_trophies_column is not None else np.zeros(len(rows), dtype=np.int64)
+    # Same calculation as in `user.get_star_value_from_user_info`
+    star_values = np.maximum(np.floor(trophies / 1000), np.floor(alliance_scores * 0.15)).astype(np.int64)
+
+    unique_fleet_ids, fleet_positions = np.unique(users_table.get_column('AllianceId')[rows], return_inverse=True)
+    fleet_ids = [str(fleet_id) for fleet_id in unique_fleet_ids.tolist()]
+    fleet_division_design_ids = []
+    for fleet_id in fleet_ids:
+        snapshot_fleet_info = users_table.get_fleet_info(fleet_id) if fleet_id != '0' else {}
+        fleet_division_design_ids.append(snapshot_fleet_info.get(DIVISION_DESIGN_KEY_NAME, '0'))
+
+    result = {
+        'alliance_scores': alliance_scores,
+        'fleet_division_design_ids': fleet_division_design_ids,
+        'fleet_ids': fleet_ids,
+        'fleet_positions': fleet_positions.reshape(-1),
+        'highest_trophies': highest_trophies,
+        'star_values': star_values,
+        'trophies': trophies,
+        'user_ids': users_table.user_ids,
+    }
+    __TARGETS_ARRAYS_CACHE[users_table] = result
+    return result
+
+
 
 
 
@@ -43,14 +43,12 @@ async def get_training_details_from_id(training_id: str, trainings_data: Entitie
 async def get_training_details_from_name(training_name: str, ctx: Context, as_embed: bool = settings.USE_EMBEDS) -> Union[List[Embed], List[str]]:
     pss_assert.valid_entity_name(training_name)
 
-    trainings_data = await trainings_designs_retriever.get_data_dict3()
+    trainings_data, items_data, researches_data = await entity.get_data_dicts3(trainings_designs_retriever, item.items_designs_retriever, research.researches_designs_retriever)
     training_infos = await trainings_designs_retriever.get_entities_infos_by_name(training_name, trainings_data)
 
     if not training_infos:
         raise NotFound(f'Could not find a training named **{training_name}**.')
     else:
-        items_data = await item.items_designs_retriever.get_data_dict3()
-        researches_data = await research.researches_designs_retriever.get_data_dict3()
         trainings_details_collection = __create_trainings_details_collection_from_infos(training_infos, trainings_data, items_data, researches_data)
         custom_footer = 'The stats displayed are chances. The actual result may be much lower depending on: max training points, training points used, the training points gained on a particular stat and fatigue.'
 
@@ -173,7 +171,8 @@ def __get_training_room(training_info: EntityInfo, trainings_data: EntitiesData,
 # ---------- Create entity.EntityDetails ----------
 
 def __create_training_details_from_info(training_info: EntityInfo, trainings_data: EntitiesData, items_data: EntitiesData, researches_data: EntitiesData) -> entity.EntityDetails:
-    return entity.EntityDetails(training_info, __properties['title'], __properties['description'], __properties['properties'], __properties['embed_settings'], trainings_data, items_data, researches_data)
+    render_cache_key = entity.get_render_cache_key('training', trainings_designs_retriever, item.items_designs_retriever, research.researches_designs_retriever)
+    return entity.EntityDetails(training_info, __properties['title'], __properties['description'], __properties['properties'], __properties['embed_settings'], trainings_data, items_data, researches_data, render_cache_key=render_cache_key)
 
 
 def __create_training_details_list_from_infos(trainings_designs_infos: List[EntityInfo], trainings_data: EntitiesData, items_data: EntitiesData, researches_data: EntitiesData) -> List[EntitiesData]:
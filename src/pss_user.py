@@ -26,7 +26,7 @@ from . import pss_tournament as tourney
 from . import pss_user as user
 from . import settings
 from . import utils
-from .gdrive import TourneyData
+from .gdrive import TourneyData, TourneyUserHistory
 from .pagination import SelectView
 from .pss_exception import NotFound
 from .typehints import EntitiesData, EntityInfo
@@ -93,32 +93,93 @@ async def get_users_infos_by_name_or_id(user_name_or_id: str) -> List[EntityInfo
     return user_infos
 
 
-async def get_user_infos_from_tournament_data_by_name_or_id(user_name_or_id: str, users_data: EntitiesData) -> List[EntityInfo]:
-    user_name_lower = user_name_or_id.lower()
-    result = {user_id: user_info for (user_id, user_info) in users_data.items() if user_name_lower in user_info.get(user.USER_DESCRIPTION_PROPERTY_NAME, '').lower()}
+async def get_user_infos_from_tournament_data_by_name_or_id(user_name_or_id: str, tourney_data: TourneyData) -> List[EntityInfo]:
+    """
+    Users, who've changed their name since, get their current name added. At most `settings.INSPECT_SHIP_REQUEST_BUDGET` users get inspected to find out. Users beyond that are returned without their current name.
+    """
+    result = tourney_data.get_user_data_by_name(user_name_or_id)
     user_infos_current = await __get_users_data(user_name_or_id)
     if user_infos_current:
+        check_current_name_user_ids = []
         for user_info in user_infos_current.values():
             user_id = user_info[user.USER_KEY_NAME]
-            if user_id in users_data:
-                current_user_info = await __get_user_info_by_id(user_id) or {}
-                current_user_name = current_user_info.get(user.USER_DESCRIPTION_PROPERTY_NAME)
+            tourney_user_info = result.get(user_id) or tourney_data.get_user_data_by_id(user_id)
+            if tourney_user_info:
                 if user_id not in result:
-                    result[user_id] = users_data[user_id]
-                if current_user_name and current_user_name != result[user_id][user.USER_DESCRIPTION_PROPERTY_NAME]:
-                    result[user_id][USER_CURRENT_NAME_PROPERTY_NAME] = current_user_name
+                    result[user_id] = tourney_user_info
+                check_current_name_user_ids.append(user_id)
     else:
-        for tournament_user_id, tournament_user_info in result.items():
-            user_info = await __get_user_info_by_id(tournament_user_id)
-            if result[tournament_user_id][user.USER_DESCRIPTION_PROPERTY_NAME] != user_info[user.USER_DESCRIPTION_PROPERTY_NAME]:
-                result[tournament_user_id][USER_CURRENT_NAME_PROPERTY_NAME] = user_info[user.USER_DESCRIPTION_PROPERTY_NAME]
+        check_current_name_user_ids = list(result.keys())
+
+    inspected_users = await ship.INSPECT_SHIP_SERVICE.get_many(check_current_name_user_ids, settings.INSPECT_SHIP_REQUEST_BUDGET)
+    for user_id in check_current_name_user_ids:
+        current_user_info, _ = inspected_users.get(str(user_id), (None, None))
+        current_user_name = (current_user_info or {}).get(user.USER_DESCRIPTION_PROPERTY_NAME)
+        if current_user_name and current_user_name != result[user_id][user.USER_DESCRIPTION_PROPERTY_NAME]:
+            result[user_id][USER_CURRENT_NAME_PROPERTY_NAME] = current_user_name
     return list(result.values())
 
 
+async def get_user_history_infos_by_name_or_id(user_name_or_id: str, user_history: TourneyUserHistory) -> List[EntityInfo]:
+    """
+    Returns the most recently recorded user dict of every user having had user_name_or_id in their name in any recorded tournament month, currently having it in their name or having it as their id.
+    """
+    user_ids = user_history.get_user_ids_by_name(user_name_or_id)
+    if user_name_or_id not in user_ids and user_history.contains_user(user_name_or_id):
+        user_ids.insert(0, user_name_or_id)
+    user_infos_current = await __get_users_data(user_name_or_id)
+    for user_info in user_infos_current.values():
+        user_id = user_info[user.USER_KEY_NAME]
+        if user_id not in user_ids and user_history.contains_user(user_id):
+            user_ids.append(user_id)
+
+    result = []
+    for user_id in user_ids:
+        user_history_infos = user_history.get_user_history(user_id)
+        if user_history_infos:
+            result.append(user_history_infos[-1])
+    return result
+
+
+def get_user_history_as_text(user_history_infos: List[EntityInfo]) -> List[str]:
+    """
+    Parameter 'user_history_infos':
+    - The user dicts returned by `TourneyUserHistory.get_user_history`.
+    """
+    latest_user_info = user_history_infos[-1]
+    result = [f'**Tournament history of {escape_markdown(latest_user_info[USER_DESCRIPTION_PROPERTY_NAME])}** (ID: {latest_user_info[USER_KEY_NAME]})']
+
+    name_periods = []
+    for user_info in user_history_infos:
+        user_name = user_info[USER_DESCRIPTION_PROPERTY_NAME]
+        if name_periods and name_periods[-1][0] == user_name:
+            name_periods[-1][2] = user_info
+        else:
+            name_periods.append([user_name, user_info, user_info])
+    names = []
+    for user_name, first_user_info, last_user_info in name_periods:
+        period = __format_history_month(first_user_info)
+        if last_user_info is not first_user_info:
+            period += f' {settings.DEFAULT_HYPHEN} {__format_history_month(last_user_info)}'
+        names.append(f'{escape_markdown(user_name)} ({period})')
+    result.append(f'Names: {", ".join(names)}')
+    result.append(utils.discord.ZERO_WIDTH_SPACE)
+
+    result.append(f'Appeared in {len(user_history_infos)} tournament month(s):')
+    for user_info in user_history_infos:
+        details = [f'{__format_history_month(user_info)}:', escape_markdown(user_info[USER_DESCRIPTION_PROPERTY_NAME])]
+        fleet_name = user_info.get(fleet.FLEET_DESCRIPTION_PROPERTY_NAME)
+        if fleet_name:
+            details.append(f'({escape_markdown(fleet_name)})')
+        trophies = user_info.get('Trophy')
+        if trophies:
+            details.append(f'{emojis.trophy} {trophies}')
+        result.append(' '.join(details))
+    return result
+
+
 async def get_user_ship_layout(ctx: Context, user_id: str, as_embed: bool = settings.USE_EMBEDS) -> Tuple[Union[List[Embed], List[str]], File]:
-    ships_designs_data = await ship.ships_designs_retriever.get_data_dict3()
-    rooms_designs_data = await room.rooms_designs_retriever.get_data_dict3()
-    rooms_designs_sprites_data = await room.rooms_designs_sprites_retriever.get_data_dict3()
+    ships_designs_data, rooms_designs_data, rooms_designs_sprites_data = await entity.get_data_dicts3(ship.ships_designs_retriever, room.rooms_designs_retriever, room.rooms_designs_sprites_retriever)
     user_info, user_ship_info = await ship.get_inspect_ship_for_user(user_id)
     ship_design_info: entity.EntityInfo = ships_designs_data[user_ship_info.get('ShipDesignId')]
     rooms_designs_sprites_ids = {value.get('RoomDesignId'): value.get('SpriteId') for value in rooms_designs_sprites_data.values() if value.get('RaceId') == ship_design_info.get('RaceId')}
@@ -371,7 +432,7 @@ def __get_user_name(user_info: EntityInfo, **kwargs) -> Optional[str]:
 
 async def find_tournament_user(ctx: ApplicationContext, player_name: str, tourney_data: TourneyData) -> Tuple[EntityInfo, Interaction]:
     response = await utils.discord.edit_original_response(ctx, ctx.interaction, ['Searching player...'])
-    user_infos = await get_user_infos_from_tournament_data_by_name_or_id(player_name, tourney_data.users)
+    user_infos = await get_user_infos_from_tournament_data_by_name_or_id(player_name, tourney_data)
 
     if user_infos:
         if len(user_infos) == 1:
@@ -406,6 +467,26 @@ async def find_user(ctx: ApplicationContext, player_name_or_id: str) -> Tuple[En
         raise NotFound(f'Could not find a player named `{player_name_or_id}`.')
 
 
+async def find_history_user(ctx: ApplicationContext, player_name_or_id: str, user_history: TourneyUserHistory) -> Tuple[EntityInfo, Interaction]:
+    response = await utils.discord.respond_with_output(ctx, ['Searching player...'])
+    user_infos = await get_user_history_infos_by_name_or_id(player_name_or_id, user_history)
+    if user_infos:
+        user_info = None
+        if len(user_infos) == 1:
+            user_info = user_infos[0]
+        else:
+            user_infos.sort(key=lambda user: user[USER_DESCRIPTION_PROPERTY_NAME])
+            user_infos = user_infos[:25]
+
+            options = {user_info[USER_KEY_NAME]: (get_user_search_details(user_info), user_info) for user_info in user_infos}
+            view = SelectView(ctx, 'Please select a player.', options)
+            user_info = await view.wait_for_selection(response)
+
+        return user_info, response
+    else:
+        raise NotFound(f'Could not find a player named `{player_name_or_id}` in the tournament data retrieved so far.')
+
+
 def get_star_value_from_user_info(user_info: EntityInfo, star_count: Union[int, str] = None) -> Tuple[Optional[int], Optional[int]]:
     """
     Returns: (star_value: `int`, source: `int`)
@@ -444,6 +525,10 @@ def __format_past_timestamp(timestamp: datetime, retrieved_at: datetime) -> str:
     return result
 
 
+def __format_history_month(user_info: EntityInfo) -> str:
+    return f'{calendar.month_abbr[user_info["Month"]]} {user_info["Year"]}'
+
+
 def __format_pvp_stats(wins: int, losses: int, draws: int) -> str:
     win_rate = __calculate_win_rate(wins, losses, draws)
     result = f'{wins}/{losses}/{draws} ({win_rate:0.2f}%)'
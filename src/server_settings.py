@@ -348,6 +348,34 @@ class AutoMessageSettings():
 
 
     async def update(self, channel: TextChannel = None, can_post: bool = None, latest_message: Message = None, change_mode: AutoMessageChangeMode = None, store_now_as_created_at: bool = False) -> bool:
+        settings = self.get_update_settings(channel=channel, can_post=can_post, latest_message=latest_message, change_mode=change_mode, store_now_as_created_at=store_now_as_created_at)
+        success = await db_update_server_settings(self.guild_id, settings)
+        if success:
+            self.apply_update_settings(settings, channel=channel)
+        return success
+
+
+    def apply_update_settings(self, settings: Dict[str, object], channel: TextChannel = None) -> None:
+        """
+        Applies settings created by `get_update_settings` after they've been written to the database.
+        """
+        if _COLUMN_NAMES_AUTO_MESSAGE[AutoMessageColumn.CHANNEL_ID][self.__auto_message_type] in settings:
+            self.__channel = channel
+            self.__channel_id = channel.id
+        if _COLUMN_NAMES_AUTO_MESSAGE[AutoMessageColumn.CAN_POST][self.__auto_message_type] in settings:
+            self.__can_post = settings.get(_COLUMN_NAMES_AUTO_MESSAGE[AutoMessageColumn.CAN_POST][self.__auto_message_type])
+        if _COLUMN_NAMES_AUTO_MESSAGE[AutoMessageColumn.LATEST_MESSAGE_CREATED_AT][self.__auto_message_type] in settings:
+            self.__latest_message_id = settings.get(_COLUMN_NAMES_AUTO_MESSAGE[AutoMessageColumn.LATEST_MESSAGE_ID][self.__auto_message_type])
+            self.__latest_message_created_at = settings.get(_COLUMN_NAMES_AUTO_MESSAGE[AutoMessageColumn.LATEST_MESSAGE_CREATED_AT][self.__auto_message_type])
+            self.__latest_message_modified_at = settings.get(_COLUMN_NAMES_AUTO_MESSAGE[AutoMessageColumn.LATEST_MESSAGE_MODIFIED_AT][self.__auto_message_type])
+        if _COLUMN_NAMES_AUTO_MESSAGE[AutoMessageColumn.CHANGE_MODE][self.__auto_message_type] in settings:
+            self.__delete_on_change = settings[_COLUMN_NAMES_AUTO_MESSAGE[AutoMessageColumn.CHANGE_MODE][self.__auto_message_type]]
+
+
+    def get_update_settings(self, channel: TextChannel = None, can_post: bool = None, latest_message: Message = None, change_mode: AutoMessageChangeMode = None, store_now_as_created_at: bool = False) -> Dict[str, object]:
+        """
+        Returns the changed columns and their new values.
+        """
         settings: Dict[str, object] = {}
         update_channel = channel is not None and channel != self.channel
         update_can_post = can_post is not None and can_post != self.can_post
@@ -366,20 +394,7 @@ class AutoMessageSettings():
                 settings[_COLUMN_NAMES_AUTO_MESSAGE[AutoMessageColumn.LATEST_MESSAGE_MODIFIED_AT][self.__auto_message_type]] = latest_message.edited_at or latest_message.created_at
         if update_change_mode:
             settings[_COLUMN_NAMES_AUTO_MESSAGE[AutoMessageColumn.CHANGE_MODE][self.__auto_message_type]] = change_mode
-        success = await db_update_server_settings(self.guild_id, settings)
-        if success:
-            if update_channel:
-                self.__channel = channel
-                self.__channel_id = channel.id
-            if update_can_post:
-                self.__can_post = settings.get(_COLUMN_NAMES_AUTO_MESSAGE[AutoMessageColumn.CAN_POST][self.__auto_message_type])
-            if update_latest_message:
-                self.__latest_message_id = settings.get(_COLUMN_NAMES_AUTO_MESSAGE[AutoMessageColumn.LATEST_MESSAGE_ID][self.__auto_message_type])
-                self.__latest_message_created_at = settings.get(_COLUMN_NAMES_AUTO_MESSAGE[AutoMessageColumn.LATEST_MESSAGE_CREATED_AT][self.__auto_message_type])
-                self.__latest_message_modified_at = settings.get(_COLUMN_NAMES_AUTO_MESSAGE[AutoMessageColumn.LATEST_MESSAGE_MODIFIED_AT][self.__auto_message_type])
-            if update_change_mode:
-                self.__delete_on_change = settings[_COLUMN_NAMES_AUTO_MESSAGE[AutoMessageColumn.CHANGE_MODE][self.__auto_message_type]]
-        return success
+        return settings
 
 
 
@@ -869,6 +884,20 @@ async def reset_prefix(guild_id: int) -> bool:
     return success
 
 
+async def update_many_auto_message_settings(updates: List[Tuple[AutoMessageSettings, Dict[str, object]]]) -> bool:
+    """
+    Parameter 'updates':
+    - Tuples of (auto message settings, settings created by its `get_update_settings`).
+
+    Writes all changes to the database at once and applies them, if that succeeded.
+    """
+    success = await db_update_many_server_settings([(auto_message_settings.guild_id, settings) for auto_message_settings, settings in updates])
+    if success:
+        for auto_message_settings, settings in updates:
+            auto_message_settings.apply_update_settings(settings)
+    return success
+
+
 async def __fix_prefixes() -> bool:
     all_prefixes = await db_get_server_settings(guild_id=None, setting_names=[_COLUMN_NAME_GUILD_ID, _COLUMN_NAME_PREFIX])
     all_success = True
@@ -1080,6 +1109,24 @@ async def db_update_server_settings(guild_id: int, settings: Dict[str, Any]) ->
         return True
 
 
+async def db_update_many_server_settings(guilds_settings: List[Tuple[int, Dict[str, Any]]]) -> bool:
+    """
+    Writes the settings of many guilds in a single transaction. Guilds changing the same columns are updated with a single statement.
+    """
+    queries_args: Dict[Tuple[str, ...], List[list]] = {}
+    for guild_id, settings in guilds_settings:
+        if settings:
+            queries_args.setdefault(tuple(settings.keys()), []).append([guild_id, *settings.values()])
+
+    batches = []
+    for keys, args_list in queries_args.items():
+        set_string = ', '.join(f'{key} = ${i:d}' for i, key in enumerate(keys, start=2))
+        query = f'UPDATE serversettings SET {set_string} WHERE {_COLUMN_NAME_GUILD_ID} = $1'
+        batches.append((query, args_list))
+    success = await db.try_execute_batches(batches)
+    return success
+
+
 async def _db_create_server_settings(guild_id: int) -> bool:
     if await _db_get_has_settings(guild_id):
         return True
@@ -9,6 +9,8 @@ from typing import Tuple
 
 ACCESS_TOKEN: str = os.environ.get('PSS_ACCESS_TOKEN')
 
+AUTOMESSAGE_MAX_CONCURRENCY: int = int(os.environ.get('AUTOMESSAGE_MAX_CONCURRENCY', 10))
+
 
 BASE_API_URL: str = 'https://api.pixelstarships.com/'
 BASE_INVITE_URL: str = 'https://discordapp.com/oauth2/authorize?scope=applications.commands%20bot&permissions=388160&client_id='
@@ -16,6 +18,7 @@ BASE_INVITE_URL: str = 'https://discordapp.com/oauth2/authorize?scope=applicatio
 
 DATABASE_SSL_MODE: str = os.environ.get('DATABASE_SSL_MODE', 'require')
 DATABASE_URL: str = f'{os.environ.get("DATABASE_URL")}?sslmode={DATABASE_SSL_MODE}'
+DATA_DEPENDENCIES_TIMEOUT: float = float(os.environ.get('DATA_DEPENDENCIES_TIMEOUT', 30.0))
 
 DEBUG_GUILDS: List[int] = json.loads(str(os.environ.get('DEBUG_GUILDS', '[]')))
 DEFAULT_HYPHEN: str = '–'
@@ -26,9 +29,12 @@ DEFAULT_USE_EMOJI_PAGINATOR: bool = True
 DEVICE_LOGIN_CHECKSUM_KEY: str = os.environ.get('PSS_DEVICE_LOGIN_CHECKSUM_KEY')
 
 
+ENTITY_DETAILS_CACHE_MAX_ENTRIES: int = int(os.environ.get('ENTITY_DETAILS_CACHE_MAX_ENTRIES', 4096))
+
 EXCEL_COLUMN_FORMAT_DATETIME: str = 'YYYY-MM-DD hh:MM:ss'
 EXCEL_COLUMN_FORMAT_NUMBER: str = '0'
 EXCEL_COLUMN_FORMAT_TEXT: str = '@'
+EXCEL_MAX_ROWS: int = int(os.environ.get('EXCEL_MAX_ROWS', 1048575))
 
 
 FEATURE_AUTODAILY_ENABLED: int = int(os.environ.get('FEATURE_AUTODAILY_ENABLED', 0))
@@ -37,11 +43,17 @@ FEATURE_TOURNEYDATA_ENABLED: int = int(os.environ.get('FEATURE_TOURNEYDATA_ENABL
 
 FLEETS_COMMAND_USERS_RAW: str = os.environ.get('FLEETS_COMMAND_USERS', '[]')
 FLEETS_COMMAND_USERS: List[str] = json.loads(str(FLEETS_COMMAND_USERS_RAW))
+FLEETS_SHEET_CSV_CACHE_MAX_SNAPSHOTS: int = int(os.environ.get('FLEETS_SHEET_CSV_CACHE_MAX_SNAPSHOTS', 48))
+FLEETS_SHEET_CSV_CACHE_MIN_AGE: float = float(os.environ.get('FLEETS_SHEET_CSV_CACHE_MIN_AGE', 600.0))
+FLEETS_SHEET_CSV_CACHE_PATH: str = os.environ.get('FLEETS_SHEET_CSV_CACHE_PATH', 'fleets_sheet_csv_cache')
+FLEETS_SHEET_CSV_GZIP: bool = bool(int(os.environ.get('FLEETS_SHEET_CSV_GZIP', 0)))
 
 
 GDRIVE_CLIENT_EMAIL: str = str(os.environ.get('GDRIVE_SERVICE_CLIENT_EMAIL'))
 GDRIVE_CLIENT_ID: str = str(os.environ.get('GDRIVE_SERVICE_CLIENT_ID'))
 GDRIVE_FOLDER_ID: str = '10wOZgAQk_0St2Y_jC3UW497LVpBNxWmP'
+GDRIVE_MAX_WORKERS: int = int(os.environ.get('GDRIVE_MAX_WORKERS', 1))
+GDRIVE_MOCK_FOLDER_PATH: str = os.environ.get('GDRIVE_MOCK_FOLDER_PATH')
 GDRIVE_PRIVATE_KEY_ID: str = str(os.environ.get('GDRIVE_SERVICE_PRIVATE_KEY_ID'))
 GDRIVE_PRIVATE_KEY: str = str(os.environ.get('GDRIVE_SERVICE_PRIVATE_KEY'))
 GDRIVE_PROJECT_ID: str = str(os.environ.get('GDRIVE_SERVICE_PROJECT_ID'))
@@ -50,6 +62,14 @@ GDRIVE_SETTINGS_FILE: str = 'settings.yaml'
 GDRIVE_SCOPES: List[str] = ['https://www.googleapis.com/auth/drive']
 
 
+HTTP_CONNECTION_LIMIT: int = int(os.environ.get('HTTP_CONNECTION_LIMIT', 100))
+HTTP_CONNECTION_LIMIT_PER_HOST: int = int(os.environ.get('HTTP_CONNECTION_LIMIT_PER_HOST', 20))
+HTTP_DNS_CACHE_TTL: int = int(os.environ.get('HTTP_DNS_CACHE_TTL', 300))
+HTTP_KEEPALIVE_TIMEOUT: float = float(os.environ.get('HTTP_KEEPALIVE_TIMEOUT', 30.0))
+HTTP_TIMEOUT_CONNECT: float = float(os.environ.get('HTTP_TIMEOUT_CONNECT', 10.0))
+HTTP_TIMEOUT_TOTAL: float = float(os.environ.get('HTTP_TIMEOUT_TOTAL', 60.0))
+
+
 IGNORE_SERVER_IDS_FOR_COUNTING: List[int] = [
     110373943822540800,
     264445053596991498,
@@ -57,10 +77,17 @@ IGNORE_SERVER_IDS_FOR_COUNTING: List[int] = [
     450100127256936458
 ]
 
+INSPECT_SHIP_CACHE_MAX_ENTRIES: int = int(os.environ.get('INSPECT_SHIP_CACHE_MAX_ENTRIES', 4096))
+INSPECT_SHIP_CACHE_TTL: float = float(os.environ.get('INSPECT_SHIP_CACHE_TTL', 60.0))
+INSPECT_SHIP_MAX_CONCURRENCY: int = int(os.environ.get('INSPECT_SHIP_MAX_CONCURRENCY', 8))
+INSPECT_SHIP_REQUEST_BUDGET: int = int(os.environ.get('INSPECT_SHIP_REQUEST_BUDGET', 30))
 INTENT_MESSAGE_CONTENT: bool = int(os.environ.get('INTENT_MESSAGE_CONTENT', '0'))
 
 
 LATEST_SETTINGS_BASE_PATH: str = 'SettingService/GetLatestVersion3?deviceType=DeviceTypeAndroid&languageKey='
+LAYOUT_CACHE_MAX_BYTES: int = int(os.environ.get('LAYOUT_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+LAYOUT_RENDER_MAX_QUEUE_DEPTH: int = int(os.environ.get('LAYOUT_RENDER_MAX_QUEUE_DEPTH', 10))
+LAYOUT_RENDER_MAX_WORKERS: int = int(os.environ.get('LAYOUT_RENDER_MAX_WORKERS', 2))
 
 
 MIN_ENTITY_NAME_LENGTH: int = 3
@@ -79,6 +106,10 @@ PRINT_DEBUG_WEB_REQUESTS: int = int(os.environ.get('PRINT_DEBUG_WEB_REQUESTS', '
 PRODUCTION_SERVER: str = os.environ.get('PSS_PRODUCTION_SERVER')
 
 PSS_ABOUT_FILES: List[str] = ['src/pss_data/about.json', 'pss_data/about.json']
+PSS_CACHE_REFRESH_AHEAD_RATIO: float = float(os.environ.get('PSS_CACHE_REFRESH_AHEAD_RATIO', 0.2))
+PSS_CACHE_REFRESH_JITTER_RATIO: float = float(os.environ.get('PSS_CACHE_REFRESH_JITTER_RATIO', 0.1))
+PSS_CACHE_REFRESH_MAX_CONCURRENCY: int = int(os.environ.get('PSS_CACHE_REFRESH_MAX_CONCURRENCY', 3))
+PSS_CACHE_SNAPSHOT_PATH: str = os.environ.get('PSS_CACHE_SNAPSHOT_PATH', 'pss_cache_snapshots')
 PSS_LINKS_FILES: List[str] = ['src/pss_data/links.json', 'pss_data/links.json']
 PSS_RESOURCES_FILES: List[str] = ['src/pss_data/resources.json', 'pss_data/resources.json']
 
@@ -90,12 +121,19 @@ RAW_COMMAND_USERS: List[str] = json.loads(str(RAW_COMMAND_USERS_RAW))
 SETTINGS_TABLE_NAME: str = 'settings'
 SETTINGS_TYPES: List[str] = ['boolean', 'float', 'int', 'text', 'timestamputc']
 
+SPRITE_CACHE_MAX_BYTES: int = int(os.environ.get('SPRITE_CACHE_MAX_BYTES', 64 * 1024 * 1024))
 SPRITE_CACHE_SUB_PATH: str = 'sprite_cache'
 
 
 THROW_COMMAND_ERRORS: int = int(os.environ.get('THROW_COMMAND_ERRORS', '0'))
 
+TINTED_SPRITE_CACHE_MAX_BYTES: int = int(os.environ.get('TINTED_SPRITE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
 TOURNAMENT_DATA_START_DATE: datetime = datetime(year=2019, month=10, day=9, tzinfo=timezone.utc)
+TOURNEY_DATA_CACHE_MAX_BYTES: int = int(os.environ.get('TOURNEY_DATA_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+TOURNEY_DATA_CACHE_SPILL_MAX_FILES: int = int(os.environ.get('TOURNEY_DATA_CACHE_SPILL_MAX_FILES', 48))
+TOURNEY_DATA_CACHE_SPILL_PATH: str = os.environ.get('TOURNEY_DATA_CACHE_SPILL_PATH', 'tourney_data_cache')
+TOURNEY_DATA_COLUMNAR: bool = bool(int(os.environ.get('TOURNEY_DATA_COLUMNAR', 1)))
 
 
 USE_EMBEDS: bool = True
@@ -106,4 +144,24 @@ VERSION: str = '1.4.2.9'
 
 
 WIKI_COMMAND_GUILDS: List[str] = json.loads(os.environ.get('WIKI_COMMAND_GUILDS', '[]'))
-WIKI_COMMAND_USERS: List[str] = json.loads(os.environ.get('WIKI_COMMAND_USERS', '[]'))
\ No newline at end of file
+WIKI_COMMAND_USERS: List[str] = json.loads(os.environ.get('WIKI_COMMAND_USERS', '[]'))
+
+
+
+
+
+
+# ---------- Validation ----------
+
+# Caches need to be refreshed a while before they expire, so ahead and jitter ratio together must stay well below 1
+__PSS_CACHE_REFRESH_MAX_RATIO: float = 0.9
+
+if not 0.0 <= PSS_CACHE_REFRESH_AHEAD_RATIO <= __PSS_CACHE_REFRESH_MAX_RATIO:
+    __clamped_ratio = min(max(PSS_CACHE_REFRESH_AHEAD_RATIO, 0.0), __PSS_CACHE_REFRESH_MAX_RATIO)
+    print(f'[Settings] PSS_CACHE_REFRESH_AHEAD_RATIO {PSS_CACHE_REFRESH_AHEAD_RATIO} is out of range [0.0, {__PSS_CACHE_REFRESH_MAX_RATIO}], using {__clamped_ratio} instead.')
+    PSS_CACHE_REFRESH_AHEAD_RATIO = __clamped_ratio
+
+if not 0.0 <= PSS_CACHE_REFRESH_JITTER_RATIO <= __PSS_CACHE_REFRESH_MAX_RATIO - PSS_CACHE_REFRESH_AHEAD_RATIO:
+    __clamped_ratio = min(max(PSS_CACHE_REFRESH_JITTER_RATIO, 0.0), __PSS_CACHE_REFRESH_MAX_RATIO - PSS_CACHE_REFRESH_AHEAD_RATIO)
+    print(f'[Settings] PSS_CACHE_REFRESH_JITTER_RATIO {PSS_CACHE_REFRESH_JITTER_RATIO} is out of range [0.0, {__PSS_CACHE_REFRESH_MAX_RATIO - PSS_CACHE_REFRESH_AHEAD_RATIO}] given PSS_CACHE_REFRESH_AHEAD_RATIO {PSS_CACHE_REFRESH_AHEAD_RATIO}, using {__clamped_ratio} instead.')
+    PSS_CACHE_REFRESH_JITTER_RATIO = __clamped_ratio
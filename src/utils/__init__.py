@@ -9,6 +9,7 @@ from . import database
 from . import datetime
 from .datetime import get_utc_now
 from . import discord
+from . import dispatch
 from . import format
 from . import io
 from . import json
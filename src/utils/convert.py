@@ -112,6 +112,40 @@ def xmltree_to_dict3(raw_text: str) -> EntitiesData:
 
 # ---------- Helper functions ----------
 
+def __convert_flat_list_xml_to_dict(root: _ElementTree.Element, depth: int, fix_xml_attributes: bool) -> EntitiesData:
+    """
+    Fast path for xml trees with a flat list of elements with the same tag at the specified depth and nothing else on the way, like the responses of the ListXDesigns endpoints. Returns the same result as `__xmltree_to_dict` or None, if the xml tree doesn't have that structure.
+    """
+    node = root
+    for _ in range(depth - 1):
+        if node.attrib or len(node) != 1:
+            return None
+        node = node[0]
+    if node.attrib or len(node) < 2:
+        return None
+
+    tag = node[0].tag
+    id_attr_names = _pss_data.ID_NAMES_INFO.get(tag)
+    if not id_attr_names:
+        return None
+
+    result = {}
+    for child in node:
+        if child.tag != tag or len(child):
+            return None
+        attrib = child.attrib
+        key = '.'.join(sorted([attrib[id_attr_name] for id_attr_name in id_attr_names])) or tag
+        if key not in result:
+            if not attrib:
+                result[key] = {}
+            elif fix_xml_attributes:
+                result[key] = __fix_attribute(attrib)
+            else:
+                # The tree gets discarded, so the attributes don't need to be copied
+                result[key] = attrib
+    return result
+
+
 def __convert_xml_to_dict(root: _ElementTree.Element, include_root: bool = True, fix_attributes: bool = True, preserve_lists: bool = False) -> _EntityDict:
     if root is None:
         return None
@@ -203,7 +237,13 @@ def __get_child_tag_count(root: _ElementTree.Element) -> Dict[str, int]:
 
 
 def __xmltree_to_dict(raw_text: str, depth: int) -> EntitiesData:
-    result = raw_xml_to_dict(raw_text)
+    root = _ElementTree.fromstring(raw_text)
+    # Only attributes ending with 'Xml' need to be fixed
+    result = __convert_flat_list_xml_to_dict(root, depth, 'Xml' in raw_text)
+    if result is not None:
+        return result
+
+    result = __convert_xml_to_dict(root)
     while depth > 0:
         found_new_root = False
         for value in result.values():
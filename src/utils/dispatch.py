@@ -0,0 +1,114 @@
+import asyncio as _asyncio
+import time as _time
+from typing import Any as _Any
+from typing import Awaitable as _Awaitable
+from typing import Callable as _Callable
+from typing import Iterable as _Iterable
+from typing import List as _List
+
+
+# ---------- Classes ----------
+
+class DispatchStatistics():
+    """
+    Throughput and latency of a run of `dispatch`.
+    """
+    def __init__(self, max_concurrency: int) -> None:
+        self.__max_concurrency: int = max_concurrency
+        self.__started_at: float = _time.perf_counter()
+        self.__finished_at: float = None
+        self.__latencies: _List[float] = []
+        self.__failed: int = 0
+        self.__succeeded: int = 0
+
+
+    @property
+    def average_latency(self) -> float:
+        if self.__latencies:
+            return sum(self.__latencies) / len(self.__latencies)
+        return 0.0
+
+    @property
+    def count(self) -> int:
+        return len(self.__latencies)
+
+    @property
+    def duration(self) -> float:
+        """
+        Number of seconds the run took.
+        """
+        return (self.__finished_at or _time.perf_counter()) - self.__started_at
+
+    @property
+    def failed(self) -> int:
+        return self.__failed
+
+    @property
+    def max_latency(self) -> float:
+        return max(self.__latencies, default=0.0)
+
+    @property
+    def p95_latency(self) -> float:
+        if self.__latencies:
+            latencies = sorted(self.__latencies)
+            return latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return 0.0
+
+    @property
+    def succeeded(self) -> int:
+        return self.__succeeded
+
+    @property
+    def throughput(self) -> float:
+        """
+        Number of items processed per second.
+        """
+        duration = self.duration
+        if duration > 0:
+            return self.count / duration
+        return 0.0
+
+
+    def add(self, latency: float, success: bool) -> None:
+        self.__latencies.append(latency)
+        if success:
+            self.__succeeded += 1
+        else:
+            self.__failed += 1
+
+
+    def finish(self) -> None:
+        self.__finished_at = _time.perf_counter()
+
+
+    def __str__(self) -> str:
+        return f'processed {self.count} items ({self.succeeded} succeeded, {self.failed} failed) in {self.duration:.2f}s with up to {self.__max_concurrency} at a time: {self.throughput:.1f} items/s, latency avg {self.average_latency:.2f}s, p95 {self.p95_latency:.2f}s, max {self.max_latency:.2f}s'
+
+
+
+
+
+# ---------- Functions ----------
+
+async def dispatch(items: _Iterable[_Any], worker: _Callable[[_Any], _Awaitable[bool]], max_concurrency: int, log_prefix: str = None) -> DispatchStatistics:
+    """
+    Awaits worker for every item, running at most max_concurrency workers at a time. A worker returns True, if it succeeded. Exceptions raised by a worker are printed and count as failures.
+
+    Rate limits of the Discord API are handled by the HTTP client of the discord library, which waits for the bucket of the respective route.
+    """
+    statistics = DispatchStatistics(max_concurrency)
+    semaphore = _asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run_worker(item: _Any) -> None:
+        async with semaphore:
+            start = _time.perf_counter()
+            success = False
+            try:
+                success = bool(await worker(item))
+            except Exception as ex:
+                print(f'{log_prefix or "[dispatch]"} {ex.__class__.__name__} while processing {item}: {ex}')
+            statistics.add(_time.perf_counter() - start, success)
+
+    await _asyncio.gather(*[run_worker(item) for item in items])
+    statistics.finish()
+    return statistics
@@ -1,4 +1,3 @@
-import aiohttp as _aiohttp
 from jellyfish import jaro_winkler_similarity as _jaro_winkler
 import subprocess as _subprocess
 from threading import get_ident as _get_ident
@@ -9,6 +8,7 @@ from typing import List as _List
 from typing import Tuple as _Tuple
 
 from .. import settings as _settings
+from .. import web as _web
 
 from . import constants as _constants
 from . import datetime as _datetime
@@ -18,11 +18,8 @@ from . import datetime as _datetime
 
 async def check_hyperlink(hyperlink: str) -> bool:
     if hyperlink:
-        session: _aiohttp.ClientSession
-        async with _aiohttp.ClientSession() as session:
-            response: _aiohttp.ClientResponse
-            async with session.get(hyperlink) as response:
-                return response.status == 200
+        status = await _web.get_status(hyperlink)
+        return status == 200
     else:
         return False
 
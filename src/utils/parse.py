@@ -8,6 +8,9 @@ from . import constants as _constants
 
 # ---------- Constants ----------
 
+# Length of a datetime string in the format API_DATETIME_FORMAT_ISO
+__API_DATETIME_ISO_LENGTH: int = 19
+
 __SEPARATORS_AMOUNT_MODIFICATION_LOOKUP: Dict[str, int] = {
     'x': 0,
     '==': 0,
@@ -106,10 +109,19 @@ def formatted_datetime(date_time: str, include_time: bool = True, include_tz: bo
 def pss_datetime(pss_datetime: str) -> _datetime:
     result = None
     if pss_datetime:
-        try:
-            result = _datetime.strptime(pss_datetime, _constants.API_DATETIME_FORMAT_ISO)
-        except ValueError:
-            result = _datetime.strptime(pss_datetime, _constants.API_DATETIME_FORMAT_ISO_DETAILED)
+        if len(pss_datetime) == __API_DATETIME_ISO_LENGTH and pss_datetime[10] == 'T':
+            # Fast path for the most common format, which is a lot cheaper than strptime
+            try:
+                result = _datetime.fromisoformat(pss_datetime)
+            except ValueError:
+                pass
+            if result is not None and result.tzinfo is not None:
+                result = None
+        if result is None:
+            try:
+                result = _datetime.strptime(pss_datetime, _constants.API_DATETIME_FORMAT_ISO)
+            except ValueError:
+                result = _datetime.strptime(pss_datetime, _constants.API_DATETIME_FORMAT_ISO_DETAILED)
         result = _pytz.utc.localize(result)
     return result
 
@@ -0,0 +1,96 @@
+import aiohttp
+
+from . import settings
+
+
+# ---------- Constants ----------
+
+DEFAULT_HEADERS: dict = {
+    'Accept-Encoding': 'gzip, deflate',
+}
+
+SESSION: aiohttp.ClientSession = None
+
+
+
+
+
+# ---------- Session ----------
+
+async def connect() -> bool:
+    """
+    Creates the process-wide client session, if it hasn't been created, yet. All requests to the PSS API should use this session, so that connections get reused.
+    """
+    global SESSION
+    if is_connected(SESSION) is False:
+        connector = aiohttp.TCPConnector(
+            limit=settings.HTTP_CONNECTION_LIMIT,
+            limit_per_host=settings.HTTP_CONNECTION_LIMIT_PER_HOST,
+            keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=settings.HTTP_DNS_CACHE_TTL,
+        )
+        timeout = aiohttp.ClientTimeout(
+            total=settings.HTTP_TIMEOUT_TOTAL,
+            sock_connect=settings.HTTP_TIMEOUT_CONNECT,
+        )
+        SESSION = aiohttp.ClientSession(connector=connector, timeout=timeout, headers=DEFAULT_HEADERS, auto_decompress=True)
+    return True
+
+
+async def disconnect() -> None:
+    global SESSION
+    if is_connected(SESSION):
+        await SESSION.close()
+    SESSION = None
+
+
+async def get_session() -> aiohttp.ClientSession:
+    """
+    Returns the process-wide client session. Creates it, if necessary.
+    """
+    await connect()
+    return SESSION
+
+
+def is_connected(session: aiohttp.ClientSession) -> bool:
+    if session:
+        return not session.closed
+    return False
+
+
+
+
+
+# ---------- Requests ----------
+
+async def get_bytes(url: str, **kwargs) -> bytes:
+    session = await get_session()
+    async with session.get(url, **kwargs) as response:
+        return await response.read()
+
+
+async def get_status(url: str, **kwargs) -> int:
+    session = await get_session()
+    async with session.get(url, **kwargs) as response:
+        return response.status
+
+
+async def get_text(url: str, **kwargs) -> str:
+    session = await get_session()
+    async with session.get(url, **kwargs) as response:
+        return await response.text(encoding='utf-8')
+
+
+async def post_text(url: str, **kwargs) -> str:
+    session = await get_session()
+    async with session.post(url, **kwargs) as response:
+        return await response.text(encoding='utf-8')
+
+
+
+
+
+# ---------- Initialization ----------
+
+async def init() -> None:
+    await connect()
@@ -3,8 +3,11 @@ from typing import List, Optional, Type
 from discord import ApplicationCommand, SlashCommand, SlashCommandGroup
 from discord.ext.commands import Bot
 
-from .gdrive import TourneyDataClient
+from . import cache
+from .gdrive import MockDrive, TourneyDataClient
+from . import pss_ship as ship
 from . import settings
+from . import web
 
 
 
@@ -14,6 +17,7 @@ class YadcBot(Bot):
         super().__init__(**kwargs)
         self.__tournament_data_client: TourneyDataClient = None
         if settings.FEATURE_TOURNEYDATA_ENABLED:
+            drive = MockDrive(settings.GDRIVE_MOCK_FOLDER_PATH) if settings.GDRIVE_MOCK_FOLDER_PATH else None
             self.__tournament_data_client = TourneyDataClient(
                 settings.GDRIVE_PROJECT_ID,
                 settings.GDRIVE_PRIVATE_KEY_ID,
@@ -24,7 +28,8 @@ class YadcBot(Bot):
                 settings.GDRIVE_FOLDER_ID,
                 settings.GDRIVE_SERVICE_ACCOUNT_FILE,
                 settings.GDRIVE_SETTINGS_FILE,
-                settings.TOURNAMENT_DATA_START_DATE
+                settings.TOURNAMENT_DATA_START_DATE,
+                drive=drive
             )
 
     @property
@@ -32,6 +37,13 @@ class YadcBot(Bot):
         return self.__tournament_data_client
 
 
+    async def close(self) -> None:
+        await cache.REFRESH_SCHEDULER.stop()
+        await web.disconnect()
+        ship.LAYOUT_RENDERER.shutdown()
+        await super().close()
+
+
     def get_application_command(
         self,
         name: str,